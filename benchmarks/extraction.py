@@ -0,0 +1,150 @@
+"""compare article extraction by selector, text density and JSON-LD
+
+times `parsing.extract_article` for each extractor and parser backend on a
+corpus of saved article pages, and measures how much of the selector text
+is recovered by text density and by JSON-LD `articleBody`
+
+    python -m benchmarks.extraction --corpus 'pages/*.html' --css div.body
+    python -m benchmarks.extraction --parsers html.parser,lxml
+
+without `--corpus` pages of a `FakeSite` are used
+"""
+import re
+import sys
+import glob
+import time
+import argparse
+
+from benchmarks.fake_site import FakeSite, SELECTORS
+from net_modules import parsing
+
+_WORD = re.compile(r'\w+')
+
+
+def recall(reference, text):
+    """share of the words of `reference` found in `text`
+
+    Parameters
+    ----------
+    reference : str
+    text : str
+
+    Returns
+    -------
+    float or None
+        None if `reference` has no words
+    """
+    words = set(_WORD.findall(reference))
+    if not words:
+        return None
+    return len(words & set(_WORD.findall(text))) / len(words)
+
+
+def load_corpus(pattern=None, size=200):
+    """Summary
+
+    Parameters
+    ----------
+    pattern : str, optional
+        glob of html files, generated pages if not passed
+    size : int, optional
+        number of generated pages
+
+    Returns
+    -------
+    list of bytes
+    """
+    if pattern is None:
+        site = FakeSite(json_ld=True)
+        return [site._article(i) for i in range(size)]
+    ret = []
+    for path in sorted(glob.glob(pattern)):
+        with open(path, mode='rb') as f:
+            ret.append(f.read())
+    return ret
+
+
+def run(pages, css_selectors, parsers, encoding=None):
+    """Summary
+
+    Parameters
+    ----------
+    pages : list of bytes
+    css_selectors : str or list
+        article body selector of the corpus
+    parsers : list of str
+    encoding : str, optional
+        encoding of pages, detected by the parser if not passed
+
+    Returns
+    -------
+    list of dict
+        one result per parser and extractor
+    """
+    ret = []
+    for parser in parsers:
+        references = None
+        for extractor in ('css', 'density', 'json-ld'):
+            # pages without JSON-LD fall back to the selector
+            options = ('css', True) if extractor == 'json-ld' else \
+                (extractor, False)
+            started = time.perf_counter()
+            texts = [parsing.extract_article(page, encoding, css_selectors,
+                                             parser, *options)[0]
+                     for page in pages]
+            elapsed = time.perf_counter() - started
+            if references is None:
+                references = texts
+            recalls = [r for r in map(recall, references, texts)
+                       if r is not None]
+            ret.append({
+                'parser': parser, 'extractor': extractor,
+                'ms_per_page': round(1000 * elapsed / len(pages), 3),
+                'empty': sum(not text.strip() for text in texts),
+                'recall': round(sum(recalls) / len(recalls), 3)
+                if recalls else None})
+    return ret
+
+
+def main(argv=None):
+    """Summary
+
+    Parameters
+    ----------
+    argv : list of str, optional
+
+    Returns
+    -------
+    int
+        exit status
+    """
+    parser = argparse.ArgumentParser(
+        prog='python -m benchmarks.extraction',
+        description='compare selector, text density and JSON-LD '
+                    'extraction')
+    parser.add_argument('--corpus', help='glob of saved article pages')
+    parser.add_argument('--css', default=SELECTORS['article_body_css'],
+                        help='article body selector of the corpus')
+    parser.add_argument('--encoding', help='encoding of corpus pages')
+    parser.add_argument('--parsers', default='html.parser',
+                        help='comma separated parser backends')
+    args = parser.parse_args(argv)
+    pages = load_corpus(args.corpus)
+    if not pages:
+        parser.error('no pages match {}'.format(args.corpus))
+    parsers = [p for p in args.parsers.split(',') if p]
+    missing = set(parsers) - set(parsing.available_parsers())
+    if missing:
+        parser.error('parsers not installed: {}'.format(
+            ', '.join(sorted(missing))))
+    print('{} pages'.format(len(pages)))
+    print('{:<12} {:<9} {:>8} {:>6} {:>7}'.format(
+        'parser', 'extractor', 'ms/page', 'empty', 'recall'))
+    for result in run(pages, args.css, parsers, args.encoding):
+        print('{parser:<12} {extractor:<9} {ms_per_page:>8} {empty:>6} '
+              '{recall!s:>7}'.format(**result))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
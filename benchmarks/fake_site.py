@@ -0,0 +1,279 @@
+"""local HTTP server imitating a paginated news site, used by benchmarks
+
+listing pages live at `/news?page=N` and link `links` articles with
+`a.title4` and the next page with `a.next`, articles live at `/news/N` and
+keep their text in `div.body`. the last page links to one more page without
+any links, the same way many real sites end
+"""
+import json
+import time
+import random
+import threading
+import http.server
+
+LISTING_PATH = '/news'
+ARTICLE_PATH = '/news/'
+# crawler settings matching the markup of `FakeSite`
+SELECTORS = {'article_link_css': 'a.title4', 'next_page_css': 'a.next',
+             'article_body_css': 'div.body'}
+
+
+class FakeSite:
+    """synthetic news site served from a daemon thread
+
+    Attributes
+    ----------
+    pages : int
+        number of listing pages with links
+    links : int
+        article links per listing page
+    article_size : int
+        approximate size of an article page in bytes, about a quarter of it
+        is text in `div.body`, the rest is markup around it
+    latency : float
+        seconds every response is delayed
+    error_rate : float
+        fraction of articles answering 503 to their first request
+    missing_rate : float
+        fraction of articles answering 404 to every request
+    seed : int
+        seed choosing failing articles, the same seed fails the same ones
+    json_ld : bool
+        embed the text of articles as JSON-LD `articleBody` too
+    """
+
+    def __init__(self, pages: int = 50, links: int = 20,
+                 article_size: int = 30000, latency: float = 0.02,
+                 error_rate: float = 0.0, missing_rate: float = 0.0,
+                 seed: int = 0, json_ld: bool = False):
+        """Summary
+
+        Parameters
+        ----------
+        pages : int, optional
+            refer to class attributes
+        links : int, optional
+            refer to class attributes
+        article_size : int, optional
+            refer to class attributes
+        latency : float, optional
+            refer to class attributes
+        error_rate : float, optional
+            refer to class attributes
+        missing_rate : float, optional
+            refer to class attributes
+        seed : int, optional
+            refer to class attributes
+        json_ld : bool, optional
+            refer to class attributes
+        """
+        self.pages = pages
+        self.links = links
+        self.article_size = article_size
+        self.latency = latency
+        self.error_rate = error_rate
+        self.missing_rate = missing_rate
+        self.seed = seed
+        self.json_ld = json_ld
+        self._lock = threading.Lock()
+        self._failed = set()
+        self._server = None
+        self._thread = None
+        self.requests = 0
+
+    @property
+    def base_url(self):
+        """url of the first listing page
+        """
+        return 'http://127.0.0.1:{}{}?page=1'.format(
+            self._server.server_address[1], LISTING_PATH)
+
+    @property
+    def article_count(self):
+        """number of articles linked by listing pages
+        """
+        return self.pages * self.links
+
+    @property
+    def available_articles(self):
+        """number of linked articles that don't answer 404
+        """
+        return sum(self._fate(i) != 'missing'
+                   for i in range(self.article_count))
+
+    def start(self):
+        """serve on a free port of the loopback interface
+
+        Returns
+        -------
+        FakeSite
+            self
+        """
+        site = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # small responses are otherwise delayed by Nagle and delayed acks
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                site._handle(self)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = http.server.ThreadingHTTPServer(('127.0.0.1', 0),
+                                                       Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever,
+                                        daemon=True, name='fake-site')
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Summary
+        """
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def _fate(self, article):
+        """Summary
+
+        Parameters
+        ----------
+        article : int
+
+        Returns
+        -------
+        str or None
+            `missing`, `error` or None for articles answering normally
+        """
+        draw = random.Random(self.seed * 1000003 + article).random()
+        if draw < self.missing_rate:
+            return 'missing'
+        if draw < self.missing_rate + self.error_rate:
+            return 'error'
+        return None
+
+    def _handle(self, handler):
+        """answer one request
+
+        Parameters
+        ----------
+        handler : http.server.BaseHTTPRequestHandler
+        """
+        with self._lock:
+            self.requests = self.requests + 1
+        if self.latency:
+            time.sleep(self.latency)
+        path, _, query = handler.path.partition('?')
+        if path == LISTING_PATH:
+            params = dict(p.partition('=')[::2] for p in query.split('&'))
+            try:
+                page = int(params.get('page', 1))
+            except ValueError:
+                return self._respond(handler, 404)
+            return self._respond(handler, 200, self._listing(page))
+        if path.startswith(ARTICLE_PATH):
+            try:
+                article = int(path[len(ARTICLE_PATH):])
+            except ValueError:
+                return self._respond(handler, 404)
+            fate = self._fate(article)
+            if fate == 'missing':
+                return self._respond(handler, 404)
+            if fate == 'error':
+                with self._lock:
+                    first = article not in self._failed
+                    self._failed.add(article)
+                if first:
+                    return self._respond(handler, 503,
+                                         headers={'Retry-After': '0'})
+            return self._respond(handler, 200, self._article(article))
+        return self._respond(handler, 404)
+
+    @staticmethod
+    def _respond(handler, status, body=b'', headers=None):
+        """Summary
+
+        Parameters
+        ----------
+        handler : http.server.BaseHTTPRequestHandler
+        status : int
+        body : bytes, optional
+        headers : dict, optional
+        """
+        handler.send_response(status)
+        handler.send_header('Content-Type', 'text/html; charset=utf-8')
+        handler.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            handler.send_header(name, value)
+        handler.end_headers()
+        handler.wfile.write(body)
+
+    def _listing(self, page):
+        """Summary
+
+        Parameters
+        ----------
+        page : int
+
+        Returns
+        -------
+        bytes
+        """
+        items = []
+        if 1 <= page <= self.pages:
+            first = (page - 1) * self.links
+            items = ['<li><a class="title4" href="{}{}">article {}</a></li>'
+                     .format(ARTICLE_PATH, i, i)
+                     for i in range(first, first + self.links)]
+        next_link = ''
+        if page <= self.pages:
+            next_link = '<a class="next" href="{}?page={}">next</a>'.format(
+                LISTING_PATH, page + 1)
+        return ('<html><head><meta charset="utf-8"><title>page {}</title>'
+                '</head><body><ul>{}</ul>{}</body></html>'.format(
+                    page, ''.join(items), next_link)).encode('utf-8')
+
+    def _article(self, article):
+        """Summary
+
+        Parameters
+        ----------
+        article : int
+
+        Returns
+        -------
+        bytes
+        """
+        words = random.Random(article).choices(_WORDS, k=max(
+            1, self.article_size // 4 // 8))
+        paragraphs = '\n'.join('<p>{}</p>'.format(' '.join(words[i:i + 40]))
+                             for i in range(0, len(words), 40))
+        filler = '<div class="related"><a href="/x">related</a></div>' * max(
+            0, self.article_size * 3 // 4 // 52)
+        metadata = ''
+        if self.json_ld:
+            metadata = '<script type="application/ld+json">{}</script>'.format(
+                json.dumps({'@context': 'https://schema.org',
+                            '@type': 'NewsArticle',
+                            'articleBody': ' '.join(words)},
+                           ensure_ascii=False))
+        return ('<html><head><meta charset="utf-8"><title>article {}</title>'
+                '{}</head><body><div class="head">article {}</div>'
+                '<div class="body">{}</div>{}</body></html>'.format(
+                    article, metadata, article, paragraphs,
+                    filler)).encode('utf-8')
+
+
+_WORDS = ('خبر', 'گزارش', 'امروز', 'شهر', 'news', 'report', 'city', 'today',
+          'market', 'weather', 'سلامت', 'ورزش')
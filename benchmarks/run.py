@@ -0,0 +1,342 @@
+"""offline crawler benchmark against a local `FakeSite`
+
+every scenario (run mode, parser backend and concurrency) crawls the same
+synthetic site in a fresh process, so peak memory and gevent monkey patching
+of multi thread mode don't leak between scenarios. reports throughput, p50
+and p99 request latency, peak RSS and CPU time per article
+
+    python -m benchmarks.run --pages 20 --latency 0.02 --error-rate 0.05
+    python -m benchmarks.run --parsers html.parser,lxml --output bench.json
+    python -m benchmarks.run --baseline bench.json --tolerance 0.2
+
+with `--baseline` the exit status is 1 when a scenario got slower than the
+baseline by more than the tolerance, e.g. to fail a CI job
+"""
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import tempfile
+import itertools
+import multiprocessing
+
+from benchmarks.fake_site import FakeSite, SELECTORS
+
+MODES = ('single', 'async', 'multi_thread')
+
+
+def _scenario_name(scenario):
+    """Summary
+
+    Parameters
+    ----------
+    scenario : dict
+
+    Returns
+    -------
+    str
+        stable key of a scenario, used to compare against a baseline
+    """
+    return '{mode}/{parser}/c{concurrency}{stream}{metadata}'.format(
+        stream='/stream' if scenario['stream_body'] else '',
+        metadata='/json-ld' if scenario.get('json_ld') else '', **scenario)
+
+
+def _crawl(scenario, base_url, articles, politeness, parse_workers,
+           connection):
+    """run one scenario and send its measurements through `connection`
+
+    runs in a spawned process
+
+    Parameters
+    ----------
+    scenario : dict
+        `mode`, `parser`, `concurrency`, `stream_body` and `json_ld`
+    base_url : str
+    articles : int
+        number of articles to crawl
+    politeness : bool
+    parse_workers : int or None
+    connection : multiprocessing.connection.Connection
+    """
+    import resource
+    if scenario['mode'] == 'multi_thread':
+        # before requests imports ssl, see `ArticleCrawler._check_gevent_ssl`
+        from gevent import monkey
+        monkey.patch_all(thread=False, select=False)
+    from net_modules.core import ArticleCrawler
+    logging.basicConfig(level=logging.ERROR)
+    with tempfile.TemporaryDirectory(prefix='crawler-bench-') as out:
+        crawler = ArticleCrawler(
+            base_url=base_url, number_of_articles=articles,
+            create_dir=os.path.join(out, 'articles'),
+            file_names_prefix='bench',
+            multi_thread=scenario['mode'] == 'multi_thread',
+            concurrency=scenario['concurrency'], parser=scenario['parser'],
+            parse_workers=parse_workers,
+            stream_body=scenario['stream_body'], json_ld=scenario['json_ld'],
+            politeness=politeness, metrics_interval=None, **SELECTORS)
+        before = (resource.getrusage(resource.RUSAGE_SELF),
+                  resource.getrusage(resource.RUSAGE_CHILDREN))
+        started = time.perf_counter()
+        if scenario['mode'] == 'async':
+            crawler.run_async()
+        else:
+            crawler.run()
+        elapsed = time.perf_counter() - started
+        after = (resource.getrusage(resource.RUSAGE_SELF),
+                 resource.getrusage(resource.RUSAGE_CHILDREN))
+    cpu = sum(a.ru_utime + a.ru_stime - b.ru_utime - b.ru_stime
+              for a, b in zip(after, before))
+    saved = crawler.internal_counter - 1
+    snapshot = crawler.metrics.snapshot()
+    latency = snapshot['histograms'].get('ttfb', {})
+    connection.send({
+        'scenario': _scenario_name(scenario), 'articles': saved,
+        'seconds': round(elapsed, 3),
+        'articles_per_second': round(saved / elapsed, 2) if elapsed else None,
+        'latency_p50': latency.get('p50'), 'latency_p99': latency.get('p99'),
+        'cpu_ms_per_article': round(1000 * cpu / saved, 2) if saved else None,
+        # kilobytes on linux
+        'peak_rss_mb': round(after[0].ru_maxrss / 1024, 1),
+        'peak_worker_rss_mb': round(after[1].ru_maxrss / 1024, 1),
+        'failed': sum(v for k, v in snapshot['counters'].items()
+                      if k.startswith('failed_articles_total')),
+        'histograms': snapshot['histograms']})
+    connection.close()
+
+
+def run_scenario(scenario, site, articles, politeness=False,
+                 parse_workers=None):
+    """crawl `site` in a fresh process
+
+    Parameters
+    ----------
+    scenario : dict
+        `mode`, `parser`, `concurrency` and `stream_body`
+    site : FakeSite
+        started site
+    articles : int
+        number of articles to crawl
+    politeness : bool, optional
+        pace requests per host as a real crawl would
+    parse_workers : int, optional
+        processes parsing articles, one per core if not passed
+
+    Returns
+    -------
+    dict
+        measurements of the scenario
+
+    Raises
+    ------
+    RuntimeError
+        if the crawl process died without measurements
+    """
+    context = multiprocessing.get_context('spawn')
+    receiver, sender = context.Pipe(duplex=False)
+    process = context.Process(target=_crawl, args=(
+        scenario, site.base_url, articles, politeness, parse_workers, sender))
+    process.start()
+    sender.close()
+    try:
+        ret = receiver.recv()
+    except EOFError:
+        ret = None
+    process.join()
+    if ret is None:
+        raise RuntimeError('scenario {} failed with exit code {}'.format(
+            _scenario_name(scenario), process.exitcode))
+    return ret
+
+
+def scenarios(modes, parsers, concurrencies, stream_body=False,
+              json_ld=False):
+    """every combination to benchmark, concurrency only varies for `async`
+
+    Parameters
+    ----------
+    modes : list of str
+        subset of `MODES`
+    parsers : list of str
+        subset of `parsing.PARSERS`
+    concurrencies : list of int
+    stream_body : bool, optional
+    json_ld : bool, optional
+
+    Returns
+    -------
+    list of dict
+    """
+    ret = []
+    for mode, parser in itertools.product(modes, parsers):
+        for concurrency in (concurrencies if mode == 'async'
+                            else concurrencies[:1]):
+            ret.append({'mode': mode, 'parser': parser,
+                        'concurrency': concurrency,
+                        'stream_body': stream_body, 'json_ld': json_ld})
+    return ret
+
+
+def regressions(results, baseline, tolerance):
+    """scenarios slower than in `baseline`
+
+    Parameters
+    ----------
+    results : list of dict
+    baseline : list of dict
+        results of an earlier run
+    tolerance : float
+        accepted relative drop of throughput
+
+    Returns
+    -------
+    list of str
+        one message per regression
+    """
+    before = {r['scenario']: r['articles_per_second'] for r in baseline}
+    ret = []
+    for result in results:
+        previous = before.get(result['scenario'])
+        current = result['articles_per_second']
+        if previous and current is not None and \
+                current < previous * (1 - tolerance):
+            ret.append('{}: {} articles/s, baseline {}'.format(
+                result['scenario'], current, previous))
+    return ret
+
+
+def _format_table(results):
+    """Summary
+
+    Parameters
+    ----------
+    results : list of dict
+
+    Returns
+    -------
+    str
+    """
+    columns = [('scenario', 'scenario', '{}'),
+               ('articles', 'articles', '{}'),
+               ('seconds', 'secs', '{:.2f}'),
+               ('articles_per_second', 'art/s', '{:.1f}'),
+               ('latency_p50', 'p50 ms', '{:.1f}'),
+               ('latency_p99', 'p99 ms', '{:.1f}'),
+               ('cpu_ms_per_article', 'cpu ms/art', '{:.2f}'),
+               ('peak_rss_mb', 'rss MB', '{:.1f}'),
+               ('peak_worker_rss_mb', 'worker MB', '{:.1f}'),
+               ('failed', 'failed', '{}')]
+    rows = [[title for _, title, _ in columns]]
+    for result in results:
+        row = []
+        for key, _, template in columns:
+            value = result.get(key)
+            if value is not None and key.startswith('latency'):
+                value = value * 1000
+            row.append('-' if value is None else template.format(value))
+        rows.append(row)
+    widths = [max(len(row[i]) for row in rows) for i in range(len(columns))]
+    return '\n'.join('  '.join(cell.rjust(width) if i else cell.ljust(width)
+                               for i, (cell, width) in enumerate(
+                                   zip(row, widths)))
+                     for row in rows)
+
+
+def _split(value, type_=str):
+    return [type_(v) for v in value.split(',') if v]
+
+
+def main(argv=None):
+    """Summary
+
+    Parameters
+    ----------
+    argv : list of str, optional
+
+    Returns
+    -------
+    int
+        exit status
+    """
+    parser = argparse.ArgumentParser(
+        prog='python -m benchmarks.run',
+        description='benchmark ArticleCrawler against a local fake site')
+    parser.add_argument('--pages', type=int, default=25,
+                        help='listing pages with links')
+    parser.add_argument('--links', type=int, default=20,
+                        help='article links per listing page')
+    parser.add_argument('--article-size', type=int, default=30000,
+                        help='approximate bytes per article page')
+    parser.add_argument('--latency', type=float, default=0.02,
+                        help='seconds every response is delayed')
+    parser.add_argument('--error-rate', type=float, default=0.0,
+                        help='fraction of articles failing once with 503')
+    parser.add_argument('--missing-rate', type=float, default=0.0,
+                        help='fraction of articles answering 404')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--articles', type=int, default=None,
+                        help='articles per scenario, all articles of the '
+                             'site by default')
+    parser.add_argument('--modes', type=_split, default=list(MODES),
+                        help='comma separated subset of ' + ','.join(MODES))
+    parser.add_argument('--parsers', type=_split, default=['html.parser'],
+                        help='comma separated parser backends')
+    parser.add_argument('--concurrency', type=lambda v: _split(v, int),
+                        default=[16], help='comma separated concurrency of '
+                                           'async mode')
+    parser.add_argument('--stream', action='store_true',
+                        help='stream article bodies')
+    parser.add_argument('--json-ld', action='store_true',
+                        help='embed article text as JSON-LD and read it '
+                             'from there')
+    parser.add_argument('--parse-workers', type=int, default=None)
+    parser.add_argument('--politeness', action='store_true',
+                        help='pace requests per host as a real crawl')
+    parser.add_argument('--output', help='write results to this json file')
+    parser.add_argument('--baseline', help='json file of an earlier --output')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='accepted relative throughput drop against '
+                             '--baseline')
+    args = parser.parse_args(argv)
+    unknown = set(args.modes) - set(MODES)
+    if unknown:
+        parser.error('unknown modes: {}'.format(', '.join(sorted(unknown))))
+
+    results = []
+    with FakeSite(pages=args.pages, links=args.links,
+                  article_size=args.article_size, latency=args.latency,
+                  error_rate=args.error_rate, missing_rate=args.missing_rate,
+                  seed=args.seed, json_ld=args.json_ld) as site:
+        articles = args.articles or site.available_articles
+        for scenario in scenarios(args.modes, args.parsers, args.concurrency,
+                                  args.stream, args.json_ld):
+            results.append(run_scenario(scenario, site, articles,
+                                        args.politeness, args.parse_workers))
+            print('{scenario}: {articles_per_second} articles/s'.format(
+                **results[-1]), file=sys.stderr, flush=True)
+    print(_format_table(results))
+    if args.output:
+        with open(args.output, mode='w', encoding='utf-8') as f:
+            json.dump({'site': {'pages': args.pages, 'links': args.links,
+                                'article_size': args.article_size,
+                                'latency': args.latency,
+                                'error_rate': args.error_rate,
+                                'missing_rate': args.missing_rate,
+                                'seed': args.seed},
+                       'results': results}, f, indent=2)
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)['results']
+        found = regressions(results, baseline, args.tolerance)
+        for message in found:
+            print('regression ' + message, file=sys.stderr)
+        if found:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,121 @@
+"""cold import time and memory of the crawler modules
+
+each run imports `--module` in a fresh interpreter, as a cron crawl or a
+spawned parse worker does, and reports median import time and peak RSS. the
+exit status is 1 when a budget is exceeded or a heavy backend got imported,
+so a CI job catches import time regressions
+
+    python -m benchmarks.startup
+    python -m benchmarks.startup --max-seconds 0.1 --max-rss-mb 30
+"""
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+# backends that only their run mode may import
+HEAVY_MODULES = ('bs4', 'requests', 'asyncio', 'multiprocessing', 'gevent',
+                 'pandas', 'lxml', 'selectolax')
+
+_PROBE = '''
+import sys, time, json, resource
+started = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - started
+heavy = [m for m in {heavy!r} if m in sys.modules]
+print(json.dumps({{'seconds': elapsed, 'heavy': heavy,
+                  'rss_mb': resource.getrusage(
+                      resource.RUSAGE_SELF).ru_maxrss / 1024}}))
+'''
+
+
+def measure(module, runs=5):
+    """import `module` in `runs` fresh interpreters
+
+    Parameters
+    ----------
+    module : str
+        dotted module name
+    runs : int, optional
+
+    Returns
+    -------
+    dict
+        median `seconds` and `rss_mb`, `baseline_rss_mb` of an interpreter
+        importing nothing and the `heavy` modules imported
+
+    Raises
+    ------
+    RuntimeError
+        if `module` can not be imported
+    """
+    samples = []
+    for module_ in ('sys', module):
+        results = []
+        for _ in range(runs):
+            completed = subprocess.run(
+                [sys.executable, '-c', _PROBE.format(
+                    module=module_, heavy=HEAVY_MODULES)],
+                stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                universal_newlines=True)
+            if completed.returncode:
+                raise RuntimeError('importing {} failed:\n{}'.format(
+                    module_, completed.stderr))
+            results.append(json.loads(completed.stdout))
+        samples.append(results)
+    baseline, results = samples
+    return {'module': module,
+            'seconds': round(statistics.median(
+                r['seconds'] for r in results), 4),
+            'rss_mb': round(statistics.median(r['rss_mb'] for r in results),
+                            1),
+            'baseline_rss_mb': round(statistics.median(
+                r['rss_mb'] for r in baseline), 1),
+            'heavy': sorted(set().union(*(r['heavy'] for r in results)))}
+
+
+def main(argv=None):
+    """Summary
+
+    Parameters
+    ----------
+    argv : list of str, optional
+
+    Returns
+    -------
+    int
+        exit status
+    """
+    parser = argparse.ArgumentParser(
+        prog='python -m benchmarks.startup',
+        description='measure cold import time and RSS')
+    parser.add_argument('--module', action='append',
+                        help='module to import, net_modules.core and main '
+                             'by default, can be repeated')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--max-seconds', type=float, default=0.15,
+                        help='import time budget')
+    parser.add_argument('--max-rss-mb', type=float, default=10,
+                        help='budget of RSS added by the import')
+    args = parser.parse_args(argv)
+    failed = False
+    for module in args.module or ['net_modules.core', 'main']:
+        result = measure(module, args.runs)
+        added = result['rss_mb'] - result['baseline_rss_mb']
+        print('{module}: {seconds:.4f} s, {rss_mb} MB RSS (+{added:.1f} MB)'
+              .format(added=added, **result))
+        if result['heavy']:
+            print('  imports {}'.format(', '.join(result['heavy'])))
+            failed = True
+        if result['seconds'] > args.max_seconds:
+            print('  over the {} s budget'.format(args.max_seconds))
+            failed = True
+        if added > args.max_rss_mb:
+            print('  over the {} MB budget'.format(args.max_rss_mb))
+            failed = True
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
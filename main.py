@@ -1,19 +1,37 @@
-from net_modules.core import ArticleCrawler
+import sys
 import logging
 
-logging.basicConfig(filename='log.txt',
-                    filemode='w+',
-                    format='%(asctime)s : %(levelname)s : %(message)s\n\n',
-                    level=logging.INFO)
+if __name__ == '__main__':
+    # parse workers are spawned and re-import this module
+    logging.basicConfig(filename='log.txt',
+                        filemode='w+',
+                        format='%(asctime)s : %(levelname)s : %(message)s\n\n',
+                        level=logging.INFO)
 
-article_crawler = ArticleCrawler(create_dir='yjc_ir_social')
-# only for http://yjc.ir/fa
-article_crawler.article_link_css = 'a.title4'
-article_crawler.next_page_css = 'a.next'
-article_crawler.article_body_css = 'div.body'
-article_crawler.base_url = 'http://www.yjc.ir/fa/social'
-article_crawler.number_of_articles = 10000
-article_crawler.file_names_prefix = 'social'
-article_crawler.multi_thread = True
-# article_crawler.create_from_dump('ArticleCrawler.json')
-article_crawler.run()
+    if len(sys.argv) > 1:
+        # python main.py sites.yaml, see net_modules.manager for the format
+        from net_modules.manager import CrawlManager
+        manager = CrawlManager(sys.argv[1])
+        try:
+            failures = manager.run()
+        finally:
+            manager.close()
+        sys.exit(1 if failures else 0)
+
+    # multi thread mode crawls with gevent, which has to patch ssl before
+    # requests imports it
+    from gevent import monkey
+    monkey.patch_all(thread=False, select=False)
+    from net_modules.core import ArticleCrawler
+
+    article_crawler = ArticleCrawler(create_dir='yjc_ir_social')
+    # only for http://yjc.ir/fa
+    article_crawler.article_link_css = 'a.title4'
+    article_crawler.next_page_css = 'a.next'
+    article_crawler.article_body_css = 'div.body'
+    article_crawler.base_url = 'http://www.yjc.ir/fa/social'
+    article_crawler.number_of_articles = 10000
+    article_crawler.file_names_prefix = 'social'
+    article_crawler.multi_thread = True
+    # article_crawler.create_from_dump('ArticleCrawler.json')
+    article_crawler.run()
@@ -0,0 +1,314 @@
+"""on-disk HTTP response cache with conditional revalidation
+
+bodies are stored as files, metadata in a SQLite index. `CachingAdapter`
+plugs the cache under a `requests.Session`, so every request of a `Fetcher`
+goes through it
+"""
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from requests.models import Response
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+from net_modules.politeness import PoliteAdapter
+
+# per request freshness hint, seconds as str or 'forever', never sent
+MAX_AGE_HEADER = 'X-Crawler-Cache-Max-Age'
+FOREVER = 'forever'
+# headers describing the transfer rather than the stored body
+_DROPPED_HEADERS = {'content-encoding', 'content-length', 'transfer-encoding',
+                    'connection', 'keep-alive'}
+# access times of hits are committed every this many hits or seconds
+_ACCESS_BATCH = 100
+_ACCESS_INTERVAL = 5.0
+
+
+class HttpCache:
+    """store of response bodies keyed by url, evicted least recently used
+
+    Attributes
+    ----------
+    directory : str
+        cache directory
+    max_size : int
+        maximum total size of stored bodies in bytes
+    """
+
+    def __init__(self, directory='http_cache', max_size: int = 2 ** 30):
+        """Summary
+
+        Parameters
+        ----------
+        directory : str, optional
+            refer to class attributes, created if it doesn't exist
+        max_size : int, optional
+            refer to class attributes
+        """
+        self.directory = directory
+        self.max_size = max_size
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(os.path.join(directory, 'index.sqlite3'),
+                                     check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS entries ('
+            'key TEXT PRIMARY KEY, url TEXT NOT NULL, headers TEXT NOT NULL, '
+            'etag TEXT, last_modified TEXT, stored REAL NOT NULL, '
+            'accessed REAL NOT NULL, size INTEGER NOT NULL)')
+        self._conn.execute(
+            'CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)')
+        self._conn.commit()
+        self._total = self._conn.execute(
+            'SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+        # key to access time of hits not written yet, a write per hit would
+        # hold the database locked for other processes sharing the cache
+        self._accessed = {}
+        self._accessed_written = time.monotonic()
+
+    @staticmethod
+    def _key(url):
+        """Summary
+
+        Parameters
+        ----------
+        url : str
+
+        Returns
+        -------
+        str
+        """
+        return hashlib.sha1(url.encode('utf-8')).hexdigest()
+
+    def _path(self, key):
+        """Summary
+
+        Parameters
+        ----------
+        key : str
+
+        Returns
+        -------
+        str
+            body file of `key`
+        """
+        return os.path.join(self.directory, key[:2], key)
+
+    def get(self, url):
+        """look `url` up
+
+        Parameters
+        ----------
+        url : str
+
+        Returns
+        -------
+        dict or None
+            `headers`, `etag`, `last_modified`, `stored` and `body`, None on
+            miss
+        """
+        key = self._key(url)
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT headers, etag, last_modified, stored FROM entries '
+                'WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                return None
+            try:
+                with open(self._path(key), mode='rb') as f:
+                    body = f.read()
+            except OSError:
+                self._delete(key)
+                self._conn.commit()
+                return None
+            self._accessed[key] = time.time()
+            if len(self._accessed) >= _ACCESS_BATCH or \
+                    time.monotonic() - self._accessed_written >= \
+                    _ACCESS_INTERVAL:
+                self._write_accessed()
+                self._conn.commit()
+        return {'headers': json.loads(row[0]), 'etag': row[1],
+                'last_modified': row[2], 'stored': row[3], 'body': body}
+
+    def put(self, url, headers, body: bytes):
+        """store a response, evicting old entries beyond `max_size`
+
+        Parameters
+        ----------
+        url : str
+        headers : dict
+            response headers
+        body : bytes
+            decoded response body
+        """
+        if len(body) > self.max_size:
+            return
+        key = self._key(url)
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = '{}.{}.tmp'.format(path, threading.get_ident())
+        with open(temp_path, mode='wb') as f:
+            f.write(body)
+        os.replace(temp_path, path)
+        headers = {k: v for k, v in headers.items()
+                   if k.lower() not in _DROPPED_HEADERS}
+        now = time.time()
+        with self._lock:
+            self._forget_size(key)
+            self._conn.execute(
+                'INSERT OR REPLACE INTO entries (key, url, headers, etag, '
+                'last_modified, stored, accessed, size) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                (key, url, json.dumps(headers), headers.get('ETag'),
+                 headers.get('Last-Modified'), now, now, len(body)))
+            self._total = self._total + len(body)
+            # eviction needs the latest access times
+            self._write_accessed()
+            self._evict()
+            self._conn.commit()
+
+    def touch(self, url):
+        """mark a revalidated entry as fresh
+
+        Parameters
+        ----------
+        url : str
+        """
+        with self._lock:
+            self._conn.execute('UPDATE entries SET stored = ? WHERE key = ?',
+                               (time.time(), self._key(url)))
+            self._conn.commit()
+
+    def close(self):
+        """Summary
+        """
+        with self._lock:
+            self._write_accessed()
+            self._conn.commit()
+            self._conn.close()
+
+    def _write_accessed(self):
+        """write pending access times, lock must be held, caller commits
+        """
+        if self._accessed:
+            self._conn.executemany(
+                'UPDATE entries SET accessed = ? WHERE key = ?',
+                [(accessed, key) for key, accessed in self._accessed.items()])
+            self._accessed = {}
+        self._accessed_written = time.monotonic()
+
+    def _forget_size(self, key):
+        """subtract size of `key` from the total, lock must be held
+
+        Parameters
+        ----------
+        key : str
+        """
+        row = self._conn.execute('SELECT size FROM entries WHERE key = ?',
+                                 (key,)).fetchone()
+        if row is not None:
+            self._total = self._total - row[0]
+
+    def _delete(self, key):
+        """remove `key`, lock must be held
+
+        Parameters
+        ----------
+        key : str
+        """
+        self._forget_size(key)
+        self._conn.execute('DELETE FROM entries WHERE key = ?', (key,))
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def _evict(self):
+        """drop least recently used entries until under `max_size`
+        """
+        while self._total > self.max_size:
+            rows = self._conn.execute(
+                'SELECT key FROM entries ORDER BY accessed LIMIT 64').fetchall()
+            if not rows:
+                self._total = 0
+                return
+            for (key,) in rows:
+                self._delete(key)
+                if self._total <= self.max_size:
+                    return
+
+
+class CachingAdapter(PoliteAdapter):
+    """`PoliteAdapter` answering GET requests from an `HttpCache`
+
+    freshness comes from the `MAX_AGE_HEADER` request header: a number of
+    seconds or `FOREVER` (the default). stale entries are revalidated with
+    `If-None-Match` / `If-Modified-Since`. fresh hits never reach the
+    scheduler
+    """
+
+    def __init__(self, cache: HttpCache, **kwargs):
+        """Summary
+
+        Parameters
+        ----------
+        cache : HttpCache
+            response store
+        **kwargs
+            passed to `PoliteAdapter`
+        """
+        super().__init__(**kwargs)
+        self.cache = cache
+
+    def send(self, request, stream=False, **kwargs):
+        max_age = request.headers.pop(MAX_AGE_HEADER, FOREVER)
+        if request.method != 'GET':
+            return super().send(request, stream=stream, **kwargs)
+        entry = self.cache.get(request.url)
+        if entry is not None:
+            if max_age == FOREVER or \
+                    time.time() - entry['stored'] < float(max_age):
+                return self._cached_response(request, entry)
+            if entry['etag']:
+                request.headers['If-None-Match'] = entry['etag']
+            if entry['last_modified']:
+                request.headers['If-Modified-Since'] = entry['last_modified']
+        response = super().send(request, stream=stream, **kwargs)
+        if entry is not None and response.status_code == 304:
+            response.close()
+            self.cache.touch(request.url)
+            return self._cached_response(request, entry)
+        # streamed bodies may be abandoned half way and are not stored
+        if response.status_code == 200 and not stream:
+            self.cache.put(request.url, dict(response.headers),
+                           response.content)
+        return response
+
+    def _cached_response(self, request, entry):
+        """build a complete response from a cache entry
+
+        Parameters
+        ----------
+        request : requests.PreparedRequest
+        entry : dict
+            value returned by `HttpCache.get`
+
+        Returns
+        -------
+        requests.Response
+        """
+        response = Response()
+        response.status_code = 200
+        response.reason = 'OK'
+        response.url = request.url
+        response.request = request
+        response.connection = self
+        response.headers = CaseInsensitiveDict(entry['headers'])
+        response.encoding = get_encoding_from_headers(response.headers)
+        response._content = entry['body']
+        response._content_consumed = True
+        response.from_cache = True
+        return response
@@ -1,16 +1,31 @@
 """Summary
+
+importing this module stays cheap, BeautifulSoup, requests, asyncio and
+multiprocessing are imported where a run mode first needs them. spawned parse
+workers re-import the main script and with it this module, see
+`benchmarks/startup.py`
 """
-import requests
-import bs4
 import sys
 import logging
-from more_itertools import chunked
-import threading
-import grequests
+import time
+import itertools
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
+from net_modules import parsing
+from net_modules import streaming
+from net_modules.frontier import Frontier
+from net_modules import sinks
+from net_modules import retry
+from net_modules import urls
+from net_modules import pagination
+from net_modules import dedup as dedup_index
+from net_modules import metrics as crawl_metrics
+from net_modules.seen import BloomFilter
 
 
 def get_url_contents(link, method="GET", headers=None,
-                     params=None, proxy_config=None):
+                     params=None, proxy_config=None, fetcher=None,
+                     max_age=None):
     """Summary
     
     Parameters
@@ -27,11 +42,22 @@ def get_url_contents(link, method="GET", headers=None,
         parameters used for request
     proxy_config : dict
         proxies argument value
+    fetcher : Fetcher, optional
+        pooled client used to send the request, a process wide one is used
+        if not passed
+    max_age : int, optional
+        seconds a response cached by `fetcher` stays fresh, forever if not
+        passed
     
     Returns
     -------
     Tuple[bytes, str]
         web-page as a bytes and its encode
+
+    Raises
+    ------
+    retry.FetchError
+        if the page could not be downloaded, `kind` tells why
     """
     valid_methods = {"POST", "GET", "PUT", "PATCH", "DELETE"}
     if method not in valid_methods:
@@ -48,11 +74,7 @@ def get_url_contents(link, method="GET", headers=None,
     elif not isinstance(headers, dict):
         print("header is of type {}, it will omitted.".format(type(headers)))
         headers = {}
-    # `headers` is dict
-    elif "User-Agent" not in headers:
-        headers["User-Agent"] = "Mozilla/5.0 (Windows NT 6.1; Win64; x64) "
-        "AppleWebKit/537.36 (KHTML, like Gecko) Chrome/57.0.2987.133 "
-        "Safari/537.36"
+    # `User-Agent` is set on the fetcher session
 
     if proxy_config is None:
         pass
@@ -61,12 +83,13 @@ def get_url_contents(link, method="GET", headers=None,
             type(proxy_config)))
         proxy_config = None
 
-    try:
-        result = requests.request(method, link, data=params,
-                                  headers=headers, proxies=proxy_config)
-        return result.content, result.encoding
-    except Exception as ex:
-        print(ex)
+    if fetcher is None:
+        from net_modules.fetcher import default_fetcher
+        fetcher = default_fetcher()
+
+    return fetcher.get_url_contents(link, method=method, headers=headers,
+                                    params=params, proxy_config=proxy_config,
+                                    max_age=max_age)
 
 
 class ArticleCrawler:
@@ -82,19 +105,103 @@ class ArticleCrawler:
         aggregate inner text of matching elements
     article_link_css : list or str
         CSS selector(s) used to find articles link (direct link to this)
+    article_url_template : str or None
+        url of a lighter version of every article, such as its AMP or print
+        page, built with `urls.variant`, e.g. `{scheme}://{host}/amp{path}`.
+        articles are still keyed by their own url, which is downloaded
+        instead if the light version fails. `article_body_css` must match
+        the light version. None downloads articles as linked
     base_url : str
         base url of website that contains article
+    cache_dir : str or None
+        directory of the on-disk HTTP cache, None disables it. articles are
+        cached forever, listing pages for `listing_ttl` seconds and then
+        revalidated with a conditional GET
+    cache_size : int
+        maximum size of the HTTP cache in bytes, least recently used responses
+        are evicted
+    concurrency : int
+        maximum number of in-flight article requests in `run_async` and multi
+        thread mode, each holding at most one article body in memory
+    compression : str
+        compression of `shards` and `store` output, one of
+        `sinks.COMPRESSIONS`
     create_dir : str or bool
         if passed str a directory with same name created and all file will put on it
         it is recommended to pass existing directory
     current_page_url : str
         URL to web page containing articles links
+    dead_letter_path : str or None
+        json lines file listing urls that failed for good, kept across runs
+        and used by `redrive_failed`. None keeps them in memory only
+    dead_letters : retry.DeadLetters or None
+        urls that failed for good during the last crawl
+    dedup : str or None
+        what to do with near-duplicates of stored articles: `skip` doesn't
+        store them, `tag` stores them with the url of the original in
+        `duplicate_of` (json lines outputs only). None disables detection
+    dedup_distance : int
+        maximum number of differing SimHash bits of near-duplicates
+    dedup_path : str or None
+        json lines file of fingerprints of stored articles, kept across runs.
+        defaults to a file next to `frontier_path` if it is set
+    dump_path : str
+        json file written by `dump` when a crawl with a frontier starts and
+        on errors, `ArticleCrawler.json` by default
     encode : str
         files encoding
+    extractor : str
+        how article text is found, one of `parsing.EXTRACTORS`: `css` only
+        uses `article_body_css`, `fallback` scores blocks by text and link
+        density when it matches nothing, e.g. once the site changed its
+        markup, and `density` always does, without `article_body_css`
+    fetcher : Fetcher
+        pooled HTTP client shared by every request of this crawler
     file_names_prefix : str
         prefix files name 
+    frontier_path : str or None
+        SQLite file keeping state of every article url, used to skip links
+        already seen on previous listing pages and to resume a killed crawl
+        without refetching saved articles. None disables it
+    host_concurrency : int
+        maximum number of parallel requests to one host
+    host_rate : float or None
+        maximum number of requests per second to one host, None for no limit
     internal_counter : int
         Description
+    json_ld : bool
+        take the text of an article from the `articleBody` of its JSON-LD
+        metadata when it has one, without parsing the page. other articles
+        go through `extractor`. streamed articles don't use it, see
+        `stream_body`
+    metrics : metrics.Metrics
+        per-stage latency histograms, bytes, article and error counters and
+        queue depths of this crawler
+    metrics_interval : float or None
+        seconds between metrics log lines, None disables them
+    metrics_labels : dict
+        labels of the queue gauges of this crawler, e.g. `{'site': 'news'}`
+        to tell apart crawlers sharing `metrics`
+    metrics_path : str or None
+        Prometheus text file rewritten with every metrics report
+    metrics_port : int or None
+        port of an HTTP endpoint serving metrics in Prometheus format
+    min_page_yield : float
+        least average number of new articles per listing page over the last
+        `stale_pages` pages, the walk stops below it. 0 disables the check
+    listing_prefetch : int
+        number of listing pages fetched concurrently once their urls can be
+        predicted, see `listing_template` and `predict_pages`
+    listing_template : str or None
+        url of listing pages with `{page}` in place of the page number, e.g.
+        `http://www.yjc.ir/fa/social?page={page}`. once `current_page_url`
+        follows it, pages are fetched `listing_prefetch` at a time without
+        waiting for `next_page_css` until a page has no article links
+    listing_ttl : int
+        seconds a cached listing page is used without revalidation
+    max_attempts : int
+        attempts per request before it fails for good, timeouts, connection
+        errors, 429 and 5xx are retried with exponential backoff and jitter
     multi_thread : bool
         sun on single thread or multiple threads
     next_page_css : list or str
@@ -102,14 +209,65 @@ class ArticleCrawler:
         if this property equals None will be ignored
     number_of_articles : int
         number of articles to crawl from `base_url`, should be positive
+    output_format : str
+        one of `sinks.OUTPUT_FORMATS`: `files` writes one text file per
+        article, `jsonl` appends url, fetch time and text to one json lines
+        file, `shards` writes compressed json lines files of `shard_size` and
+        `store` writes a content-addressed store readable by url or text
+        hash, see `store.ArticleStore`
+    parse_workers : int or None
+        number of processes parsing article bodies in `run_async` and multi
+        thread mode, None means one per core
+    parser : str
+        HTML parser backend, one of `parsing.PARSERS`
+    predict_pages : bool
+        detect `listing_template` from two successive `next_page_css` urls
+    politeness : bool
+        pace requests per host with `host_concurrency` and `host_rate`,
+        honouring `Retry-After` and robots.txt `Crawl-delay` and backing off
+        when responses get slow or throttled
+    request_timeout : float or tuple
+        `(connect, read)` timeout of every request in seconds
+    shard_size : int
+        uncompressed bytes per shard of `shards` output, compressed bytes
+        per segment of `store` output
+    stale_pages : int
+        number of latest listing pages averaged for `min_page_yield`
+    stop_reason : str or None
+        why the last walk over listing pages ended, one of the
+        `pagination.STOP_*` reasons. None if it was interrupted
+    stream_body : bool
+        download articles as a stream and extract their text while it arrives,
+        only simple selectors such as `div.body` can be streamed, others fall
+        back to a full download. the text of every matching element is kept,
+        as without streaming, so the download stops early only when every
+        selector has an id, taken to match a single element, and it ended.
+        used by every run mode
     website_base_url_regexp : str
-        regular expression to extract website from `self.base_url`
+        unused, links are resolved with `urls.resolve`. kept in dumps for
+        older versions
     """
 
     def __init__(self, base_url=None, number_of_articles: int = 20,
                  article_link_css=None, article_body_css=None,
                  next_page_css=None, file_names_prefix=None,
-                 create_dir=False, encode="utf-8", multi_thread: bool = False):
+                 create_dir=False, encode="utf-8", multi_thread: bool = False,
+                 concurrency: int = 16, fetcher=None,
+                 parser='html.parser', parse_workers=None,
+                 stream_body: bool = False, frontier_path=None,
+                 output_format='files', shard_size: int = 64 * 2 ** 20,
+                 compression='gzip', cache_dir=None,
+                 cache_size: int = 2 ** 30, listing_ttl: int = 600,
+                 politeness: bool = True, host_concurrency: int = 8,
+                 host_rate=10.0, max_attempts: int = 4,
+                 request_timeout=(10, 30), dead_letter_path=None,
+                 listing_template=None, predict_pages: bool = False,
+                 listing_prefetch: int = 8, dedup=None,
+                 dedup_distance: int = 3, dedup_path=None,
+                 metrics_interval=60, metrics_path=None, metrics_port=None,
+                 extractor='fallback', min_page_yield: float = 1.0,
+                 stale_pages: int = 10, json_ld: bool = False,
+                 article_url_template=None):
         """Summary
         
         Parameters
@@ -133,6 +291,72 @@ class ArticleCrawler:
             refer to class attributes
         multi_thread : bool, optional
             Description
+        concurrency : int, optional
+            refer to class attributes
+        fetcher : Fetcher, optional
+            if not passed a fetcher with one pooled connection per
+            concurrent request, `max_attempts` and `request_timeout` is
+            created
+        parser : str, optional
+            refer to class attributes
+        parse_workers : int or None, optional
+            refer to class attributes
+        stream_body : bool, optional
+            refer to class attributes
+        frontier_path : str, optional
+            refer to class attributes
+        output_format : str, optional
+            refer to class attributes
+        shard_size : int, optional
+            refer to class attributes
+        compression : str, optional
+            refer to class attributes
+        cache_dir : str, optional
+            refer to class attributes
+        cache_size : int, optional
+            refer to class attributes
+        listing_ttl : int, optional
+            refer to class attributes
+        politeness : bool, optional
+            refer to class attributes
+        host_concurrency : int, optional
+            refer to class attributes
+        host_rate : float or None, optional
+            refer to class attributes
+        max_attempts : int, optional
+            refer to class attributes
+        request_timeout : float or tuple, optional
+            refer to class attributes
+        dead_letter_path : str, optional
+            refer to class attributes
+        listing_template : str, optional
+            refer to class attributes
+        predict_pages : bool, optional
+            refer to class attributes
+        listing_prefetch : int, optional
+            refer to class attributes
+        dedup : str, optional
+            refer to class attributes
+        dedup_distance : int, optional
+            refer to class attributes
+        dedup_path : str, optional
+            refer to class attributes
+        metrics_interval : float or None, optional
+            refer to class attributes
+        metrics_path : str, optional
+            refer to class attributes
+        metrics_port : int, optional
+            refer to class attributes
+        extractor : str, optional
+            refer to class attributes
+        min_page_yield : float, optional
+            refer to class attributes
+        stale_pages : int, optional
+            refer to class attributes
+        json_ld : bool, optional
+            refer to class attributes
+        article_url_template : str, optional
+            refer to class attributes
         """
         self.base_url = base_url
         self.current_page_url = self.base_url
@@ -145,10 +369,64 @@ class ArticleCrawler:
         self.encode = encode
         self.create_dir = create_dir
         self.multi_thread = multi_thread
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.request_timeout = request_timeout
+        from net_modules.fetcher import Fetcher
+        self.fetcher = fetcher if isinstance(fetcher, Fetcher) else \
+            Fetcher(pool_size=max(10, concurrency + listing_prefetch),
+                    retry_policy=retry.RetryPolicy(max_attempts=max_attempts),
+                    timeout=request_timeout)
+        self.parser = parser
+        self.parse_workers = parse_workers
+        self.stream_body = stream_body
+        self.frontier_path = frontier_path
+        self.frontier = None
+        self.output_format = output_format
+        self.shard_size = shard_size
+        self.compression = compression
+        self._writer = None
+        # process pool lent by a `CrawlManager`, shared with other crawlers
+        self._parse_pool = None
+        # called with records once on disk, e.g. to ack a work queue
+        self._on_records_written = None
+        self.cache_dir = cache_dir
+        self.cache_size = cache_size
+        self.listing_ttl = listing_ttl
+        self.politeness = politeness
+        self.host_concurrency = host_concurrency
+        self.host_rate = host_rate
+        self.dead_letter_path = dead_letter_path
+        self.dead_letters = None
+        self.listing_template = listing_template
+        self.predict_pages = predict_pages
+        self.listing_prefetch = listing_prefetch
+        self.dedup = dedup
+        self.dedup_distance = dedup_distance
+        self.dedup_path = dedup_path
+        self._dedup_index = None
+        self.metrics = crawl_metrics.Metrics()
+        self.metrics_labels = {}
+        self.metrics_interval = metrics_interval
+        self.metrics_path = metrics_path
+        self.metrics_port = metrics_port
+        self.extractor = extractor
+        self._fallback_warned = False
+        self.min_page_yield = min_page_yield
+        self.stale_pages = stale_pages
+        self.stop_reason = None
+        self._page_walk = None
+        self.json_ld = json_ld
+        self.article_url_template = article_url_template
         if isinstance(self.create_dir, str):
             self._create_output_dir()
         self.website_base_url_regexp = r'^(http(s)?:\/\/(www\.)?[a-z0-9]+\.(\w){2,3})'
         self.internal_counter = 1
+        self.dump_path = 'ArticleCrawler.json'
+        # links handed to workers and not yet saved or failed
+        self._in_flight = 0
+        # canonical article urls handed out when there is no frontier
+        self._url_index = urls.UrlIndex()
 
     def run(self):
         """you should call this function to start crawling
@@ -161,119 +439,854 @@ class ArticleCrawler:
         if not self._check_attributes():
             raise ValueError("some attribute values missing")
         if self.multi_thread:
-            self._multi_thread()
-        else:
-            self._run_single_thread()
-            # single threaded
+            self._check_gevent_ssl()
+        # gevent used by multi thread mode breaks background threads
+        with self._crawl_session(threaded_writer=not self.multi_thread):
+            if self.multi_thread:
+                self._multi_thread()
+            else:
+                self._run_single_thread()
+                # single threaded
 
-    def _run_single_thread(self):
+    def run_async(self):
+        """crawl on a single asyncio event loop
+
+        listing pages, article downloads and saves run as a pipeline, so the
+        next listing page is discovered while articles of the current one are
+        still downloading. at most `concurrency` article requests are in
+        flight at any time.
+
+        Raises
+        ------
+        ValueError
+            in case any missing or invalid values for parameters
+        """
+        if not self._check_attributes():
+            raise ValueError("some attribute values missing")
+        import asyncio
+        with self._crawl_session():
+            asyncio.run(self._run_async())
+
+    def redrive_failed(self):
+        """crawl again articles that failed for good
+
+        failed urls come from the frontier if `frontier_path` is set, along
+        with links discovered but never crawled, from `dead_letter_path`
+        otherwise. articles saved this time are removed from the dead letters
+
+        Raises
+        ------
+        ValueError
+            in case any missing or invalid values for parameters
+        """
+        if not self._check_attributes():
+            raise ValueError("some attribute values missing")
+        with self._crawl_session():
+            if self.frontier is not None:
+                self.frontier.requeue_failed()
+                links = self.frontier.pending()
+            else:
+                links = self.dead_letters.urls()
+            for link in links:
+                try:
+                    text = self._extract_article_body(link)
+                except Exception as ex:
+                    self._article_failed(link, ex)
+                    continue
+                self._store_article(text, link)
+                self.dead_letters.remove(link)
+
+    def run_continuous(self, poll_interval: float = 600, rounds=None):
+        """poll the newest listing pages and crawl only unseen articles
+
+        every round starts again from `base_url` and stops paginating at the
+        first listing page holding only known articles, so after the first
+        round each poll only fetches what was published since the last one.
+        at most `number_of_articles` articles are crawled per round. seen
+        urls are kept in the frontier, with a Bloom filter next to it
+        answering most lookups of new urls, so `frontier_path` is required
+
+        Parameters
+        ----------
+        poll_interval : float, optional
+            seconds between the start of two rounds
+        rounds : int, optional
+            number of rounds, forever if not passed
+
+        Raises
+        ------
+        ValueError
+            in case any missing or invalid values for parameters
+        """
+        if not self._check_attributes():
+            raise ValueError("some attribute values missing")
+        if self.frontier_path is None:
+            raise ValueError('continuous crawl needs frontier_path to '
+                             'remember seen articles')
+        done = 0
+        while rounds is None or done < rounds:
+            started = time.monotonic()
+            with self._crawl_session():
+                self.current_page_url = self.base_url
+                stored = self._continuous_round()
+            done = done + 1
+            logging.info('round {}: {} new articles'.format(done, stored))
+            if rounds is not None and done >= rounds:
+                break
+            time.sleep(max(0.0, poll_interval -
+                           (time.monotonic() - started)))
+
+    def _continuous_round(self):
+        """one round of `run_continuous`, in a crawl session
+
+        Returns
+        -------
+        int
+            number of stored articles
+        """
+        seen = self._open_seen_filter()
+        stored = 0
+        pending = self._pending_links()
+        try:
+            for articles_links, _ in self._listing_pages():
+                # links the filter never saw are new without asking the
+                # frontier, the others are confirmed in one query and only
+                # its false positives are added
+                known = self.frontier.known(
+                    [link for link in articles_links if link in seen])
+                new_links = self._new_links(
+                    [link for link in articles_links if link not in known])
+                for link in new_links:
+                    seen.add(link)
+                for link in pending + new_links:
+                    if stored >= self.number_of_articles:
+                        break
+                    try:
+                        text = self._extract_article_body(link)
+                    except Exception as ex:
+                        self._article_failed(link, ex)
+                        continue
+                    if self._store_article(text, link):
+                        stored = stored + 1
+                pending = []
+                if not new_links:
+                    self._page_walk.stop(pagination.STOP_CAUGHT_UP)
+                    break
+                if stored >= self.number_of_articles:
+                    break
+        finally:
+            seen.save(self._seen_filter_path())
+        return stored
+
+    def _seen_filter_path(self):
         """Summary
+
+        Returns
+        -------
+        str
+            file of the Bloom filter of seen urls, next to the frontier
+        """
+        return self.frontier_path + '.bloom'
+
+    def _open_seen_filter(self):
+        """load the Bloom filter of seen urls, or build it from the frontier
+
+        Returns
+        -------
+        BloomFilter
+        """
+        path = self._seen_filter_path()
+        known = sum(self.frontier.counts().values())
+        try:
+            ret = BloomFilter.load(path)
+            # urls missing from the filter are still found in the frontier,
+            # a full filter would answer "seen" too often though
+            if known < ret.capacity:
+                return ret
+        except (OSError, ValueError) as ex:
+            logging.debug('rebuilding seen urls filter: {}'.format(ex))
+        ret = BloomFilter(capacity=max(1000000, 2 * known))
+        for url in self.frontier.urls():
+            ret.add(url)
+        return ret
+
+    async def _run_async(self):
+        """run producer and workers until all links are handled
+
+        the first of them to fail, e.g. a worker whose article could not be
+        written, cancels the others and its exception is raised
         """
+        import asyncio
+        queue = asyncio.Queue(maxsize=self.concurrency * 2)
+        handled = asyncio.Event()
+        self.metrics.gauge_function('article_queue', queue.qsize,
+                                    **self.metrics_labels)
+        with ThreadPoolExecutor(max_workers=self.concurrency + 1) as executor, \
+                self._parse_executor() as parse_pool:
+            tasks = [asyncio.ensure_future(
+                self._async_producer(queue, executor, handled))]
+            tasks.extend(asyncio.ensure_future(
+                self._async_worker(queue, executor, parse_pool, handled))
+                for _ in range(self.concurrency))
+            try:
+                done, _ = await asyncio.wait(
+                    tasks, return_when=asyncio.FIRST_EXCEPTION)
+                for task in done:
+                    # raises the exception of a failed task
+                    task.result()
+            finally:
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+                self.metrics.gauge_function('article_queue', None,
+                                            **self.metrics_labels)
+
+    async def _async_producer(self, queue: 'asyncio.Queue', executor,
+                              handled: 'asyncio.Event'):
+        """walk listing pages and feed article links into `queue`
+
+        links are handed out while saved articles and links in flight are
+        fewer than `number_of_articles`, so failed links are replaced. one
+        `None` per worker is queued once links run out or enough articles
+        are saved
+
+        Parameters
+        ----------
+        queue : asyncio.Queue
+            links waiting to be downloaded, `None` marks the end
+        executor : concurrent.futures.Executor
+            executor used for blocking network calls
+        handled : asyncio.Event
+            set by workers every time they are done with a link
+        """
+        import asyncio
+        loop = asyncio.get_running_loop()
+
+        async def wait_for_room():
+            while True:
+                room = self._room_for_links()
+                if room is not None:
+                    return room > 0
+                handled.clear()
+                await handled.wait()
+
+        self._in_flight = 0
+        pending = self._pending_links()
+        pages = self._listing_pages()
+        while await wait_for_room():
+            page = await loop.run_in_executor(executor, next, pages, None)
+            if page is None:
+                break
+            articles_links = pending + self._new_links(page[0])
+            pending = []
+            for link in articles_links:
+                if not await wait_for_room():
+                    break
+                self._in_flight = self._in_flight + 1
+                await queue.put(link)
+        for _ in range(self.concurrency):
+            await queue.put(None)
+
+    async def _async_worker(self, queue: 'asyncio.Queue', executor,
+                            parse_pool, handled: 'asyncio.Event'):
+        """download, extract and save articles until `None` is received
+
+        articles that can't be downloaded or extracted are recorded as
+        failed, errors of the writer are raised
+
+        Parameters
+        ----------
+        queue : asyncio.Queue
+            links waiting to be downloaded
+        executor : concurrent.futures.Executor
+            executor used for blocking network calls
+        parse_pool : concurrent.futures.ProcessPoolExecutor
+            executor used to extract article text from raw bytes
+        handled : asyncio.Event
+            set every time a link is saved or failed
+        """
+        import asyncio
+        loop = asyncio.get_running_loop()
         while True:
-            articles_links, bs4_object = \
-                self._extract_article_links(self.current_page_url)
+            link = await queue.get()
+            if link is None:
+                break
+            try:
+                try:
+                    if self._use_streaming():
+                        text = await loop.run_in_executor(
+                            executor, self._stream_article_body, link)
+                    else:
+                        page_content, encode = await loop.run_in_executor(
+                            executor, self._fetch_article, link)
+                        with self.metrics.timer('extract'):
+                            result = await loop.run_in_executor(
+                                parse_pool, parsing.extract_article,
+                                page_content, encode, self.article_body_css,
+                                self.parser, self.extractor, self.json_ld)
+                        text = self._extracted(link, result)
+                except Exception as ex:
+                    self._article_failed(link, ex)
+                    continue
+                if self.internal_counter > self.number_of_articles:
+                    continue
+                if self._store_article(text, link) and \
+                        self.internal_counter % 500 == 0:
+                    logging.info(
+                        'stored files : {}.'.format(self.internal_counter))
+            finally:
+                self._in_flight = self._in_flight - 1
+                handled.set()
+
+    def _run_single_thread(self):
+        """Summary
+        """
+        pending = self._pending_links()
+        for articles_links, _ in self._listing_pages():
+            articles_links = pending + self._new_links(articles_links)
+            pending = []
 
             for link in articles_links:
                 if self.internal_counter > self.number_of_articles:
                     break
                 try:
                     temp = self._extract_article_body(link)
-                    self.internal_counter = self.internal_counter + 1
-                    self._save_to_file(temp)
-
-                    if self.internal_counter % 500 == 0:
+                    if self._store_article(temp, link) and \
+                            self.internal_counter % 500 == 0:
                         logging.info(
                             'stored files : {}.'.format(self.internal_counter))
                 except Exception as ex:
-                    self._exception_handler(ex)
+                    self._article_failed(link, ex)
                     continue
-            if self.internal_counter >= self.number_of_articles:
+            if self.internal_counter > self.number_of_articles:
                 break
-            # get next link
-            self.current_page_url = \
-                self._extract_elements(self.next_page_css,
-                                       bs4_object=bs4_object,
-                                       attributes=['href'])[0]
-            if self.current_page_url[0] == '/':
-                import re
-                pattern = re.compile(self.website_base_url_regexp)
-                match_obj = re.match(pattern=pattern, string=self.base_url)
-                aux_url = match_obj.group()
-                # check for urls now
-                self.current_page_url = aux_url + self.current_page_url
+
+    def _check_gevent_ssl(self):
+        """make sure gevent patched `ssl` before it was imported
+
+        gevent can't patch `ssl` once it was imported, by requests as soon
+        as the crawler is created, every https request made after a late
+        patch fails with RecursionError. http listing pages may link or
+        redirect to https articles, so any site needs the early patch
+
+        Raises
+        ------
+        ValueError
+            if `ssl` was imported unpatched
+        """
+        import sys
+        from gevent import monkey
+        if 'ssl' not in sys.modules or monkey.is_module_patched('ssl'):
+            pass
+        else:
+            raise ValueError(
+                'multi_thread needs gevent to patch ssl before it is '
+                'imported, call gevent.monkey.patch_all(thread=False, '
+                'select=False) before importing net_modules, or use '
+                'run_async')
 
     def _multi_thread(self):
+        """crawl with gevent greenlets
+
+        listing pages feed a bounded queue of article links, `concurrency`
+        greenlets each download, extract and save one article at a time, so
+        memory holds at most `concurrency` article bodies and every article
+        is written as soon as its text is extracted. the first greenlet to
+        fail, e.g. a worker whose article could not be written, kills the
+        others and its exception is raised
+        """
+        # gevent only patches the process when this mode is actually used,
+        # real threads are left alone for the parse pool
+        from gevent import monkey
+        monkey.patch_all(thread=False, select=False)
+        import gevent
+        import gevent.event
+        import gevent.pool
+        import gevent.queue
+
+        def fetch_listing_pages(urls):
+            # greenlets, real threads don't mix with gevent
+            return gevent.pool.Pool(len(urls)).map(
+                self._extract_listing_page, urls)
+
+        queue = gevent.queue.Queue(maxsize=self.concurrency * 2)
+        handled = gevent.event.Event()
+        self.metrics.gauge_function('article_queue', queue.qsize,
+                                    **self.metrics_labels)
+        with self._parse_executor() as parse_pool:
+            greenlets = [gevent.spawn(self._gevent_producer, queue,
+                                      fetch_listing_pages, handled)]
+            greenlets.extend(gevent.spawn(self._gevent_worker, queue,
+                                          parse_pool, handled)
+                             for _ in range(self.concurrency))
+            try:
+                gevent.joinall(greenlets, raise_error=True)
+            finally:
+                gevent.killall(greenlets)
+                self.metrics.gauge_function('article_queue', None,
+                                            **self.metrics_labels)
+
+    def _gevent_producer(self, queue, fetch_listing_pages, handled):
+        """walk listing pages and feed article links into `queue`
+
+        links are handed out like in `_async_producer`
+
+        Parameters
+        ----------
+        queue : gevent.queue.Queue
+            links waiting to be downloaded, `None` marks the end
+        fetch_listing_pages : callable
+            maps a list of urls to `_extract_listing_page` results
+        handled : gevent.event.Event
+            set by workers every time they are done with a link
         """
+        def wait_for_room():
+            while True:
+                room = self._room_for_links()
+                if room is not None:
+                    return room > 0
+                handled.clear()
+                handled.wait()
+
+        self._in_flight = 0
+        pending = self._pending_links()
+        pages = self._listing_pages(fetch_listing_pages)
+        while wait_for_room():
+            page = next(pages, None)
+            if page is None:
+                break
+            articles_links = pending + self._new_links(page[0])
+            pending = []
+            for link in articles_links:
+                if not wait_for_room():
+                    break
+                self._in_flight = self._in_flight + 1
+                queue.put(link)
+        for _ in range(self.concurrency):
+            queue.put(None)
+
+    def _room_for_links(self):
+        """number of links producers may hand out now
+
+        Returns
+        -------
+        int or None
+            0 once `number_of_articles` articles are saved, None while
+            links in flight may still fill the quota
         """
+        room = self.number_of_articles - (self.internal_counter - 1) - \
+            self._in_flight
+        if room > 0 or self._in_flight == 0:
+            return max(room, 0)
+        return None
+
+    def _gevent_worker(self, queue, parse_pool, handled):
+        """download, extract and save articles until `None` is received
+
+        articles that can't be downloaded or extracted are recorded as
+        failed, errors of the writer are raised
+
+        Parameters
+        ----------
+        queue : gevent.queue.Queue
+            links waiting to be downloaded
+        parse_pool : concurrent.futures.ProcessPoolExecutor
+            executor used to extract article text from raw bytes
+        handled : gevent.event.Event
+            set every time a link is saved or failed
+        """
+        import gevent
+        hub = gevent.get_hub()
         while True:
-            articles_links, bs4_object = \
-                self._extract_article_links(self.current_page_url)
-            urls = (grequests.get(link) for link in articles_links)
-
-            bodies = []
-            for body in grequests.map(urls):
-                bodies.append(str(body.content, encoding=body.encoding))
-            chucked_list = chunked(bodies, 3)
-            bodies = []
-            threads = []
-            lock_obj = threading.Lock()
-            for chunk in chucked_list:
-                threads.append(
-                    threading.Thread(
-                        target=self._mt_helper,
-                        args=(chunk, bodies, lock_obj)
-                    )
-                )
-                threads[-1].start()
-            for th in threads:
-                th.join()  # busy wait
-
-            for body in bodies:
-                self._save_to_file(body)
-                self.internal_counter = self.internal_counter + 1
+            link = queue.get()
+            if link is None:
+                break
+            try:
+                try:
+                    if self._use_streaming():
+                        text = self._stream_article_body(link)
+                    else:
+                        page_content, encode = self._fetch_article(link)
+                        with self.metrics.timer('extract'):
+                            future = parse_pool.submit(
+                                parsing.extract_article, page_content,
+                                encode, self.article_body_css, self.parser,
+                                self.extractor, self.json_ld)
+                            page_content = None
+                            # wait in a real thread so other greenlets keep
+                            # downloading meanwhile
+                            text = self._extracted(
+                                link, hub.threadpool.apply(future.result))
+                except Exception as ex:
+                    self._article_failed(link, ex)
+                    continue
                 if self.internal_counter > self.number_of_articles:
-                    break
-                elif self.internal_counter % 500 == 0:
+                    continue
+                if self._store_article(text, link) and \
+                        self.internal_counter % 500 == 0:
                     logging.info(
                         'stored files : {}.'.format(self.internal_counter))
+            finally:
+                self._in_flight = self._in_flight - 1
+                handled.set()
 
-            if self.internal_counter >= self.number_of_articles:
-                break
-            # get next link
-            self.current_page_url = \
-                self._extract_elements(self.next_page_css,
-                                       bs4_object=bs4_object,
-                                       attributes=['href'])[0]
-            if self.current_page_url[0] == '/':
-                import re
-                pattern = re.compile(self.website_base_url_regexp)
-                match_obj = re.match(pattern=pattern, string=self.base_url)
-                aux_url = match_obj.group()
-                # check for urls now
-                self.current_page_url = aux_url + self.current_page_url
-
-    def _mt_helper(self, links: list, bodies: list, lock: threading.Lock):
+    def _listing_pages(self, fetch_many=None):
+        """walk listing pages from `current_page_url`
+
+        `current_page_url` moves to the next page, and is checkpointed, when
+        the following page is requested. pages following `listing_template`
+        are fetched `listing_prefetch` at a time
+
+        Parameters
+        ----------
+        fetch_many : callable, optional
+            maps a list of urls to `_extract_listing_page` results, threads
+            are used if not passed
+
+        the walk ends on a failed or empty page, a missing or already visited
+        next page, or when `_new_links` found fewer than `min_page_yield`
+        new articles per page on the last `stale_pages` pages
+
+        Yields
+        ------
+        Tuple[list, bs4.BeautifulSoup]
+            article links and parsed listing page
+        """
+        walk = self._page_walk = pagination.PageWalk(self.min_page_yield,
+                                                     self.stale_pages)
+        template = pagination.PageTemplate(self.listing_template) \
+            if self.listing_template else None
+        while True:
+            page = template.page_of(self.current_page_url) \
+                if template is not None else None
+            if page is not None:
+                yield from self._predicted_listing_pages(
+                    template, page, fetch_many or self._fetch_listing_pages)
+                return
+            if not walk.visit(self.current_page_url):
+                return
+            articles_links, bs4_object = \
+                self._extract_article_links(self.current_page_url)
+            if bs4_object is None:
+                walk.stop(pagination.STOP_FAILED)
+                return
+            if not articles_links:
+                walk.stop(pagination.STOP_EMPTY)
+                return
+            yield articles_links, bs4_object
+            if walk.exhausted():
+                return
+            next_url = self._next_page_url(bs4_object)
+            if next_url is None:
+                walk.stop(pagination.STOP_LAST_PAGE)
+                return
+            if template is None and self.predict_pages:
+                template = pagination.detect_template(self.current_page_url,
+                                                      next_url)
+                if template is not None:
+                    logging.info('listing pages follow {}'.format(
+                        template.template))
+            self.current_page_url = next_url
+            self._checkpoint_page()
+
+    def _predicted_listing_pages(self, template, page, fetch_many):
         """Summary
 
         Parameters
         ----------
-        links : list
-            Description
-        bodies : list
-            Description
-        lock : threading.Lock
-            Description
+        template : pagination.PageTemplate
+            template `current_page_url` follows
+        page : int
+            page number of `current_page_url`
+        fetch_many : callable
+            maps a list of urls to `_extract_listing_page` results
+
+        Yields
+        ------
+        Tuple[list, bs4.BeautifulSoup]
+            article links and parsed listing page
+        """
+        walk = self._page_walk
+        while True:
+            urls = [template.url(page + i * template.step)
+                    for i in range(self.listing_prefetch)]
+            for url, (articles_links, bs4_object) in zip(urls,
+                                                        fetch_many(urls)):
+                if articles_links is None:
+                    walk.stop(pagination.STOP_FAILED)
+                    return
+                if not articles_links:
+                    # pages past the last one are missing or empty
+                    walk.stop(pagination.STOP_LAST_PAGE)
+                    return
+                walk.visit(url)
+                yield articles_links, bs4_object
+                if walk.exhausted():
+                    return
+                page = page + template.step
+                self.current_page_url = template.url(page)
+                self._checkpoint_page()
+
+    def _fetch_listing_pages(self, urls):
+        """fetch listing pages concurrently
+
+        Parameters
+        ----------
+        urls : list
+
+        Returns
+        -------
+        list
+            `_extract_listing_page` result of each url, in order
         """
-        for link in links:
+        with ThreadPoolExecutor(max_workers=len(urls)) as executor:
+            return list(executor.map(self._extract_listing_page, urls))
+
+    def _extract_listing_page(self, url):
+        """`_extract_article_links` of a predicted page, which may not exist
+
+        Parameters
+        ----------
+        url : str
+
+        Returns
+        -------
+        Tuple[list, bs4.BeautifulSoup]
+            `([], None)` if the page is missing, `(None, None)` if it failed
+        """
+        return self._extract_article_links(url, missing_ok=True)
+
+    def _next_page_url(self, bs4_object):
+        """find url of the next listing page
+
+        Parameters
+        ----------
+        bs4_object : bs4.BeautifulSoup
+            parsed listing page
+
+        Returns
+        -------
+        str or None
+            canonical url of the next listing page, None on the last page
+        """
+        next_urls = self._extract_elements(self.next_page_css,
+                                           bs4_object=bs4_object,
+                                           attributes=['href'])
+        if not next_urls:
+            return None
+        return urls.resolve(self.current_page_url, next_urls[0])
+
+    @contextlib.contextmanager
+    def _crawl_session(self, threaded_writer=True):
+        """open frontier and output writer for the duration of a crawl
+
+        Parameters
+        ----------
+        threaded_writer : bool, optional
+            write articles from a background thread or from the crawling one
+        """
+        if self.cache_dir is not None and self.fetcher.cache is None:
+            from net_modules.cache import HttpCache
+            self.fetcher.set_cache(HttpCache(self.cache_dir, self.cache_size))
+        if self.politeness and self.fetcher.scheduler is None:
+            from net_modules.politeness import HostScheduler
+            self.fetcher.set_scheduler(HostScheduler(
+                max_concurrency=self.host_concurrency, rate=self.host_rate))
+        if self.dead_letters is None or \
+                self.dead_letters.path != self.dead_letter_path:
+            self.dead_letters = retry.DeadLetters(self.dead_letter_path)
+        if self.dedup is not None:
+            dedup_path = self.dedup_path
+            if dedup_path is None and self.frontier_path is not None:
+                dedup_path = self.frontier_path + '.simhash.jsonl'
+            self._dedup_index = dedup_index.SimHashIndex(self.dedup_distance,
+                                                         dedup_path)
+        if self.fetcher.metrics is None:
+            self.fetcher.set_metrics(self.metrics)
+        reporter = None
+        if self.metrics_interval or self.metrics_path or \
+                self.metrics_port is not None:
+            reporter = crawl_metrics.Reporter(
+                self.metrics, self.metrics_interval, self.metrics_path,
+                self.metrics_port)
+            reporter.start()
+        self.stop_reason = None
+        self._page_walk = None
+        self._open_frontier()
+        try:
+            writer_class = sinks.BufferedWriter if threaded_writer \
+                else sinks.DirectWriter
+            self._writer = writer_class(
+                crawl_metrics.TimedSink(self._create_sink(), self.metrics),
+                on_written=self._records_written)
+            if threaded_writer:
+                self.metrics.gauge_function('writer_queue',
+                                            self._writer.qsize,
+                                            **self.metrics_labels)
             try:
-                lock.acquire()
-                bodies.append(self._extract_article_body(link))
-                lock.release()
-            except Exception as ex:
-                lock.acquire()
-                self._exception_handler(ex)
-                lock.release()
-        logging.debug('thread ended execute')
+                yield
+            except BaseException:
+                self._end_walk(interrupted=True)
+                raise
+            else:
+                self._end_walk()
+            finally:
+                writer, self._writer = self._writer, None
+                self.metrics.gauge_function('writer_queue', None,
+                                            **self.metrics_labels)
+                writer.close()
+        finally:
+            self._close_frontier()
+            if reporter is not None:
+                reporter.stop()
+
+    def _end_walk(self, interrupted=False):
+        """record and log why the walk over listing pages ended
+
+        Parameters
+        ----------
+        interrupted : bool, optional
+            the crawl ended with an exception
+        """
+        walk, self._page_walk = self._page_walk, None
+        if walk is None or (interrupted and walk.stop_reason is None):
+            return
+        # run modes leave the walk once enough articles are queued
+        walk.stop(pagination.STOP_QUOTA)
+        self.stop_reason = walk.stop_reason
+        logging.info('listing pages walk ended after {} pages at {}: '
+                     '{}'.format(walk.pages, self.current_page_url,
+                                 walk.stop_reason))
+
+    def _open_frontier(self):
+        """open `frontier_path` and restore crawl position stored in it
+        """
+        if self.frontier_path is None:
+            self.frontier = None
+            return
+        self.frontier = Frontier(self.frontier_path)
+        self.current_page_url = self.frontier.get_state(
+            'current_page_url', self.current_page_url)
+        self.internal_counter = self.frontier.get_state(
+            'internal_counter', self.internal_counter)
+        # configuration for `create_from_dump`, progress lives in the frontier
+        self.dump()
+
+    def _close_frontier(self):
+        """Summary
+        """
+        if self.frontier is not None:
+            self._checkpoint_page()
+            self.frontier.close()
+            self.frontier = None
+
+    def _checkpoint_page(self):
+        """store current listing page in the frontier
+
+        `internal_counter` is not stored here, it counts articles still
+        waiting in the writer too. it is stored with each written article
+        by `_records_written`, so a killed crawl numbers on from the last
+        file on disk
+        """
+        if self.frontier is not None:
+            self.frontier.set_state(current_page_url=self.current_page_url)
+
+    def _pending_links(self):
+        """links discovered by a previous run but never crawled
+
+        Returns
+        -------
+        list
+        """
+        if self.frontier is None:
+            return []
+        return self.frontier.pending()
+
+    def _new_links(self, links):
+        """drop links already seen on this or a previous run
+
+        the number of links left is the yield of the current listing page
+        checked against `min_page_yield`
+
+        Parameters
+        ----------
+        links : list
+            canonical article links of a listing page
+
+        Returns
+        -------
+        list
+        """
+        if self.frontier is None:
+            ret = [link for link in links if self._url_index.add(link)]
+        else:
+            ret = self.frontier.add(links)
+        if self._page_walk is not None:
+            self._page_walk.record(len(ret))
+        return ret
+
+    def _records_written(self, records):
+        """mark articles done, and keep their fingerprints, once they are
+        on disk
+
+        Parameters
+        ----------
+        records : list of sinks.Record
+            written records, in crawl order
+        """
+        if self._dedup_index is not None:
+            self._dedup_index.persist(
+                record.url or str(record.counter) for record in records)
+        if self.frontier is not None:
+            for record in records:
+                if record.url is not None:
+                    self.frontier.mark_done(
+                        record.url, internal_counter=record.counter + 1)
+        if self._on_records_written is not None:
+            self._on_records_written(records)
+
+    def _article_failed(self, link, error):
+        """record a page that failed for good, the crawl goes on
+
+        Parameters
+        ----------
+        link : str
+            page that could not be crawled
+        error : Exception or str
+            reason of failure
+        """
+        self.metrics.inc('failed_articles_total',
+                         kind=retry.classify_exception(error)
+                         if isinstance(error, Exception) else retry.OTHER)
+        if isinstance(error, retry.FetchError):
+            # retries are exhausted, a traceback would add nothing
+            logging.warning(error)
+        else:
+            self._exception_handler(error)
+        if self.dead_letters is not None:
+            self.dead_letters.add(link, error)
+        if self.frontier is not None:
+            self.frontier.mark_failed(link, error=str(error))
+
+    def _parse_executor(self):
+        """process pool running `parsing.extract_article`
+
+        workers are spawned rather than forked, the parent process already
+        runs network threads when parsing starts
+
+        Returns
+        -------
+        concurrent.futures.ProcessPoolExecutor
+            or a context leaving a shared pool open
+        """
+        if self._parse_pool is not None:
+            return contextlib.nullcontext(self._parse_pool)
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+        workers = self.parse_workers or parsing.default_workers()
+        return ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context('spawn'))
 
     def _check_attributes(self):
         """Summary
@@ -283,9 +1296,17 @@ class ArticleCrawler:
         bool
             Description
         """
+        # extractor
+        if self.extractor in parsing.EXTRACTORS:
+            pass
+        else:
+            raise ValueError('extractor must be one of {}'.format(
+                parsing.EXTRACTORS))
         # article_body_css
         if isinstance(self.article_body_css, list) or isinstance(self.article_body_css, str):
             pass
+        elif self.article_body_css is None and self.extractor == 'density':
+            pass
         else:
             raise ValueError('article_body_css must be either str or list')
         # article_link_css
@@ -319,6 +1340,93 @@ class ArticleCrawler:
             pass
         else:
             raise ValueError('multi_thread must be bool')
+        # concurrency
+        if isinstance(self.concurrency, int) and self.concurrency > 0:
+            pass
+        else:
+            raise ValueError('concurrency must be positive int')
+        # parser
+        if self.parser in parsing.available_parsers():
+            pass
+        else:
+            raise ValueError('parser must be one of {}'.format(
+                parsing.available_parsers()))
+        # parse_workers
+        if self.parse_workers is None or (
+                isinstance(self.parse_workers, int) and self.parse_workers > 0):
+            pass
+        else:
+            raise ValueError('parse_workers must be positive int or None')
+        # selectors are compiled once here and reused for every page
+        for css_selectors in (self.article_link_css, self.article_body_css,
+                              self.next_page_css):
+            if css_selectors is None:
+                continue
+            try:
+                parsing.compile_selectors(css_selectors)
+            except Exception as ex:
+                raise ValueError(
+                    'invalid CSS selector {!r}: {}'.format(css_selectors, ex))
+        # cache_dir
+        if self.cache_dir is None or isinstance(self.cache_dir, str):
+            pass
+        else:
+            raise ValueError('cache_dir must be str or None')
+        # cache_size, listing_ttl
+        if isinstance(self.cache_size, int) and self.cache_size > 0:
+            pass
+        else:
+            raise ValueError('cache_size must be positive int')
+        if isinstance(self.listing_ttl, (int, float)) and self.listing_ttl >= 0:
+            pass
+        else:
+            raise ValueError('listing_ttl must be non-negative number')
+        # politeness
+        if isinstance(self.politeness, bool):
+            pass
+        else:
+            raise ValueError('politeness must be bool')
+        if isinstance(self.host_concurrency, int) and self.host_concurrency > 0:
+            pass
+        else:
+            raise ValueError('host_concurrency must be positive int')
+        if self.host_rate is None or (
+                isinstance(self.host_rate, (int, float)) and self.host_rate > 0):
+            pass
+        else:
+            raise ValueError('host_rate must be positive number or None')
+        # stream_body
+        if isinstance(self.stream_body, bool):
+            pass
+        else:
+            raise ValueError('stream_body must be bool')
+        # output_format
+        if self.output_format in sinks.OUTPUT_FORMATS:
+            pass
+        else:
+            raise ValueError('output_format must be one of {}'.format(
+                sinks.OUTPUT_FORMATS))
+        # shard_size
+        if isinstance(self.shard_size, int) and self.shard_size > 0:
+            pass
+        else:
+            raise ValueError('shard_size must be positive int')
+        # compression
+        if self.compression in sinks.COMPRESSIONS:
+            pass
+        else:
+            raise ValueError('compression must be one of {}'.format(
+                sinks.COMPRESSIONS))
+        if self.output_format in ('shards', 'store') and \
+                self.compression == 'zstd':
+            try:
+                import zstandard  # noqa: F401
+            except ImportError:
+                raise ValueError('zstd compression needs zstandard package')
+        if self.stream_body and not self._use_streaming():
+            logging.warning('article_body_css {!r} can not be streamed, '
+                            'articles will be downloaded completely'.format(
+                                self.article_body_css))
         # next_page_css
         if isinstance(self.next_page_css, list) or isinstance(self.next_page_css, str):
             pass
@@ -329,6 +1437,92 @@ class ArticleCrawler:
             pass
         else:
             raise ValueError('number_of_articles must be int')
+        # listing_template, predict_pages, listing_prefetch
+        if self.listing_template is None or (
+                isinstance(self.listing_template, str) and
+                self.listing_template.count(pagination.PAGE_FIELD) == 1):
+            pass
+        else:
+            raise ValueError('listing_template must be str containing {} '
+                             'once or None'.format(pagination.PAGE_FIELD))
+        if isinstance(self.predict_pages, bool):
+            pass
+        else:
+            raise ValueError('predict_pages must be bool')
+        if isinstance(self.listing_prefetch, int) and self.listing_prefetch > 0:
+            pass
+        else:
+            raise ValueError('listing_prefetch must be positive int')
+        # json_ld, article_url_template
+        if isinstance(self.json_ld, bool):
+            pass
+        else:
+            raise ValueError('json_ld must be bool')
+        if self.article_url_template is None:
+            pass
+        elif isinstance(self.article_url_template, str):
+            try:
+                urls.variant('http://example.com/a?b=c',
+                             self.article_url_template)
+            except (KeyError, IndexError, ValueError):
+                raise ValueError('article_url_template may only use {} '
+                                 'fields'.format(urls.VARIANT_FIELDS))
+        else:
+            raise ValueError('article_url_template must be str or None')
+        # min_page_yield, stale_pages
+        if isinstance(self.min_page_yield, (int, float)) and \
+                self.min_page_yield >= 0:
+            pass
+        else:
+            raise ValueError('min_page_yield must be non-negative number')
+        if isinstance(self.stale_pages, int) and self.stale_pages > 0:
+            pass
+        else:
+            raise ValueError('stale_pages must be positive int')
+        # dedup
+        if self.dedup in (None, 'skip', 'tag'):
+            pass
+        else:
+            raise ValueError("dedup must be 'skip', 'tag' or None")
+        if self.dedup == 'tag' and self.output_format in ('files', 'store'):
+            raise ValueError("dedup='tag' needs jsonl or shards output")
+        if isinstance(self.dedup_distance, int) and \
+                0 <= self.dedup_distance < dedup_index.BITS // 2:
+            pass
+        else:
+            raise ValueError('dedup_distance must be int in [0, {})'.format(
+                dedup_index.BITS // 2))
+        if self.dedup_path is None or isinstance(self.dedup_path, str):
+            pass
+        else:
+            raise ValueError('dedup_path must be str or None')
+        # metrics_interval, metrics_path, metrics_port
+        if self.metrics_interval is None or (
+                isinstance(self.metrics_interval, (int, float)) and
+                self.metrics_interval > 0):
+            pass
+        else:
+            raise ValueError('metrics_interval must be positive number or '
+                             'None')
+        if self.metrics_path is None or isinstance(self.metrics_path, str):
+            pass
+        else:
+            raise ValueError('metrics_path must be str or None')
+        if self.metrics_port is None or isinstance(self.metrics_port, int):
+            pass
+        else:
+            raise ValueError('metrics_port must be int or None')
+        # max_attempts
+        if isinstance(self.max_attempts, int) and self.max_attempts > 0:
+            pass
+        else:
+            raise ValueError('max_attempts must be positive int')
+        # dead_letter_path
+        if self.dead_letter_path is None or \
+                isinstance(self.dead_letter_path, str):
+            pass
+        else:
+            raise ValueError('dead_letter_path must be str or None')
 
         return True
 
@@ -370,6 +1564,7 @@ class ArticleCrawler:
                 "css_selector must be either str or list of str"
             ).with_traceback(tb)
 
+        import bs4
         if isinstance(bs4_object, bs4.BeautifulSoup):
             return self._extract_elements_from_bs4(css_selectors=css_selectors,
                                                    bs4_object=bs4_object,
@@ -390,7 +1585,7 @@ class ArticleCrawler:
 
     @staticmethod
     def _extract_elements_from_bs4(css_selectors: list,
-                                   bs4_object: bs4.BeautifulSoup,
+                                   bs4_object: 'bs4.BeautifulSoup',
                                    attributes=None):
         """Summary
 
@@ -413,21 +1608,18 @@ class ArticleCrawler:
         TypeError
             Description
         """
-        ret = []
         if attributes is None:
-            for css_selector in css_selectors:
-                ret = ret + bs4_object.select(css_selector)
+            return list(parsing.iter_elements(css_selectors, bs4_object))
         elif not isinstance(attributes, list):
             tb = sys.exc_info()[2]
             raise TypeError(
                 "attributes must be list object"
             ).with_traceback(tb)
         else:
-            for css_selector in css_selectors:
-                for elem in bs4_object.select(css_selector):
-                    for attribute in attributes:
-                        ret.append(elem[attribute])
-        return ret
+            return [elem[attribute]
+                    for elem in parsing.iter_elements(css_selectors,
+                                                      bs4_object)
+                    for attribute in attributes]
 
     def _extract_elements_from_str(self, css_selectors: list,
                                    html_doc: str, attributes):
@@ -447,49 +1639,67 @@ class ArticleCrawler:
         TYPE
             Description
         """
+        import bs4
         bs4_object = bs4.BeautifulSoup(html_doc, 'html.parser')
         return self._extract_elements_from_bs4(css_selectors=css_selectors,
                                                bs4_object=bs4_object,
                                                attributes=attributes)
 
-    def _extract_article_links(self, url):
+    def _extract_article_links(self, url, missing_ok=False):
         """Summary
 
         Parameters
         ----------
         url : TYPE
             Description
+        missing_ok : bool, optional
+            a 4xx response is expected, e.g. past the last page, and only
+            logged as info
 
         Returns
         -------
-        TYPE
-            Description
+        Tuple[list, bs4.BeautifulSoup]
+            canonical article links and parsed listing page, `(None, None)`
+            if the page failed and `([], None)` if it is missing
 
         Deleted Parameters
         ------------------
         css_selectors : TYPE
             Description
         """
+        import bs4
         try:
-            html_doc, encode = get_url_contents(url)
-            bs4_object = bs4.BeautifulSoup(html_doc, 'html.parser')
-
-            links = self._extract_elements(
-                self.article_link_css, bs4_object=bs4_object, attributes=['href'])
-            import re
-            pattern = re.compile(self.website_base_url_regexp)
-            match_obj = re.match(pattern=pattern, string=self.base_url)
-            aux_url = match_obj.group()
-            # check for urls now
-
-            for (i, link) in enumerate(links):
-                # if link is relative(!) modify it!
-                if link[0] == '/':  # dummy check for now
-                    links[i] = aux_url + links[i]
+            # whole fetch of the page, cache hits included, ttfb and
+            # download are recorded by the fetcher for every request
+            with self.metrics.timer('listing'):
+                html_doc, encode = self._get_url_contents(
+                    url, max_age=self.listing_ttl)
+            with self.metrics.timer('parse'):
+                bs4_object = bs4.BeautifulSoup(html_doc, 'html.parser',
+                                               from_encoding=encode)
+
+                links = self._extract_elements(
+                    self.article_link_css, bs4_object=bs4_object,
+                    attributes=['href'])
+            self.metrics.inc('listing_pages_total')
+            # canonical urls, each once, in page order
+            links = list(dict.fromkeys(
+                link for link in (urls.resolve(url, href) for href in links)
+                if link is not None))
             return links, bs4_object
+        except retry.FetchError as ex:
+            if missing_ok and ex.kind == retry.CLIENT:
+                logging.info('listing page {} is missing'.format(url))
+                return [], None
+            self._exception_handler(ex)
+            logging.error('listing page {} failed, crawl stops here'.format(
+                url))
+            return None, None
         except Exception as ex:
             self._exception_handler(ex)
-            return []
+            logging.error('listing page {} failed, crawl stops here'.format(
+                url))
+            return None, None
 
     def _extract_article_body(self, article_link):
         """Summary
@@ -509,43 +1719,225 @@ class ArticleCrawler:
         TYPE
             Description
         """
-        if not self.multi_thread:
-            page_content, encode = get_url_contents(article_link)
-            page_content = str(page_content, encoding=encode)
-        else:
-            page_content = article_link
-        page_content = bs4.BeautifulSoup(page_content, 'html.parser')
-        page_content = self._extract_elements(
-            self.article_body_css, bs4_object=page_content)
-        ret = ''
-        for item in page_content:
-            ret = ret + item.get_text()
-        return ret
+        if self._use_streaming():
+            return self._stream_article_body(article_link)
+        page_content, encode = self._fetch_article(article_link)
+        return self._extract_article_text(page_content, encode, article_link)
 
-    def _save_to_file(self, content):
+    def _use_streaming(self):
         """Summary
 
+        Returns
+        -------
+        bool
+            whether articles are extracted while streaming
+        """
+        return self.stream_body and self.extractor != 'density' and \
+            streaming.is_streamable(self.article_body_css)
+
+    def _stream_article_body(self, article_link):
+        """extract article text while downloading it
+
+        with id selectors the connection is dropped once the body element
+        ends, so footers and comments are never transferred
+
         Parameters
         ----------
-        content : TYPE
-            Description
+        article_link : str
+            link to article
 
-        Deleted Parameters
-        ------------------
-        number : TYPE
-            Description
+        Returns
+        -------
+        str
+            aggregated inner text of matching elements
         """
-        pad_len = len(str(self.number_of_articles))
-        if not self.create_dir == '':
-            base_dir = self.create_dir + '/' + self.file_names_prefix
-        else:
-            base_dir = self.file_names_prefix
+        response = self._fetch_article(article_link, stream=True)
+        try:
+            with self.metrics.timer('stream'):
+                chunks = response.iter_content(chunk_size=8192)
+                # a `<meta charset>` is looked for in the first chunk
+                first = next(chunks, b'')
+                encode = self.fetcher.encodings.resolve(
+                    response.url, response.headers, first)
+                text, _ = streaming.stream_extract_text(
+                    itertools.chain([first], chunks), encode,
+                    self.article_body_css)
+        finally:
+            if hasattr(response.raw, 'tell'):
+                self.metrics.inc('bytes_total', response.raw.tell())
+            response.close()
+        if not text.strip() and self.extractor == 'fallback':
+            # the whole page is needed to score its blocks
+            page_content, encode = self._fetch_article(article_link)
+            return self._extract_article_text(page_content, encode,
+                                              article_link)
+        return text
 
-        file_name = f'{base_dir}_{self.internal_counter:0{pad_len}}.txt'
-        # print(file_name)
-        with open(file_name, mode='w+',
-                  encoding=self.encode) as f:
-            f.write(content)
+    def _fetch_article(self, article_link, stream=False):
+        """download an article, from its light version if there is one
+
+        Parameters
+        ----------
+        article_link : str
+            canonical link to article
+        stream : bool, optional
+            return the streamed response instead of the whole body
+
+        Returns
+        -------
+        Tuple[bytes, str] or requests.Response
+            article page and its encode, or the response being streamed
+        """
+        fetch = self.fetcher.stream if stream else self._get_url_contents
+        if self.article_url_template is not None:
+            light_link = urls.variant(article_link, self.article_url_template)
+            try:
+                return fetch(light_link)
+            except retry.FetchError as ex:
+                self.metrics.inc('light_version_failures_total')
+                logging.info('{} failed ({}), downloading {}'.format(
+                    light_link, ex, article_link))
+        return fetch(article_link)
+
+    def _get_url_contents(self, link, max_age=None):
+        """`get_url_contents` through this crawler's fetcher
+
+        Parameters
+        ----------
+        link : str
+            link to web page
+        max_age : int, optional
+            seconds a cached copy stays fresh, forever if not passed
+
+        Returns
+        -------
+        Tuple[bytes, str]
+            web-page as a bytes and its encode
+        """
+        return get_url_contents(link, fetcher=self.fetcher, max_age=max_age)
+
+    def _extract_article_text(self, page_content, encode=None, link=None):
+        """extract article text from a downloaded article, see `extractor`
+
+        Parameters
+        ----------
+        page_content : bytes or str
+            html of article page
+        encode : str, optional
+            encoding of `page_content` if it is bytes
+        link : str, optional
+            link to article, for logs
+
+        Returns
+        -------
+        str
+            aggregated inner text of matching elements
+        """
+        with self.metrics.timer('extract'):
+            return self._extracted(link, parsing.extract_article(
+                page_content, encode, self.article_body_css, self.parser,
+                self.extractor, self.json_ld))
+
+    def _extracted(self, link, result):
+        """count JSON-LD texts, fallbacks to text density and empty articles
+
+        Parameters
+        ----------
+        link : str or None
+            link to article
+        result : Tuple[str, str]
+            `parsing.extract_article` result
+
+        Returns
+        -------
+        str
+            article text
+        """
+        text, method = result
+        if method == 'json-ld':
+            self.metrics.inc('json_ld_articles_total')
+        elif method == 'density' and self.extractor == 'fallback':
+            self.metrics.inc('extraction_fallbacks_total')
+            if not self._fallback_warned:
+                self._fallback_warned = True
+                logging.warning(
+                    'article_body_css {!r} matched nothing on {}, text '
+                    'density is used instead, the selector may be '
+                    'stale'.format(self.article_body_css, link))
+        if not text.strip():
+            self.metrics.inc('empty_articles_total')
+            logging.warning('no article text found on {}'.format(link))
+        return text
+
+    def _store_article(self, content, link=None):
+        """save an article and move `internal_counter`, unless it is a
+        near-duplicate to skip
+
+        Parameters
+        ----------
+        content : str
+            article text
+        link : str, optional
+            article link
+
+        Returns
+        -------
+        bool
+            whether the article was saved
+        """
+        duplicate_of = None
+        if self.dedup is not None and self._dedup_index is not None:
+            duplicate_of = self._dedup_index.check_and_add(
+                content, link or str(self.internal_counter))
+        if duplicate_of is not None and self.dedup == 'skip':
+            logging.info('{} skipped, near-duplicate of {}'.format(
+                link, duplicate_of))
+            self.metrics.inc('duplicates_total')
+            if self.frontier is not None and link is not None:
+                self.frontier.mark_done(link)
+            return False
+        self._save_to_file(content, link, duplicate_of)
+        self.internal_counter = self.internal_counter + 1
+        return True
+
+    def _save_to_file(self, content, link=None, duplicate_of=None):
+        """store an article with the current `internal_counter`
+
+        during a crawl the article is queued to the writer thread, otherwise
+        it is written immediately
+
+        Parameters
+        ----------
+        content : str
+            article text
+        link : str, optional
+            article link
+        duplicate_of : str, optional
+            link of a near-duplicate stored before
+        """
+        record = sinks.Record(self.internal_counter, link, content,
+                              time.time(), duplicate_of)
+        if self._writer is not None:
+            self._writer.put(record)
+            return
+        sink = self._create_sink()
+        try:
+            sink.write_batch([record])
+        finally:
+            sink.close()
+        self._records_written([record])
+
+    def _create_sink(self):
+        """Summary
+
+        Returns
+        -------
+        sink of `output_format`, see `sinks.create_sink`
+        """
+        return sinks.create_sink(self.output_format, self.create_dir,
+                                 self.file_names_prefix,
+                                 self.number_of_articles, self.encode,
+                                 self.shard_size, self.compression)
 
     def _create_output_dir(self):
         """Summary
@@ -554,11 +1946,18 @@ class ArticleCrawler:
         if not os.path.exists(self.create_dir):
             os.mkdir(self.create_dir)
 
-    def dump(self):
+    def dump(self, json_dump=None):
         """dump attributes on disk
+
+        Parameters
+        ----------
+        json_dump : str, optional
+            file name or path of the json file, replaced atomically,
+            `dump_path` if not passed
         """
-        import pandas as pd
-        dt = pd.Series()
+        import os
+        import json
+        dt = {}
         dt['multi_thread'] = self.multi_thread
         dt['article_body_css'] = self.article_body_css
         dt['article_link_css'] = self.article_link_css
@@ -571,19 +1970,29 @@ class ArticleCrawler:
         dt['current_page_url'] = self.current_page_url
         dt['internal_counter'] = self.internal_counter
         dt['number_of_articles'] = self.number_of_articles
+        dt['frontier_path'] = self.frontier_path
         # storing on json file
-        dt.to_json('ArticleCrawler.json')
+        if json_dump is None:
+            json_dump = self.dump_path
+        temp_path = '{}.{}.tmp'.format(json_dump, id(self))
+        with open(temp_path, mode='w', encoding='utf-8') as f:
+            json.dump(dt, f, ensure_ascii=False)
+        os.replace(temp_path, json_dump)
 
-    def create_from_dump(self, json_dump='ArticleCrawler.json'):
+    def create_from_dump(self, json_dump=None):
         """restore attributes from disk
 
         Parameters
         ----------
         json_dump : str, optional
-            file name or path to file that contains dump file, must be json
+            file name or path to file that contains dump file, must be json,
+            `dump_path` if not passed
         """
-        import pandas as pd
-        dt = pd.read_json(json_dump, orient='records', typ='series')
+        import json
+        if json_dump is None:
+            json_dump = self.dump_path
+        with open(json_dump, encoding='utf-8') as f:
+            dt = json.load(f)
         self.multi_thread = dt['multi_thread']
         self.article_body_css = dt['article_body_css']
         self.article_link_css = dt['article_link_css']
@@ -596,6 +2005,7 @@ class ArticleCrawler:
         self.current_page_url = dt['current_page_url']
         self.internal_counter = dt['internal_counter']
         self.number_of_articles = dt['number_of_articles']
+        self.frontier_path = dt.get('frontier_path')
 
     def _exception_handler(self, exception: Exception):
         """Summary
@@ -606,4 +2016,6 @@ class ArticleCrawler:
             Description
         """
         logging.exception(exception, exc_info=True)
-        self.dump()
+        if self.frontier is None:
+            # with a frontier progress is already on disk
+            self.dump()
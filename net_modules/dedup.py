@@ -0,0 +1,240 @@
+"""near-duplicate detection of article texts with SimHash
+
+each text is reduced to a 64 bit fingerprint of its word 3-grams, texts whose
+fingerprints differ in at most `max_distance` bits are near-duplicates. the
+index splits fingerprints in `max_distance + 1` bands, two fingerprints that
+close always share one band exactly, so a lookup only compares the few
+fingerprints found under the bands of the query
+"""
+import os
+import re
+import json
+import hashlib
+import threading
+
+BITS = 64
+_WORD = re.compile(r'\w+')
+
+
+def _shingle_hash(shingle):
+    """Summary
+
+    Parameters
+    ----------
+    shingle : str
+
+    Returns
+    -------
+    int
+        stable 64 bit hash
+    """
+    return int.from_bytes(hashlib.blake2b(shingle.encode('utf-8'),
+                                          digest_size=8).digest(), 'big')
+
+
+def simhash(text, shingle_size: int = 3):
+    """Summary
+
+    Parameters
+    ----------
+    text : str
+    shingle_size : int, optional
+        number of words per shingle
+
+    Returns
+    -------
+    int or None
+        64 bit fingerprint, None if `text` has no words
+    """
+    words = _WORD.findall(text.lower())
+    if not words:
+        return None
+    count = max(1, len(words) - shingle_size + 1)
+    hashes = [_shingle_hash(' '.join(words[i:i + shingle_size]))
+              for i in range(count)]
+    # count set bits column by column over the binary strings, much faster
+    # than masking every hash for every bit
+    ret = 0
+    for i, column in enumerate(zip(*(format(h, '064b') for h in hashes))):
+        if 2 * column.count('1') > len(hashes):
+            ret = ret | (1 << (BITS - 1 - i))
+    return ret
+
+
+def distance(a: int, b: int):
+    """number of differing bits of two fingerprints
+
+    Parameters
+    ----------
+    a : int
+    b : int
+
+    Returns
+    -------
+    int
+    """
+    return bin(a ^ b).count('1')
+
+
+class SimHashIndex:
+    """fingerprints of stored articles, optionally persisted in a json lines
+    file so a resumed crawl keeps recognising what it already stored
+
+    a fingerprint is only written to the file once `persist` is called with
+    its key, i.e. once its article is on disk, so an article lost by a
+    crash is not taken for a duplicate of itself when it is crawled again
+
+    Attributes
+    ----------
+    max_distance : int
+        largest number of differing bits of near-duplicates
+    path : str or None
+        file keeping fingerprints across runs
+    """
+
+    def __init__(self, max_distance: int = 3, path=None):
+        """Summary
+
+        Parameters
+        ----------
+        max_distance : int, optional
+            refer to class attributes
+        path : str, optional
+            refer to class attributes, existing fingerprints are loaded
+        """
+        self.max_distance = max_distance
+        self.path = path
+        self._lock = threading.Lock()
+        bands = max_distance + 1
+        width = BITS // bands
+        self._bands = [(i * width, BITS if i == bands - 1 else (i + 1) * width)
+                       for i in range(bands)]
+        self._tables = [{} for _ in self._bands]
+        self._keys = {}
+        # fingerprints added but not yet written to `path`, by key
+        self._unsaved = {}
+        if path is not None and os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self._add(int(entry['fingerprint'], 16), entry['key'])
+
+    def __len__(self):
+        return len(self._keys)
+
+    def _band_values(self, fingerprint):
+        """Summary
+
+        Parameters
+        ----------
+        fingerprint : int
+
+        Returns
+        -------
+        list of int
+            bits of each band
+        """
+        return [(fingerprint >> start) & ((1 << (end - start)) - 1)
+                for start, end in self._bands]
+
+    def _add(self, fingerprint, key):
+        """lock must be held
+
+        Parameters
+        ----------
+        fingerprint : int
+        key : str
+
+        Returns
+        -------
+        bool
+            False if `fingerprint` was already known
+        """
+        if fingerprint in self._keys:
+            return False
+        self._keys[fingerprint] = key
+        for table, value in zip(self._tables, self._band_values(fingerprint)):
+            table.setdefault(value, []).append(fingerprint)
+        return True
+
+    def _query(self, fingerprint, exclude=None):
+        """lock must be held
+
+        Parameters
+        ----------
+        fingerprint : int
+        exclude : str, optional
+            key whose fingerprints are ignored
+
+        Returns
+        -------
+        str or None
+        """
+        for table, value in zip(self._tables, self._band_values(fingerprint)):
+            for candidate in table.get(value, ()):
+                if distance(candidate, fingerprint) <= self.max_distance and \
+                        self._keys[candidate] != exclude:
+                    return self._keys[candidate]
+        return None
+
+    def query(self, text):
+        """Summary
+
+        Parameters
+        ----------
+        text : str
+
+        Returns
+        -------
+        str or None
+            key of a stored near-duplicate of `text`
+        """
+        fingerprint = simhash(text)
+        if fingerprint is None:
+            return None
+        with self._lock:
+            return self._query(fingerprint)
+
+    def check_and_add(self, text, key):
+        """look `text` up and remember it unless it is a near-duplicate
+
+        Parameters
+        ----------
+        text : str
+        key : str
+            returned by later lookups of near-duplicates, e.g. article url
+
+        Returns
+        -------
+        str or None
+            key of the near-duplicate already stored under another key,
+            None if `text` is new or has no words
+        """
+        fingerprint = simhash(text)
+        if fingerprint is None:
+            return None
+        with self._lock:
+            ret = self._query(fingerprint, exclude=key)
+            if ret is None and self._add(fingerprint, key) and \
+                    self.path is not None:
+                self._unsaved[key] = fingerprint
+        return ret
+
+    def persist(self, keys):
+        """write fingerprints added under `keys` to `path`
+
+        Parameters
+        ----------
+        keys : iterable of str
+            keys of articles now on disk, unknown keys are ignored
+        """
+        with self._lock:
+            lines = [json.dumps({'fingerprint': format(fingerprint, '016x'),
+                                 'key': key}, ensure_ascii=False) + '\n'
+                     for fingerprint, key in (
+                         (self._unsaved.pop(key, None), key) for key in keys)
+                     if fingerprint is not None]
+            if lines:
+                with open(self.path, mode='a', encoding='utf-8') as f:
+                    f.writelines(lines)
@@ -0,0 +1,144 @@
+"""selector free extraction of the main text of an article page
+
+readability style: boilerplate elements are dropped, every text run of at
+least `MIN_TEXT` characters credits its enclosing blocks (the nearest one
+fully, outer ones less), and the best scored block, discounted by the share
+of its text inside links, holds the article. one pass over the text nodes
+plus a few `get_text` calls, cheap enough for every page in parse workers
+"""
+import bs4
+
+# elements never part of an article body
+BOILERPLATE = ('script', 'style', 'noscript', 'template', 'iframe', 'form',
+               'nav', 'header', 'footer', 'aside', 'button', 'select')
+# elements that enclose text runs and can hold an article
+BLOCKS = {'div', 'article', 'section', 'main', 'td', 'blockquote', 'body',
+          'p', 'pre', 'li'}
+# shortest text run worth scoring
+MIN_TEXT = 25
+# blocks above a text run credited with it, with decreasing weights
+_ANCESTOR_WEIGHTS = (1.0, 0.5, 0.25)
+_CANDIDATES = 5
+
+
+def _text_weight(text):
+    """Summary
+
+    Parameters
+    ----------
+    text : str
+        stripped text run
+
+    Returns
+    -------
+    float
+        longer runs with more clauses look more like prose
+    """
+    return 1 + text.count(',') + text.count('،') + min(len(text) / 100, 3)
+
+
+def _enclosing_blocks(string):
+    """blocks enclosing a text node, innermost first
+
+    Parameters
+    ----------
+    string : bs4.NavigableString
+
+    Returns
+    -------
+    list of bs4.element.Tag
+        empty if the text is link text
+    """
+    ret = []
+    for parent in string.parents:
+        if parent.name == 'a':
+            return []
+        if parent.name in BLOCKS:
+            # paragraphs and list items credit the block holding them
+            if parent.name in ('p', 'li', 'pre') and not ret:
+                continue
+            ret.append(parent)
+            if len(ret) == len(_ANCESTOR_WEIGHTS):
+                break
+    return ret
+
+
+def _link_density(tag, text_length):
+    """share of the text of `tag` inside links
+
+    Parameters
+    ----------
+    tag : bs4.element.Tag
+    text_length : int
+        length of the text of `tag`
+
+    Returns
+    -------
+    float
+    """
+    if not text_length:
+        return 1.0
+    link_length = sum(len(a.get_text(strip=True)) for a in tag.find_all('a'))
+    return min(1.0, link_length / text_length)
+
+
+def main_block(bs4_object):
+    """find the block holding the article
+
+    boilerplate elements are removed from `bs4_object`
+
+    Parameters
+    ----------
+    bs4_object : bs4.BeautifulSoup
+        parsed page
+
+    Returns
+    -------
+    bs4.element.Tag or None
+        None if the page has no text run of `MIN_TEXT` characters
+    """
+    for tag in bs4_object.find_all(BOILERPLATE):
+        tag.decompose()
+    scores = {}
+    for string in bs4_object.find_all(string=True):
+        if type(string) is not bs4.NavigableString:
+            # comments, doctype, CDATA
+            continue
+        text = string.strip()
+        if len(text) < MIN_TEXT:
+            continue
+        weight = _text_weight(text)
+        for block, factor in zip(_enclosing_blocks(string),
+                                 _ANCESTOR_WEIGHTS):
+            entry = scores.get(id(block))
+            if entry is None:
+                entry = scores[id(block)] = [block, 0.0]
+            entry[1] = entry[1] + weight * factor
+    if not scores:
+        return None
+    candidates = sorted(scores.values(), key=lambda entry: entry[1],
+                        reverse=True)[:_CANDIDATES]
+    best, best_score = None, -1.0
+    for block, score in candidates:
+        length = len(block.get_text(strip=True))
+        score = score * (1 - _link_density(block, length))
+        if score > best_score:
+            best, best_score = block, score
+    return best
+
+
+def main_text(bs4_object):
+    """text of the block holding the article
+
+    Parameters
+    ----------
+    bs4_object : bs4.BeautifulSoup
+        parsed page, boilerplate elements are removed from it
+
+    Returns
+    -------
+    str
+        empty if no block looks like an article
+    """
+    block = main_block(bs4_object)
+    return block.get_text() if block is not None else ''
@@ -0,0 +1,554 @@
+"""coordinator / worker crawling over a shared work queue
+
+the coordinator walks listing pages of an `ArticleCrawler` config and pushes
+article links into a queue, any number of worker processes, on this or other
+machines, pull links, extract and save articles with the same config and ack
+them. a url is queued once, whoever discovers it again.
+
+    queue = open_queue('crawl.sqlite3')      # or 'redis://host:6379/0'
+    Coordinator(ArticleCrawler(...), queue).run()
+    # elsewhere, as many times as wanted
+    Worker(ArticleCrawler(...), open_queue('crawl.sqlite3')).run()
+
+the SQLite queue works for processes sharing a file system, Redis (needs the
+`redis` package) for processes on several machines. a pulled url is leased
+for `lease` seconds, if its worker dies before acking it the url is handed
+out again
+"""
+import os
+import time
+import socket
+import sqlite3
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+QUEUED = 'queued'
+LEASED = 'leased'
+DONE = 'done'
+FAILED = 'failed'
+
+
+class SqliteWorkQueue:
+    """work queue stored in a SQLite file
+
+    Attributes
+    ----------
+    path : str
+        database file
+    lease : float
+        seconds a pulled url stays assigned to its worker
+    """
+
+    def __init__(self, path='work_queue.sqlite3', lease: float = 300):
+        """Summary
+
+        Parameters
+        ----------
+        path : str, optional
+            refer to class attributes, created if it doesn't exist
+        lease : float, optional
+            refer to class attributes
+        """
+        self.path = path
+        self.lease = lease
+        self._lock = threading.Lock()
+        # transactions are explicit, other processes write the same file
+        self._conn = sqlite3.connect(path, timeout=60,
+                                     check_same_thread=False,
+                                     isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS jobs ('
+            'url TEXT PRIMARY KEY, state TEXT NOT NULL, added REAL NOT NULL, '
+            'lease_until REAL, worker TEXT, error TEXT)')
+        self._conn.execute(
+            'CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state, added)')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value)')
+
+    def push(self, urls):
+        """queue urls never pushed before
+
+        Parameters
+        ----------
+        urls : iterable of str
+
+        Returns
+        -------
+        list
+            newly queued urls, in the given order
+        """
+        ret = []
+        now = time.time()
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                for url in urls:
+                    cursor = self._conn.execute(
+                        'INSERT OR IGNORE INTO jobs (url, state, added) '
+                        'VALUES (?, ?, ?)', (url, QUEUED, now))
+                    if cursor.rowcount:
+                        ret.append(url)
+                        now = now + 1e-6  # keeps discovery order
+                self._conn.execute('COMMIT')
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+        return ret
+
+    def pull(self, worker):
+        """lease the oldest queued url, or one whose lease expired
+
+        Parameters
+        ----------
+        worker : str
+            id of the pulling worker
+
+        Returns
+        -------
+        str or None
+            None if nothing is available right now
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                row = self._conn.execute(
+                    'SELECT url FROM jobs WHERE state = ? OR '
+                    '(state = ? AND lease_until < ?) ORDER BY added LIMIT 1',
+                    (QUEUED, LEASED, now)).fetchone()
+                if row is not None:
+                    self._conn.execute(
+                        'UPDATE jobs SET state = ?, lease_until = ?, '
+                        'worker = ? WHERE url = ?',
+                        (LEASED, now + self.lease, worker, row[0]))
+                self._conn.execute('COMMIT')
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+        return row[0] if row else None
+
+    def ack(self, urls):
+        """mark leased urls as done
+
+        Parameters
+        ----------
+        urls : iterable of str
+        """
+        self._finish(urls, DONE, None)
+
+    def fail(self, url, error=None):
+        """mark a leased url as failed for good
+
+        Parameters
+        ----------
+        url : str
+        error : str, optional
+            reason of failure
+        """
+        self._finish([url], FAILED, error)
+
+    def requeue_failed(self):
+        """Summary
+
+        Returns
+        -------
+        int
+            number of failed urls queued again
+        """
+        with self._lock:
+            return self._conn.execute(
+                'UPDATE jobs SET state = ?, error = NULL WHERE state = ?',
+                (QUEUED, FAILED)).rowcount
+
+    def close_input(self):
+        """tell workers no more urls will be pushed
+        """
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO meta (key, value) VALUES (?, 1)',
+                ('closed',))
+
+    def finished(self):
+        """Summary
+
+        Returns
+        -------
+        bool
+            whether input is closed and every url is done or failed
+        """
+        with self._lock:
+            closed = self._conn.execute(
+                'SELECT value FROM meta WHERE key = ?', ('closed',)).fetchone()
+            left = self._conn.execute(
+                'SELECT COUNT(*) FROM jobs WHERE state IN (?, ?)',
+                (QUEUED, LEASED)).fetchone()[0]
+        return closed is not None and left == 0
+
+    def counts(self):
+        """number of urls per state
+
+        Returns
+        -------
+        dict
+        """
+        with self._lock:
+            return dict(self._conn.execute(
+                'SELECT state, COUNT(*) FROM jobs GROUP BY state'))
+
+    def close(self):
+        """Summary
+        """
+        with self._lock:
+            self._conn.close()
+
+    def _finish(self, urls, state, error):
+        """Summary
+
+        Parameters
+        ----------
+        urls : iterable of str
+        state : str
+            DONE or FAILED
+        error : str or None
+        """
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                self._conn.executemany(
+                    'UPDATE jobs SET state = ?, lease_until = NULL, error = ? '
+                    'WHERE url = ?', ((state, error, url) for url in urls))
+                self._conn.execute('COMMIT')
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+
+
+# KEYS: seen, queue. pushes urls not in seen, returns them
+_PUSH_SCRIPT = """
+local ret = {}
+for i, url in ipairs(ARGV) do
+    if redis.call('SADD', KEYS[1], url) == 1 then
+        redis.call('LPUSH', KEYS[2], url)
+        ret[#ret + 1] = url
+    end
+end
+return ret
+"""
+# KEYS: queue, leases. ARGV: now, lease deadline
+_PULL_SCRIPT = """
+local url = redis.call('ZRANGEBYSCORE', KEYS[2], '-inf', ARGV[1],
+                       'LIMIT', 0, 1)[1]
+if not url then
+    url = redis.call('RPOP', KEYS[1])
+end
+if url then
+    redis.call('ZADD', KEYS[2], ARGV[2], url)
+end
+return url
+"""
+
+
+class RedisWorkQueue:
+    """`SqliteWorkQueue` counterpart stored in Redis, shared across machines
+
+    Attributes
+    ----------
+    name : str
+        prefix of the Redis keys of this queue
+    lease : float
+        seconds a pulled url stays assigned to its worker
+    """
+
+    def __init__(self, url='redis://localhost:6379/0', name='crawl',
+                 lease: float = 300):
+        """Summary
+
+        Parameters
+        ----------
+        url : str, optional
+            Redis server
+        name : str, optional
+            refer to class attributes
+        lease : float, optional
+            refer to class attributes
+        """
+        import redis
+        self.name = name
+        self.lease = lease
+        self._redis = redis.Redis.from_url(url, decode_responses=True)
+        self._push = self._redis.register_script(_PUSH_SCRIPT)
+        self._pull = self._redis.register_script(_PULL_SCRIPT)
+
+    def _key(self, suffix):
+        return '{}:{}'.format(self.name, suffix)
+
+    def push(self, urls):
+        """refer to `SqliteWorkQueue.push`
+        """
+        urls = list(urls)
+        if not urls:
+            return []
+        return self._push(keys=[self._key('seen'), self._key('queue')],
+                          args=urls)
+
+    def pull(self, worker):
+        """refer to `SqliteWorkQueue.pull`
+        """
+        now = time.time()
+        return self._pull(keys=[self._key('queue'), self._key('leases')],
+                          args=[now, now + self.lease])
+
+    def ack(self, urls):
+        """refer to `SqliteWorkQueue.ack`
+        """
+        urls = list(urls)
+        if not urls:
+            return
+        pipe = self._redis.pipeline()
+        pipe.zrem(self._key('leases'), *urls)
+        pipe.incrby(self._key('done'), len(urls))
+        pipe.execute()
+
+    def fail(self, url, error=None):
+        """refer to `SqliteWorkQueue.fail`
+        """
+        pipe = self._redis.pipeline()
+        pipe.zrem(self._key('leases'), url)
+        pipe.hset(self._key('failed'), url, error or '')
+        pipe.execute()
+
+    def requeue_failed(self):
+        """refer to `SqliteWorkQueue.requeue_failed`
+        """
+        urls = self._redis.hkeys(self._key('failed'))
+        if urls:
+            pipe = self._redis.pipeline()
+            pipe.lpush(self._key('queue'), *urls)
+            pipe.delete(self._key('failed'))
+            pipe.execute()
+        return len(urls)
+
+    def close_input(self):
+        """refer to `SqliteWorkQueue.close_input`
+        """
+        self._redis.set(self._key('closed'), 1)
+
+    def finished(self):
+        """refer to `SqliteWorkQueue.finished`
+        """
+        pipe = self._redis.pipeline()
+        pipe.exists(self._key('closed'))
+        pipe.llen(self._key('queue'))
+        pipe.zcard(self._key('leases'))
+        closed, queued, leased = pipe.execute()
+        return bool(closed) and queued == 0 and leased == 0
+
+    def counts(self):
+        """refer to `SqliteWorkQueue.counts`
+        """
+        pipe = self._redis.pipeline()
+        pipe.llen(self._key('queue'))
+        pipe.zcard(self._key('leases'))
+        pipe.get(self._key('done'))
+        pipe.hlen(self._key('failed'))
+        queued, leased, done, failed = pipe.execute()
+        return {QUEUED: queued, LEASED: leased, DONE: int(done or 0),
+                FAILED: failed}
+
+    def close(self):
+        """Summary
+        """
+        self._redis.close()
+
+
+def open_queue(location, **kwargs):
+    """open the work queue at `location`
+
+    Parameters
+    ----------
+    location : str
+        `redis://` url or path of a SQLite file
+    **kwargs
+        passed to the queue class
+
+    Returns
+    -------
+    SqliteWorkQueue or RedisWorkQueue
+    """
+    if location.startswith(('redis://', 'rediss://', 'unix://')):
+        return RedisWorkQueue(location, **kwargs)
+    return SqliteWorkQueue(location, **kwargs)
+
+
+class Coordinator:
+    """discover article links of a crawler config and queue them
+
+    Attributes
+    ----------
+    crawler : ArticleCrawler
+        config whose listing pages are walked, up to `number_of_articles`
+        links are queued
+    queue : SqliteWorkQueue or RedisWorkQueue
+    """
+
+    def __init__(self, crawler, queue):
+        """Summary
+
+        Parameters
+        ----------
+        crawler : ArticleCrawler
+            refer to class attributes
+        queue : SqliteWorkQueue or RedisWorkQueue
+            refer to class attributes
+        """
+        self.crawler = crawler
+        self.queue = queue
+
+    def run(self):
+        """walk listing pages like a crawl, then close the queue input
+
+        the walk ends for the same reasons, see `ArticleCrawler.stop_reason`
+
+        Returns
+        -------
+        int
+            number of newly queued links
+
+        Raises
+        ------
+        ValueError
+            in case any missing or invalid values for crawler parameters
+        """
+        crawler = self.crawler
+        if not crawler._check_attributes():
+            raise ValueError("some attribute values missing")
+        queued = 0
+        try:
+            # politeness, HTTP cache, metrics and the end of the walk are
+            # handled as for a crawl
+            with crawler._crawl_session():
+                for links, _ in crawler._listing_pages():
+                    new_links = self.queue.push(
+                        links[:crawler.number_of_articles - queued])
+                    queued = queued + len(new_links)
+                    # links queued by an earlier run are not new
+                    crawler._page_walk.record(len(new_links))
+                    logging.info('queued {} links'.format(queued))
+                    if queued >= crawler.number_of_articles:
+                        break
+        finally:
+            self.queue.close_input()
+        return queued
+
+
+class Worker:
+    """pull links from a queue, extract and save the articles
+
+    `concurrency` threads share the crawler's fetcher, output is written
+    with the crawler's output settings under `{file_names_prefix}_{worker_id}`
+    so workers never overwrite each other. a link is acked once its article
+    is on disk. `frontier_path` is not used, the queue tracks progress
+
+    Attributes
+    ----------
+    crawler : ArticleCrawler
+        config used to extract and save articles
+    queue : SqliteWorkQueue or RedisWorkQueue
+    worker_id : str
+        unique name of this worker, `host-pid` by default
+    poll_interval : float
+        seconds to wait when the queue is empty but not finished
+    """
+
+    def __init__(self, crawler, queue, worker_id=None,
+                 poll_interval: float = 1.0):
+        """Summary
+
+        Parameters
+        ----------
+        crawler : ArticleCrawler
+            refer to class attributes
+        queue : SqliteWorkQueue or RedisWorkQueue
+            refer to class attributes
+        worker_id : str, optional
+            refer to class attributes
+        poll_interval : float, optional
+            refer to class attributes
+        """
+        self.crawler = crawler
+        self.queue = queue
+        self.worker_id = worker_id or '{}-{}'.format(socket.gethostname(),
+                                                     os.getpid())
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()
+
+    def run(self):
+        """work until the queue is finished
+
+        Returns
+        -------
+        int
+            number of saved articles
+
+        Raises
+        ------
+        ValueError
+            in case any missing or invalid values for crawler parameters
+        """
+        crawler = self.crawler
+        # overridden for this run only, so run() can be called again
+        settings = (crawler.frontier_path, crawler.file_names_prefix,
+                    crawler._on_records_written)
+        crawler.frontier_path = None
+        crawler.file_names_prefix = '{}_{}'.format(
+            crawler.file_names_prefix or 'articles', self.worker_id)
+        crawler._on_records_written = self._ack
+        try:
+            if not crawler._check_attributes():
+                raise ValueError("some attribute values missing")
+            saved = crawler.internal_counter
+            with crawler._crawl_session(), \
+                    ThreadPoolExecutor(
+                        max_workers=crawler.concurrency) as executor:
+                for future in [executor.submit(self._work)
+                               for _ in range(crawler.concurrency)]:
+                    future.result()
+            return crawler.internal_counter - saved
+        finally:
+            (crawler.frontier_path, crawler.file_names_prefix,
+             crawler._on_records_written) = settings
+
+    def _work(self):
+        """Summary
+        """
+        crawler = self.crawler
+        while True:
+            link = self.queue.pull(self.worker_id)
+            if link is None:
+                if self.queue.finished():
+                    return
+                time.sleep(self.poll_interval)
+                continue
+            try:
+                text = crawler._extract_article_body(link)
+            except Exception as ex:
+                crawler._article_failed(link, ex)
+                self.queue.fail(link, str(ex))
+                continue
+            with self._lock:
+                saved = crawler._store_article(text, link)
+            if not saved:
+                # skipped near-duplicate, never reaches the writer
+                self.queue.ack([link])
+
+    def _ack(self, records):
+        """Summary
+
+        Parameters
+        ----------
+        records : list of sinks.Record
+            articles written to disk
+        """
+        self.queue.ack(record.url for record in records)
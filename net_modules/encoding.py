@@ -0,0 +1,164 @@
+"""character encoding of responses, resolved once per response
+
+the charset of the `Content-Type` header wins, then a `<meta charset>` (or a
+byte order mark) at the start of the body, then a detector. unlike
+`requests.Response.encoding`, a missing charset never falls back to
+ISO-8859-1, which garbles utf-8 Persian pages. detection is cached per host,
+since pages of one site share their encoding
+"""
+import re
+import codecs
+import threading
+from urllib.parse import urlsplit
+
+# bytes searched for a `<meta charset>` and given to the detector
+SNIFF_SIZE = 4096
+_DETECT_SIZE = 64 * 1024
+_BOMS = ((codecs.BOM_UTF8, 'utf-8'), (codecs.BOM_UTF16_LE, 'utf-16-le'),
+         (codecs.BOM_UTF16_BE, 'utf-16-be'))
+_HEADER_CHARSET = re.compile(r'charset\s*=\s*["\']?([\w.:-]+)', re.I)
+_META_CHARSET = re.compile(
+    rb'<meta[^>]+charset\s*=\s*["\']?\s*([\w.:-]+)', re.I)
+
+
+def normalize(name):
+    """canonical codec name
+
+    Parameters
+    ----------
+    name : str or None
+
+    Returns
+    -------
+    str or None
+        e.g. `utf-8` for `UTF8`, None if python has no such codec
+    """
+    if not name:
+        return None
+    try:
+        return codecs.lookup(name.strip()).name
+    except LookupError:
+        return None
+
+
+def from_headers(headers):
+    """Summary
+
+    Parameters
+    ----------
+    headers : Mapping
+        response headers
+
+    Returns
+    -------
+    str or None
+        charset of `Content-Type`
+    """
+    match = _HEADER_CHARSET.search(headers.get('Content-Type') or '')
+    return normalize(match.group(1)) if match else None
+
+
+def from_document(content):
+    """find a byte order mark or `<meta charset>` at the start of a page
+
+    Parameters
+    ----------
+    content : bytes
+        page, or its first bytes
+
+    Returns
+    -------
+    str or None
+    """
+    for bom, name in _BOMS:
+        if content.startswith(bom):
+            return name
+    match = _META_CHARSET.search(content[:SNIFF_SIZE])
+    return normalize(match.group(1).decode('ascii', 'replace')) \
+        if match else None
+
+
+def detect(content):
+    """guess encoding from the bytes of a page
+
+    a valid utf-8 sample is taken as utf-8, otherwise `charset_normalizer`
+    (a dependency of requests) or `chardet` is asked, if installed
+
+    Parameters
+    ----------
+    content : bytes
+
+    Returns
+    -------
+    str or None
+    """
+    sample = content[:_DETECT_SIZE]
+    try:
+        # a multi-byte character may be cut at the end of the sample
+        codecs.getincrementaldecoder('utf-8')().decode(sample, final=False)
+        return 'utf-8'
+    except UnicodeDecodeError:
+        pass
+    try:
+        import charset_normalizer
+        best = charset_normalizer.from_bytes(sample).best()
+        return normalize(best.encoding) if best is not None else None
+    except ImportError:
+        pass
+    try:
+        import chardet
+        return normalize(chardet.detect(sample).get('encoding'))
+    except ImportError:
+        return None
+
+
+class EncodingResolver:
+    """resolves the encoding of responses, caching detections per host
+
+    Attributes
+    ----------
+    default : str
+        encoding used when nothing else is known
+    """
+
+    def __init__(self, default='utf-8'):
+        """Summary
+
+        Parameters
+        ----------
+        default : str, optional
+            refer to class attributes
+        """
+        self.default = default
+        self._lock = threading.Lock()
+        self._hosts = {}
+
+    def resolve(self, url, headers, content):
+        """Summary
+
+        Parameters
+        ----------
+        url : str
+            url of the response
+        headers : Mapping
+            response headers
+        content : bytes
+            body, or its first bytes when streaming
+
+        Returns
+        -------
+        str
+            codec name to decode `content` with
+        """
+        ret = from_headers(headers) or from_document(content)
+        if ret is not None:
+            return ret
+        host = urlsplit(url).netloc
+        with self._lock:
+            ret = self._hosts.get(host)
+        if ret is None:
+            ret = detect(content)
+            if ret is not None:
+                with self._lock:
+                    self._hosts[host] = ret
+        return ret or self.default
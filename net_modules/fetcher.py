@@ -0,0 +1,345 @@
+"""pooled, keep-alive HTTP access shared by all crawl modes
+"""
+import time
+import requests
+from net_modules.cache import CachingAdapter, MAX_AGE_HEADER
+from net_modules.encoding import EncodingResolver
+from net_modules.politeness import PoliteAdapter
+from net_modules.retry import RetryPolicy, FetchError, classify_exception, \
+    check_response
+
+DEFAULT_USER_AGENT = "Mozilla/5.0 (Windows NT 6.1; Win64; x64) " \
+                     "AppleWebKit/537.36 (KHTML, like Gecko) " \
+                     "Chrome/57.0.2987.133 Safari/537.36"
+
+
+def _accept_encoding(compression: bool):
+    """build `Accept-Encoding` header value
+
+    Parameters
+    ----------
+    compression : bool
+        whether to negotiate compressed responses or not
+
+    Returns
+    -------
+    str
+        header value, brotli is only offered when urllib3 can decode it
+    """
+    if not compression:
+        return 'identity'
+    encodings = ['gzip', 'deflate']
+    try:
+        import brotli  # noqa: F401
+        encodings.append('br')
+    except ImportError:
+        try:
+            import brotlicffi  # noqa: F401
+            encodings.append('br')
+        except ImportError:
+            pass
+    return ', '.join(encodings)
+
+
+class Fetcher:
+    """reusable HTTP client with a connection pool per host
+
+    one instance should be shared by every request of a crawl, so each host
+    pays the TCP (and TLS) handshake only once per pooled connection
+
+    Attributes
+    ----------
+    session : requests.Session
+        underlying session, can be passed to libraries accepting a session
+    pool_size : int
+        maximum number of kept-alive connections per host
+    cache : HttpCache or None
+        on-disk response cache used for GET requests
+    scheduler : HostScheduler or None
+        per-host politeness applied to requests reaching the network
+    retry_policy : RetryPolicy or None
+        backoff used to retry timeouts, connection errors, 429 and 5xx
+    timeout : float or tuple
+        `(connect, read)` timeout of every request
+    metrics : Metrics or None
+        receives download times, bytes, cache hits and errors
+    encodings : EncodingResolver
+        encoding of responses, with detections cached per host
+    """
+
+    def __init__(self, pool_size: int = 10, max_hosts: int = 10,
+                 keep_alive: bool = True, compression: bool = True,
+                 headers=None, proxy_config=None, cache=None,
+                 scheduler=None, retry_policy=None, timeout=(10, 30),
+                 metrics=None):
+        """Summary
+
+        Parameters
+        ----------
+        pool_size : int, optional
+            maximum number of connections kept per host, should be at least
+            the number of concurrent requests to one host
+        max_hosts : int, optional
+            number of per-host pools to keep
+        keep_alive : bool, optional
+            if False connections are closed after each response
+        compression : bool, optional
+            negotiate gzip/deflate (and brotli, if installed) responses
+        headers : dict, optional
+            extra headers sent with every request
+        proxy_config : dict, optional
+            proxies argument value
+        cache : HttpCache, optional
+            refer to class attributes
+        scheduler : HostScheduler, optional
+            refer to class attributes
+        retry_policy : RetryPolicy, optional
+            refer to class attributes, a default `RetryPolicy` if not passed
+        timeout : float or tuple, optional
+            refer to class attributes
+        metrics : Metrics, optional
+            refer to class attributes
+        """
+        self.pool_size = pool_size
+        self.max_hosts = max_hosts
+        self.session = requests.Session()
+        self.cache = cache
+        self.scheduler = scheduler
+        self.retry_policy = retry_policy if retry_policy is not None \
+            else RetryPolicy()
+        self.timeout = timeout
+        self.metrics = metrics
+        self.encodings = EncodingResolver()
+        self._mount()
+        self.session.headers['User-Agent'] = DEFAULT_USER_AGENT
+        self.session.headers['Accept-Encoding'] = _accept_encoding(compression)
+        if not keep_alive:
+            self.session.headers['Connection'] = 'close'
+        if isinstance(headers, dict):
+            self.session.headers.update(headers)
+        if isinstance(proxy_config, dict):
+            self.session.proxies.update(proxy_config)
+
+    def set_cache(self, cache):
+        """answer GET requests from `cache`, None disables caching
+
+        Parameters
+        ----------
+        cache : HttpCache or None
+        """
+        self.cache = cache
+        self._mount()
+
+    def set_scheduler(self, scheduler):
+        """apply `scheduler` to every request, None disables it
+
+        Parameters
+        ----------
+        scheduler : HostScheduler or None
+        """
+        self.scheduler = scheduler
+        self._mount()
+
+    def set_retry(self, retry_policy, timeout):
+        """Summary
+
+        Parameters
+        ----------
+        retry_policy : RetryPolicy or None
+            None disables retries
+        timeout : float or tuple
+            `(connect, read)` timeout of every request
+        """
+        self.retry_policy = retry_policy
+        self.timeout = timeout
+        self._mount()
+
+    def set_metrics(self, metrics):
+        """record request metrics in `metrics`, None disables it
+
+        Parameters
+        ----------
+        metrics : Metrics or None
+        """
+        self.metrics = metrics
+        self._mount()
+
+    def _mount(self):
+        """mount pooled adapters for the current cache and scheduler
+        """
+        kwargs = dict(scheduler=self.scheduler,
+                      retry_policy=self.retry_policy, timeout=self.timeout,
+                      metrics=self.metrics,
+                      pool_connections=self.max_hosts,
+                      pool_maxsize=self.pool_size)
+        if self.cache is None:
+            adapter = PoliteAdapter(**kwargs)
+        else:
+            adapter = CachingAdapter(self.cache, **kwargs)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def request(self, link, method="GET", headers=None, params=None,
+                proxy_config=None, max_age=None):
+        """send a request through the pool
+
+        Parameters
+        ----------
+        link : str
+            link to web page
+        method : str, optional
+            HTTP method
+        headers : dict, optional
+            headers added to session headers for this request only
+        params : dict, optional
+            parameters used for request
+        proxy_config : dict, optional
+            proxies argument value
+        max_age : int, optional
+            seconds a cached response stays fresh, cached responses never
+            expire if not passed
+
+        Returns
+        -------
+        requests.Response
+            successful response
+
+        Raises
+        ------
+        FetchError
+            once retries are exhausted or for a permanent failure
+        """
+        if self.cache is not None and max_age is not None:
+            headers = dict(headers or {})
+            headers[MAX_AGE_HEADER] = str(max_age)
+        started = time.perf_counter()
+        try:
+            response = self.session.request(method, link, data=params,
+                                            headers=headers,
+                                            proxies=proxy_config,
+                                            timeout=self.timeout)
+        except requests.RequestException as ex:
+            self._count_error(classify_exception(ex))
+            raise FetchError(link, classify_exception(ex), cause=ex) from ex
+        if self.metrics is not None:
+            self._record(response, time.perf_counter() - started)
+        try:
+            return check_response(response)
+        except FetchError as ex:
+            self._count_error(ex.kind)
+            raise
+
+    def stream(self, link, headers=None):
+        """GET `link` without reading the body
+
+        the caller must `close()` the response, closing it before the body is
+        consumed drops the connection instead of downloading the rest
+
+        Parameters
+        ----------
+        link : str
+            link to web page
+        headers : dict, optional
+            headers added to session headers for this request only
+
+        Returns
+        -------
+        requests.Response
+            successful response
+
+        Raises
+        ------
+        FetchError
+            once retries are exhausted or for a permanent failure
+        """
+        try:
+            response = self.session.get(link, headers=headers, stream=True,
+                                        timeout=self.timeout)
+        except requests.RequestException as ex:
+            self._count_error(classify_exception(ex))
+            raise FetchError(link, classify_exception(ex), cause=ex) from ex
+        if not response.ok:
+            response.close()
+        try:
+            return check_response(response)
+        except FetchError as ex:
+            self._count_error(ex.kind)
+            raise
+
+    def _record(self, response, seconds):
+        """Summary
+
+        Parameters
+        ----------
+        response : requests.Response
+            response with its body read
+        seconds : float
+            time to send the request and read the body
+        """
+        if getattr(response, 'from_cache', False):
+            self.metrics.inc('cache_hits_total')
+            return
+        self.metrics.observe('download', seconds)
+        raw = response.raw
+        # bytes received on the wire, before decompression
+        wire_bytes = raw.tell() if hasattr(raw, 'tell') else \
+            len(response.content)
+        self.metrics.inc('bytes_total', wire_bytes)
+
+    def _count_error(self, kind):
+        """Summary
+
+        Parameters
+        ----------
+        kind : str
+            failure kind, see `retry`
+        """
+        if self.metrics is not None:
+            self.metrics.inc('fetch_errors_total', kind=kind)
+
+    def get_url_contents(self, link, **kwargs):
+        """Summary
+
+        Parameters
+        ----------
+        link : str
+            link to web page
+        **kwargs
+            passed to `request`
+
+        Returns
+        -------
+        Tuple[bytes, str]
+            web-page as a bytes and its encode, see `encoding`
+        """
+        result = self.request(link, **kwargs)
+        result.encoding = self.encodings.resolve(result.url, result.headers,
+                                                 result.content)
+        return result.content, result.encoding
+
+    def close(self):
+        """close all pooled connections
+        """
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+_default_fetcher = None
+
+
+def default_fetcher():
+    """fetcher shared by calls that do not pass their own
+
+    Returns
+    -------
+    Fetcher
+    """
+    global _default_fetcher
+    if _default_fetcher is None:
+        _default_fetcher = Fetcher()
+    return _default_fetcher
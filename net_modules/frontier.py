@@ -0,0 +1,300 @@
+"""disk-backed URL frontier used to dedup links and resume crawls
+"""
+import sqlite3
+import threading
+import time
+
+PENDING = 'pending'
+DONE = 'done'
+FAILED = 'failed'
+
+
+class Frontier:
+    """state of every article url seen by a crawl, stored in SQLite
+
+    writes are grouped into transactions of `batch_size` operations, an url
+    marked done and the crawl state stored with it are committed together so
+    a killed crawl resumes from a consistent point
+
+    Attributes
+    ----------
+    path : str
+        database file
+    batch_size : int
+        number of writes per transaction
+    """
+
+    def __init__(self, path='frontier.sqlite3', batch_size: int = 100):
+        """Summary
+
+        Parameters
+        ----------
+        path : str, optional
+            database file, created if it doesn't exist
+        batch_size : int, optional
+            refer to class attributes
+        """
+        self.path = path
+        self.batch_size = batch_size
+        self._lock = threading.Lock()
+        self._uncommitted = 0
+        self._conn = sqlite3.connect(path, check_same_thread=False,
+                                     isolation_level='DEFERRED')
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS urls ('
+            'url TEXT PRIMARY KEY, state TEXT NOT NULL, '
+            'added REAL NOT NULL, updated REAL NOT NULL, error TEXT)')
+        self._conn.execute(
+            'CREATE INDEX IF NOT EXISTS urls_state ON urls (state, added)')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS state (key TEXT PRIMARY KEY, value)')
+        self._conn.commit()
+
+    def add(self, urls):
+        """add urls as pending, ignoring already known ones
+
+        Parameters
+        ----------
+        urls : iterable of str
+            discovered urls
+
+        Returns
+        -------
+        list
+            urls that were not known before, in the given order
+        """
+        ret = []
+        now = time.time()
+        with self._lock:
+            for url in urls:
+                cursor = self._conn.execute(
+                    'INSERT OR IGNORE INTO urls (url, state, added, updated) '
+                    'VALUES (?, ?, ?, ?)', (url, PENDING, now, now))
+                if cursor.rowcount:
+                    ret.append(url)
+                    now = now + 1e-6  # keeps discovery order
+            self._wrote(len(ret))
+        return ret
+
+    def pending(self, limit=None):
+        """urls added but not yet done or failed, oldest first
+
+        Parameters
+        ----------
+        limit : int, optional
+            maximum number of urls
+
+        Returns
+        -------
+        list
+        """
+        query = 'SELECT url FROM urls WHERE state = ? ORDER BY added'
+        params = (PENDING,)
+        if limit is not None:
+            query = query + ' LIMIT ?'
+            params = (PENDING, limit)
+        with self._lock:
+            return [row[0] for row in self._conn.execute(query, params)]
+
+    def failed(self):
+        """urls that could not be crawled
+
+        Returns
+        -------
+        list
+        """
+        with self._lock:
+            return [row[0] for row in self._conn.execute(
+                'SELECT url FROM urls WHERE state = ? ORDER BY added',
+                (FAILED,))]
+
+    def urls(self):
+        """every known url, whatever its state
+
+        Returns
+        -------
+        list
+        """
+        with self._lock:
+            return [row[0] for row in self._conn.execute(
+                'SELECT url FROM urls')]
+
+    def known(self, urls):
+        """urls already added, looked up in one query per 500 urls
+
+        Parameters
+        ----------
+        urls : list of str
+
+        Returns
+        -------
+        set
+        """
+        ret = set()
+        with self._lock:
+            for start in range(0, len(urls), 500):
+                chunk = urls[start:start + 500]
+                ret.update(row[0] for row in self._conn.execute(
+                    'SELECT url FROM urls WHERE url IN ({})'.format(
+                        ', '.join('?' * len(chunk))), chunk))
+        return ret
+
+    def state_of(self, url):
+        """Summary
+
+        Parameters
+        ----------
+        url : str
+
+        Returns
+        -------
+        str or None
+            state of `url`, None if it was never added
+        """
+        with self._lock:
+            row = self._conn.execute('SELECT state FROM urls WHERE url = ?',
+                                     (url,)).fetchone()
+        return row[0] if row else None
+
+    def mark_done(self, url, **state):
+        """mark `url` as crawled
+
+        Parameters
+        ----------
+        url : str
+        **state
+            crawl state committed in the same transaction, see `set_state`
+        """
+        self._set(url, DONE, None, state)
+
+    def mark_failed(self, url, error=None, **state):
+        """mark `url` as failed
+
+        Parameters
+        ----------
+        url : str
+        error : str, optional
+            reason of failure
+        **state
+            crawl state committed in the same transaction, see `set_state`
+        """
+        self._set(url, FAILED, error, state)
+
+    def requeue_failed(self):
+        """move failed urls back to pending
+
+        Returns
+        -------
+        int
+            number of requeued urls
+        """
+        with self._lock:
+            cursor = self._conn.execute(
+                'UPDATE urls SET state = ?, error = NULL, updated = ? '
+                'WHERE state = ?', (PENDING, time.time(), FAILED))
+            self._conn.commit()
+            self._uncommitted = 0
+        return cursor.rowcount
+
+    def set_state(self, **state):
+        """store crawl state such as `current_page_url`
+
+        Parameters
+        ----------
+        **state
+            json compatible scalars
+        """
+        with self._lock:
+            self._store_state(state)
+            self._wrote(1)
+
+    def get_state(self, key, default=None):
+        """Summary
+
+        Parameters
+        ----------
+        key : str
+        default : optional
+            returned if `key` was never stored
+
+        Returns
+        -------
+        value stored with `set_state`
+        """
+        with self._lock:
+            row = self._conn.execute('SELECT value FROM state WHERE key = ?',
+                                     (key,)).fetchone()
+        return row[0] if row else default
+
+    def counts(self):
+        """number of urls per state
+
+        Returns
+        -------
+        dict
+        """
+        with self._lock:
+            return dict(self._conn.execute(
+                'SELECT state, COUNT(*) FROM urls GROUP BY state'))
+
+    def commit(self):
+        """commit pending writes
+        """
+        with self._lock:
+            self._conn.commit()
+            self._uncommitted = 0
+
+    def close(self):
+        """commit and close the database
+        """
+        with self._lock:
+            self._conn.commit()
+            self._conn.close()
+
+    def _set(self, url, url_state, error, state):
+        """Summary
+
+        Parameters
+        ----------
+        url : str
+        url_state : str
+            one of PENDING, DONE, FAILED
+        error : str or None
+        state : dict
+            crawl state
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                'INSERT INTO urls (url, state, added, updated, error) '
+                'VALUES (?, ?, ?, ?, ?) ON CONFLICT (url) DO UPDATE SET '
+                'state = excluded.state, updated = excluded.updated, '
+                'error = excluded.error', (url, url_state, now, now, error))
+            self._store_state(state)
+            self._wrote(1)
+
+    def _store_state(self, state):
+        """Summary
+
+        Parameters
+        ----------
+        state : dict
+        """
+        self._conn.executemany(
+            'INSERT OR REPLACE INTO state (key, value) VALUES (?, ?)',
+            state.items())
+
+    def _wrote(self, count):
+        """commit once `batch_size` writes accumulated, lock must be held
+
+        Parameters
+        ----------
+        count : int
+            number of writes just made
+        """
+        self._uncommitted = self._uncommitted + count
+        if self._uncommitted >= self.batch_size:
+            self._conn.commit()
+            self._uncommitted = 0
@@ -0,0 +1,78 @@
+"""article text from JSON-LD metadata, without parsing the page
+
+news sites describe articles for search engines in
+`<script type="application/ld+json">` blocks, often with the whole text in
+`articleBody`. finding those blocks with a regular expression and decoding
+only them costs a fraction of building the DOM of the page
+"""
+import re
+import json
+import html
+
+_SCRIPT = re.compile(
+    rb'<script[^>]*\btype\s*=\s*["\']?application/ld\+json["\']?[^>]*>'
+    rb'(.*?)</script\s*>', re.I | re.S)
+_TAG = re.compile(r'<[^>]+>')
+
+
+def _bodies(item):
+    """`articleBody` values of a JSON-LD object and the objects it holds
+
+    Parameters
+    ----------
+    item : dict, list or scalar
+        decoded JSON-LD, `@graph` lists included
+
+    Yields
+    ------
+    str
+    """
+    if isinstance(item, dict):
+        body = item.get('articleBody')
+        if isinstance(body, str):
+            yield body
+        for value in item.values():
+            if isinstance(value, (dict, list)):
+                yield from _bodies(value)
+    elif isinstance(item, list):
+        for value in item:
+            yield from _bodies(value)
+
+
+def article_body(page_content, encoding=None):
+    """longest `articleBody` of the JSON-LD blocks of a page
+
+    Parameters
+    ----------
+    page_content : bytes or str
+        raw html of article page
+    encoding : str, optional
+        encoding of `page_content` if it is bytes, utf-8 if not passed
+
+    Returns
+    -------
+    str or None
+        plain text, markup inside `articleBody` removed. None if the page
+        has no JSON-LD article body
+    """
+    if isinstance(page_content, str):
+        page_content = page_content.encode('utf-8')
+        encoding = 'utf-8'
+    ret = None
+    for match in _SCRIPT.finditer(page_content):
+        try:
+            data = json.loads(match.group(1).decode(encoding or 'utf-8',
+                                                    errors='replace'),
+                              strict=False)
+        except ValueError:
+            # broken metadata is common, the page is parsed instead
+            continue
+        for body in _bodies(data):
+            if ret is None or len(body) > len(ret):
+                ret = body
+    if ret is None:
+        return None
+    if '<' in ret:
+        ret = _TAG.sub(' ', ret)
+    ret = html.unescape(ret).strip()
+    return ret or None
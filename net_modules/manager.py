@@ -0,0 +1,230 @@
+"""crawl many sites and sections from one process
+
+a config file lists one `ArticleCrawler` per site section, e.g. in JSON
+
+    {"defaults": {"number_of_articles": 1000, "output_format": "jsonl"},
+     "sites": [{"name": "yjc_social",
+                "base_url": "http://www.yjc.ir/fa/social",
+                "article_link_css": "a.title4",
+                "article_body_css": "div.body",
+                "next_page_css": "a.next",
+                "file_names_prefix": "social"}]}
+
+or the same structure in YAML (needs the `PyYAML` package). a plain list of
+sites is accepted as well. keys are `ArticleCrawler` parameters, `defaults`
+apply to every site
+"""
+import os
+import re
+import json
+import logging
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from net_modules.core import ArticleCrawler
+from net_modules.fetcher import Fetcher
+from net_modules.cache import HttpCache
+from net_modules.politeness import HostScheduler
+from net_modules import parsing
+from net_modules.metrics import Metrics, Reporter
+
+# parameters owned by the manager, shared by every crawler
+_SHARED_PARAMETERS = {'fetcher', 'multi_thread', 'cache_dir', 'cache_size',
+                      'politeness', 'host_concurrency', 'host_rate',
+                      'metrics_interval', 'metrics_path', 'metrics_port'}
+
+
+def load_configs(path):
+    """read site configs from a JSON or YAML file
+
+    Parameters
+    ----------
+    path : str
+        `.json`, `.yaml` or `.yml` file
+
+    Returns
+    -------
+    list of dict
+        one dict of `ArticleCrawler` parameters per site, with `name`
+
+    Raises
+    ------
+    ValueError
+        if the file is malformed or YAML support is missing
+    """
+    with open(path, encoding='utf-8') as f:
+        if os.path.splitext(path)[1].lower() in ('.yaml', '.yml'):
+            try:
+                import yaml
+            except ImportError:
+                raise ValueError('YAML configs need PyYAML package')
+            document = yaml.safe_load(f)
+        else:
+            document = json.load(f)
+    if isinstance(document, list):
+        defaults, sites = {}, document
+    elif isinstance(document, dict) and isinstance(document.get('sites'),
+                                                   list):
+        defaults, sites = document.get('defaults') or {}, document['sites']
+    else:
+        raise ValueError('{} must hold a list of sites or a mapping with '
+                         '`sites`'.format(path))
+    configs = []
+    for i, site in enumerate(sites):
+        if not isinstance(site, dict):
+            raise ValueError('site {} of {} is not a mapping'.format(i, path))
+        config = dict(defaults)
+        config.update(site)
+        config.setdefault('name', config.get('file_names_prefix') or
+                          config.get('base_url') or 'site_{}'.format(i))
+        configs.append(config)
+    return configs
+
+
+class CrawlManager:
+    """run one `ArticleCrawler` per config concurrently
+
+    every crawler runs `run_async` in its own thread and shares one
+    `Fetcher`, so connection pools, the HTTP cache and the per-host
+    scheduler are common to all of them. the scheduler caps requests in
+    flight to `max_total` over all sites and shares it fairly between hosts,
+    sections of the same site are paced together
+
+    Attributes
+    ----------
+    crawlers : dict
+        `ArticleCrawler` of each config name
+    fetcher : Fetcher
+        client shared by all crawlers
+    max_total : int
+        global budget of requests in flight
+    metrics : Metrics
+        metrics of all crawlers together
+    """
+
+    def __init__(self, configs, max_total: int = 64,
+                 host_concurrency: int = 8, host_rate=10.0, cache_dir=None,
+                 cache_size: int = 2 ** 30, parse_workers=None,
+                 metrics_interval=60, metrics_path=None, metrics_port=None):
+        """Summary
+
+        Parameters
+        ----------
+        configs : list of dict or str
+            site configs, or path of a file read with `load_configs`
+        max_total : int, optional
+            refer to class attributes
+        host_concurrency : int, optional
+            maximum number of parallel requests to one host
+        host_rate : float or None, optional
+            maximum number of requests per second to one host
+        cache_dir : str, optional
+            directory of the HTTP cache shared by all crawlers
+        cache_size : int, optional
+            maximum size of the HTTP cache in bytes
+        parse_workers : int, optional
+            processes of the shared parse pool, one per core if not passed
+        metrics_interval : float or None, optional
+            seconds between metrics log lines, None disables them
+        metrics_path : str, optional
+            Prometheus text file rewritten with every metrics report
+        metrics_port : int, optional
+            port of an HTTP endpoint serving metrics in Prometheus format
+
+        Raises
+        ------
+        ValueError
+            for duplicated names or invalid crawler parameters
+        """
+        if isinstance(configs, str):
+            configs = load_configs(configs)
+        self.max_total = max_total
+        self.parse_workers = parse_workers
+        self.metrics = Metrics()
+        self._reporter = Reporter(self.metrics, metrics_interval,
+                                  metrics_path, metrics_port)
+        scheduler = HostScheduler(max_concurrency=host_concurrency,
+                                  rate=host_rate, max_total=max_total)
+        cache = HttpCache(cache_dir, cache_size) if cache_dir else None
+        self.fetcher = Fetcher(pool_size=max(10, host_concurrency),
+                               max_hosts=max(10, len(configs)), cache=cache,
+                               scheduler=scheduler, metrics=self.metrics)
+        self.crawlers = {}
+        for config in configs:
+            self.crawlers[config['name']] = self._create_crawler(config)
+
+    def _create_crawler(self, config):
+        """Summary
+
+        Parameters
+        ----------
+        config : dict
+            `ArticleCrawler` parameters and `name`
+
+        Returns
+        -------
+        ArticleCrawler
+
+        Raises
+        ------
+        ValueError
+            for duplicated names or invalid parameters
+        """
+        config = dict(config)
+        name = config.pop('name')
+        if name in self.crawlers:
+            raise ValueError('duplicated site name {!r}'.format(name))
+        shared = _SHARED_PARAMETERS.intersection(config)
+        if shared:
+            logging.warning('{}: {} ignored, set by the crawl manager'.format(
+                name, sorted(shared)))
+            for key in shared:
+                del config[key]
+        try:
+            crawler = ArticleCrawler(fetcher=self.fetcher,
+                                     metrics_interval=None, **config)
+        except TypeError as ex:
+            raise ValueError('invalid config of {!r}: {}'.format(name, ex))
+        crawler.metrics = self.metrics
+        crawler.metrics_labels = {'site': name}
+        # sites would overwrite each other's dump
+        crawler.dump_path = 'ArticleCrawler_{}.json'.format(
+            re.sub(r'[^\w.-]', '_', name))
+        return crawler
+
+    def run(self):
+        """crawl all sites and wait for them to finish
+
+        a failing site is logged and doesn't stop the others
+
+        Returns
+        -------
+        dict
+            exception of each failed site name, empty if all succeeded
+        """
+        failures = {}
+        self._reporter.start()
+        workers = self.parse_workers or parsing.default_workers()
+        with ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context('spawn')) as parse_pool, \
+                ThreadPoolExecutor(max_workers=len(self.crawlers) or 1,
+                                   thread_name_prefix='site') as executor:
+            futures = {}
+            for name, crawler in self.crawlers.items():
+                crawler._parse_pool = parse_pool
+                futures[name] = executor.submit(crawler.run_async)
+            for name, future in futures.items():
+                try:
+                    future.result()
+                    logging.info('{} finished, {} articles'.format(
+                        name, self.crawlers[name].internal_counter - 1))
+                except Exception as ex:
+                    logging.exception('{} failed: {}'.format(name, ex))
+                    failures[name] = ex
+        self._reporter.stop()
+        return failures
+
+    def close(self):
+        """Summary
+        """
+        self.fetcher.close()
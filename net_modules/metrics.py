@@ -0,0 +1,457 @@
+"""crawl metrics: per-stage latency histograms, counters and gauges
+
+`Metrics` is shared by the fetcher, the transport adapter and the crawler.
+`Reporter` turns it into periodic structured log lines, a Prometheus text
+file (e.g. for the node exporter textfile collector) and an optional
+Prometheus HTTP endpoint
+"""
+import os
+import json
+import time
+import logging
+import threading
+import contextlib
+
+# upper bounds in seconds, the last bucket is +Inf
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5,
+                   5.0, 10.0, 30.0)
+# stages timed by the crawler
+STAGES = ('ttfb', 'download', 'listing', 'parse', 'extract', 'stream', 'save')
+
+
+class Histogram:
+    """cumulative-bucket histogram of observed values
+
+    Attributes
+    ----------
+    buckets : tuple of float
+        upper bounds of buckets
+    count : int
+    sum : float
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        """Summary
+
+        Parameters
+        ----------
+        buckets : tuple of float, optional
+            refer to class attributes, ascending
+        """
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        """Summary
+
+        Parameters
+        ----------
+        value : float
+        """
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                break
+        else:
+            i = len(self.buckets)
+        self.counts[i] = self.counts[i] + 1
+        self.count = self.count + 1
+        self.sum = self.sum + value
+
+    def quantile(self, q: float):
+        """estimate a quantile by interpolating inside its bucket
+
+        Parameters
+        ----------
+        q : float
+            in [0, 1]
+
+        Returns
+        -------
+        float or None
+            None if nothing was observed
+        """
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            if seen + count >= rank and count:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                if i == len(self.buckets):
+                    return lower
+                return lower + (self.buckets[i] - lower) * \
+                    (rank - seen) / count
+            seen = seen + count
+        return self.buckets[-1]
+
+
+class Metrics:
+    """thread safe registry of histograms, counters and gauges
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._counters = {}
+        self._gauges = {}
+        self._gauge_functions = {}
+        self.started = time.time()
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted(labels.items()))
+
+    def observe(self, stage, seconds: float):
+        """record the duration of one `stage`
+
+        Parameters
+        ----------
+        stage : str
+            one of `STAGES` or any other name
+        seconds : float
+        """
+        with self._lock:
+            histogram = self._histograms.get(stage)
+            if histogram is None:
+                histogram = self._histograms[stage] = Histogram()
+            histogram.observe(seconds)
+
+    @contextlib.contextmanager
+    def timer(self, stage):
+        """time the enclosed block as `stage`
+
+        Parameters
+        ----------
+        stage : str
+        """
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - started)
+
+    def inc(self, name, value=1, **labels):
+        """add `value` to a counter
+
+        Parameters
+        ----------
+        name : str
+        value : int or float, optional
+        **labels
+            e.g. `kind='timeout'`
+        """
+        key = self._key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def set_gauge(self, name, value, **labels):
+        """Summary
+
+        Parameters
+        ----------
+        name : str
+        value : int or float
+        **labels
+        """
+        with self._lock:
+            self._gauges[self._key(name, labels)] = value
+
+    def add_gauge(self, name, value, **labels):
+        """move a gauge by `value`, e.g. requests in flight
+
+        Parameters
+        ----------
+        name : str
+        value : int or float
+        **labels
+        """
+        key = self._key(name, labels)
+        with self._lock:
+            self._gauges[key] = self._gauges.get(key, 0) + value
+
+    def gauge_function(self, name, function, **labels):
+        """read a gauge from `function` whenever metrics are reported
+
+        Parameters
+        ----------
+        name : str
+        function : callable or None
+            returns a number, None removes the gauge
+        **labels
+            e.g. `site='news'` when crawlers share the metrics
+        """
+        key = self._key(name, labels)
+        with self._lock:
+            if function is None:
+                self._gauge_functions.pop(key, None)
+            else:
+                self._gauge_functions[key] = function
+
+    def counter(self, name, **labels):
+        """Summary
+
+        Parameters
+        ----------
+        name : str
+        **labels
+
+        Returns
+        -------
+        int or float
+        """
+        with self._lock:
+            return self._counters.get(self._key(name, labels), 0)
+
+    def snapshot(self):
+        """current values
+
+        Returns
+        -------
+        dict
+            `histograms` (count, sum, p50, p99 per stage), `counters` and
+            `gauges`, labelled series are named like `name{label=value}`
+        """
+        with self._lock:
+            histograms = {stage: {'count': h.count, 'sum': round(h.sum, 6),
+                                  'p50': h.quantile(0.5),
+                                  'p99': h.quantile(0.99)}
+                          for stage, h in self._histograms.items()}
+            counters = {_series(name, labels): value
+                        for (name, labels), value in self._counters.items()}
+            gauges = {_series(name, labels): value
+                      for (name, labels), value in self._gauges.items()}
+            functions = list(self._gauge_functions.items())
+        for (name, labels), function in functions:
+            try:
+                gauges[_series(name, labels)] = function()
+            except Exception as ex:
+                logging.debug('gauge {} failed: {}'.format(name, ex))
+        return {'uptime': round(time.time() - self.started, 3),
+                'histograms': histograms, 'counters': counters,
+                'gauges': gauges}
+
+    def prometheus(self, prefix='crawler'):
+        """Prometheus text exposition of all metrics
+
+        Parameters
+        ----------
+        prefix : str, optional
+            metric names prefix
+
+        Returns
+        -------
+        str
+        """
+        lines = []
+        with self._lock:
+            histograms = [(stage, list(h.buckets), list(h.counts), h.count,
+                           h.sum) for stage, h in self._histograms.items()]
+            counters = sorted(self._counters.items())
+            gauges = sorted(self._gauges.items())
+            functions = list(self._gauge_functions.items())
+        name = prefix + '_stage_seconds'
+        lines.append('# TYPE {} histogram'.format(name))
+        for stage, buckets, counts, count, total in sorted(histograms):
+            cumulative = 0
+            for bound, bucket_count in zip(buckets + ['+Inf'], counts):
+                cumulative = cumulative + bucket_count
+                lines.append('{}_bucket{{stage="{}",le="{}"}} {}'.format(
+                    name, stage, bound, cumulative))
+            lines.append('{}_sum{{stage="{}"}} {}'.format(name, stage, total))
+            lines.append('{}_count{{stage="{}"}} {}'.format(name, stage, count))
+        typed = set()
+        for (counter, labels), value in counters:
+            metric = '{}_{}'.format(prefix, counter)
+            if metric not in typed:
+                typed.add(metric)
+                lines.append('# TYPE {} counter'.format(metric))
+            lines.append('{} {}'.format(_series(metric, labels, quote=True),
+                                        value))
+        for key, function in functions:
+            try:
+                gauges.append((key, function()))
+            except Exception:
+                pass
+        gauges.sort()
+        for (gauge, labels), value in gauges:
+            metric = '{}_{}'.format(prefix, gauge)
+            if metric not in typed:
+                typed.add(metric)
+                lines.append('# TYPE {} gauge'.format(metric))
+            lines.append('{} {}'.format(_series(metric, labels, quote=True),
+                                        value))
+        return '\n'.join(lines) + '\n'
+
+
+def _series(name, labels, quote=False):
+    """Summary
+
+    Parameters
+    ----------
+    name : str
+    labels : tuple
+        sorted `(label, value)` pairs
+    quote : bool, optional
+        quote label values as Prometheus does
+
+    Returns
+    -------
+    str
+    """
+    if not labels:
+        return name
+    template = '{}="{}"' if quote else '{}={}'
+    return '{}{{{}}}'.format(name, ','.join(template.format(k, v)
+                                            for k, v in labels))
+
+
+class TimedSink:
+    """sink wrapper timing writes as the `save` stage
+    """
+
+    def __init__(self, sink, metrics: Metrics):
+        """Summary
+
+        Parameters
+        ----------
+        sink : sink of `sinks.create_sink`
+        metrics : Metrics
+        """
+        self.sink = sink
+        self.metrics = metrics
+
+    def write_batch(self, records):
+        with self.metrics.timer('save'):
+            self.sink.write_batch(records)
+        self.metrics.inc('saved_articles_total', len(records))
+
+    def flush(self):
+        with self.metrics.timer('save'):
+            self.sink.flush()
+
+    def close(self):
+        self.sink.close()
+
+
+class Reporter:
+    """report `Metrics` every `interval` seconds from a background thread
+
+    Attributes
+    ----------
+    metrics : Metrics
+    interval : float or None
+        seconds between reports, None only reports on `stop`
+    path : str or None
+        Prometheus text file rewritten at each report
+    port : int or None
+        port of an HTTP server answering Prometheus scrapes
+    """
+
+    def __init__(self, metrics: Metrics, interval: float = 60, path=None,
+                 port=None):
+        """Summary
+
+        Parameters
+        ----------
+        metrics : Metrics
+            refer to class attributes
+        interval : float or None, optional
+            refer to class attributes
+        path : str, optional
+            refer to class attributes
+        port : int, optional
+            refer to class attributes
+        """
+        self.metrics = metrics
+        self.interval = interval
+        self.path = path
+        self.port = port
+        self._stop = threading.Event()
+        self._thread = None
+        self._server = None
+        self._last = None
+
+    def start(self):
+        """Summary
+        """
+        self._last = (time.time(), self.metrics.snapshot())
+        if self.interval:
+            self._thread = threading.Thread(target=self._run, daemon=True,
+                                            name='metrics-reporter')
+            self._thread.start()
+        if self.port is not None:
+            self._serve()
+
+    def stop(self):
+        """stop reporting, with a last report
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        self.report()
+
+    def report(self):
+        """log one line of rates and latencies and write `path`
+        """
+        now = time.time()
+        snapshot = self.metrics.snapshot()
+        line = {'histograms': snapshot['histograms'],
+                'counters': snapshot['counters'],
+                'gauges': snapshot['gauges']}
+        if self._last is not None:
+            then, last = self._last
+            elapsed = max(now - then, 1e-9)
+            line['rates'] = {
+                name: round((value - last['counters'].get(name, 0)) /
+                            elapsed, 3)
+                for name, value in snapshot['counters'].items()
+                if name.startswith(('saved_articles_total', 'listing_pages',
+                                    'bytes_total'))}
+        self._last = (now, snapshot)
+        logging.info('metrics {}'.format(json.dumps(line, sort_keys=True)))
+        if self.path is not None:
+            temp_path = self.path + '.tmp'
+            with open(temp_path, mode='w', encoding='utf-8') as f:
+                f.write(self.metrics.prometheus())
+            os.replace(temp_path, self.path)
+
+    def _run(self):
+        """Summary
+        """
+        while not self._stop.wait(self.interval):
+            try:
+                self.report()
+            except Exception as ex:
+                logging.exception(ex, exc_info=True)
+
+    def _serve(self):
+        """answer Prometheus scrapes on `port` from a daemon thread
+        """
+        import http.server
+        metrics = self.metrics
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+
+            def do_GET(self):
+                body = metrics.prometheus().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type',
+                                 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = http.server.ThreadingHTTPServer(('', self.port),
+                                                       Handler)
+        threading.Thread(target=self._server.serve_forever, daemon=True,
+                         name='metrics-server').start()
@@ -0,0 +1,206 @@
+"""listing page url templates, given or detected from successive pages
+"""
+import re
+from collections import deque
+
+PAGE_FIELD = '{page}'
+_NUMBER = re.compile(r'\d+')
+
+# why a walk over listing pages ended
+STOP_QUOTA = 'number_of_articles reached'
+STOP_LAST_PAGE = 'no next page'
+STOP_FAILED = 'listing page failed'
+STOP_EMPTY = 'no articles on listing page'
+STOP_CYCLE = 'next page already visited'
+STOP_LOW_YIELD = 'too few new articles'
+STOP_CAUGHT_UP = 'only known articles'
+
+
+class PageTemplate:
+    """listing page urls following a page number, e.g. `/news?page={page}`
+
+    Attributes
+    ----------
+    template : str
+        url with `{page}` in place of the page number
+    step : int
+        difference between page numbers of successive pages
+    """
+
+    def __init__(self, template, step: int = 1):
+        """Summary
+
+        Parameters
+        ----------
+        template : str
+            refer to class attributes
+        step : int, optional
+            refer to class attributes
+
+        Raises
+        ------
+        ValueError
+            if `template` doesn't contain `{page}` exactly once
+        """
+        if template.count(PAGE_FIELD) != 1:
+            raise ValueError('listing template must contain {} once'.format(
+                PAGE_FIELD))
+        self.template = template
+        self.step = step
+        prefix, suffix = template.split(PAGE_FIELD)
+        self._pattern = re.compile(
+            re.escape(prefix) + r'(\d+)' + re.escape(suffix) + '$')
+
+    def url(self, page: int):
+        """Summary
+
+        Parameters
+        ----------
+        page : int
+
+        Returns
+        -------
+        str
+            url of listing page `page`
+        """
+        return self.template.replace(PAGE_FIELD, str(page))
+
+    def page_of(self, url):
+        """Summary
+
+        Parameters
+        ----------
+        url : str
+
+        Returns
+        -------
+        int or None
+            page number of `url`, None if it doesn't follow the template
+        """
+        match = self._pattern.match(url)
+        return int(match.group(1)) if match else None
+
+
+def detect_template(url, next_url):
+    """find the page number changing between two successive listing pages
+
+    Parameters
+    ----------
+    url : str
+        a listing page
+    next_url : str
+        the page linked by its `next_page_css`
+
+    Returns
+    -------
+    PageTemplate or None
+        None unless both urls are equal but for one increasing number
+    """
+    numbers = list(_NUMBER.finditer(url))
+    next_numbers = list(_NUMBER.finditer(next_url))
+    if not numbers or len(numbers) != len(next_numbers):
+        return None
+    changed = [(a, b) for a, b in zip(numbers, next_numbers)
+               if a.group() != b.group()]
+    if len(changed) != 1:
+        return None
+    a, b = changed[0]
+    step = int(b.group()) - int(a.group())
+    if step <= 0 or url[:a.start()] != next_url[:b.start()] or \
+            url[a.end():] != next_url[b.end():]:
+        return None
+    template = next_url[:b.start()] + PAGE_FIELD + next_url[b.end():]
+    if template.count(PAGE_FIELD) != 1:
+        return None
+    return PageTemplate(template, step)
+
+
+class PageWalk:
+    """visited listing pages and new articles per page of one walk
+
+    a walk should stop once the next page was already visited, which
+    happens when a site's last page links back to an earlier one, or once
+    the last `window` pages averaged fewer than `min_yield` new articles
+
+    Attributes
+    ----------
+    min_yield : float
+        least average number of new articles per page, 0 disables the check
+    window : int
+        number of latest pages averaged
+    pages : int
+        number of pages walked
+    stop_reason : str or None
+        one of the `STOP_*` reasons once the walk ended
+    """
+
+    def __init__(self, min_yield: float = 1.0, window: int = 10):
+        """Summary
+
+        Parameters
+        ----------
+        min_yield : float, optional
+            refer to class attributes
+        window : int, optional
+            refer to class attributes
+        """
+        self.min_yield = min_yield
+        self.window = window
+        self.pages = 0
+        self.stop_reason = None
+        self._visited = set()
+        self._yields = deque(maxlen=window)
+
+    def visit(self, url):
+        """enter listing page `url`
+
+        Parameters
+        ----------
+        url : str
+
+        Returns
+        -------
+        bool
+            False, and the walk is stopped, if `url` was visited before
+        """
+        if url in self._visited:
+            self.stop(STOP_CYCLE)
+            return False
+        self._visited.add(url)
+        self.pages = self.pages + 1
+        return True
+
+    def record(self, new_articles: int):
+        """count the new articles found on the current page
+
+        Parameters
+        ----------
+        new_articles : int
+        """
+        self._yields.append(new_articles)
+
+    def exhausted(self):
+        """Summary
+
+        Returns
+        -------
+        bool
+            True, and the walk is stopped, if the latest pages yielded too
+            few new articles
+        """
+        if self.min_yield and len(self._yields) == self.window and \
+                sum(self._yields) / self.window < self.min_yield:
+            self.stop(STOP_LOW_YIELD)
+            return True
+        return False
+
+    def stop(self, reason):
+        """end the walk, the first reason given is kept
+
+        Parameters
+        ----------
+        reason : str
+            one of the `STOP_*` reasons
+        """
+        if self.stop_reason is None:
+            self.stop_reason = reason
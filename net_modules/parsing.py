@@ -0,0 +1,205 @@
+"""HTML parsing backends and the article text extraction used by parse workers
+
+functions here are module level and only depend on their arguments, so they
+can be shipped to a `ProcessPoolExecutor`
+"""
+import os
+from functools import lru_cache
+
+PARSERS = ('html.parser', 'lxml', 'selectolax')
+# `css` uses article_body_css only, `fallback` falls back to text density
+# when it matches nothing and `density` only uses text density
+EXTRACTORS = ('css', 'fallback', 'density')
+
+
+def available_parsers():
+    """parser backends that can be imported in this environment
+
+    Returns
+    -------
+    list
+        subset of `PARSERS`
+    """
+    ret = ['html.parser']
+    try:
+        import lxml  # noqa: F401
+        ret.append('lxml')
+    except ImportError:
+        pass
+    try:
+        import selectolax  # noqa: F401
+        ret.append('selectolax')
+    except ImportError:
+        pass
+    return ret
+
+
+def default_workers():
+    """default number of parse worker processes
+
+    Returns
+    -------
+    int
+        number of cores
+    """
+    return os.cpu_count() or 1
+
+
+@lru_cache(maxsize=64)
+def _compile_selectors(css_selectors: tuple):
+    """compile CSS selectors once per process
+
+    Parameters
+    ----------
+    css_selectors : tuple
+        selector strings
+
+    Returns
+    -------
+    tuple
+        `soupsieve.SoupSieve` objects in the same order
+    """
+    import soupsieve
+    return tuple(soupsieve.compile(css_selector)
+                 for css_selector in css_selectors)
+
+
+def compile_selectors(css_selectors):
+    """cached compiled form of `css_selectors`
+
+    Parameters
+    ----------
+    css_selectors : list or str
+        CSS selector(s)
+
+    Returns
+    -------
+    tuple
+        compiled selectors
+    """
+    if isinstance(css_selectors, str):
+        css_selectors = (css_selectors,)
+    return _compile_selectors(tuple(css_selectors))
+
+
+def iter_elements(css_selectors, bs4_object):
+    """lazily yield elements matching `css_selectors`
+
+    matches of each selector are yielded in document order, one selector after
+    another, like consecutive `select` calls
+
+    Parameters
+    ----------
+    css_selectors : list or str
+        CSS selector(s)
+    bs4_object : bs4.BeautifulSoup
+        parsed document
+
+    Yields
+    ------
+    bs4.element.Tag
+    """
+    for pattern in compile_selectors(css_selectors):
+        yield from pattern.iselect(bs4_object)
+
+
+def extract_article(page_content, encoding, css_selectors,
+                    parser='html.parser', extractor='fallback',
+                    json_ld=False):
+    """extract article text with the method chosen by `extractor`
+
+    Parameters
+    ----------
+    page_content : bytes or str
+        raw html of article page
+    encoding : str or None
+        encoding of `page_content` if it is bytes
+    css_selectors : list or str or None
+        CSS selector(s) of article body, unused by `density`
+    parser : str, optional
+        one of `PARSERS`
+    extractor : str, optional
+        one of `EXTRACTORS`
+    json_ld : bool, optional
+        take the JSON-LD `articleBody` of the page if it has one, before
+        parsing it at all
+
+    Returns
+    -------
+    Tuple[str, str]
+        text and the method that found it, `json-ld`, `css` or `density`
+    """
+    if json_ld:
+        from net_modules import jsonld
+        text = jsonld.article_body(page_content, encoding)
+        if text is not None:
+            return text, 'json-ld'
+    from net_modules import density
+    if isinstance(css_selectors, str):
+        css_selectors = [css_selectors]
+    bs4_object = None
+    if extractor != 'density':
+        if parser == 'selectolax':
+            text = _extract_text_selectolax(page_content, encoding,
+                                            css_selectors)
+        else:
+            bs4_object = _soup(page_content, encoding, parser)
+            text = ''.join(item.get_text() for item in
+                           iter_elements(css_selectors, bs4_object))
+        if extractor == 'css' or text.strip():
+            return text, 'css'
+    if bs4_object is None:
+        # text density needs a BeautifulSoup tree
+        tree_builder = parser
+        if parser == 'selectolax':
+            tree_builder = 'lxml' if 'lxml' in available_parsers() else \
+                'html.parser'
+        bs4_object = _soup(page_content, encoding, tree_builder)
+    return density.main_text(bs4_object), 'density'
+
+
+def _soup(page_content, encoding, parser):
+    """Summary
+
+    Parameters
+    ----------
+    page_content : bytes or str
+    encoding : str or None
+        encoding of `page_content` if it is bytes
+    parser : str
+        BeautifulSoup tree builder
+
+    Returns
+    -------
+    bs4.BeautifulSoup
+    """
+    import bs4
+    if isinstance(page_content, bytes):
+        return bs4.BeautifulSoup(page_content, parser, from_encoding=encoding)
+    return bs4.BeautifulSoup(page_content, parser)
+
+
+def _extract_text_selectolax(page_content, encoding, css_selectors):
+    """aggregate inner text of elements matching `css_selectors`, with
+    selectolax
+
+    Parameters
+    ----------
+    page_content : bytes or str
+        raw html of article page
+    encoding : str or None
+        encoding of `page_content` if it is bytes
+    css_selectors : list
+        CSS selectors of article body
+
+    Returns
+    -------
+    str
+    """
+    from selectolax.parser import HTMLParser
+    if isinstance(page_content, bytes) and encoding:
+        page_content = str(page_content, encoding=encoding, errors='replace')
+    tree = HTMLParser(page_content)
+    return ''.join(node.text(deep=True)
+                   for css_selector in css_selectors
+                   for node in tree.css(css_selector))
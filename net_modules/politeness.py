@@ -0,0 +1,444 @@
+"""per-host concurrency and rate limits with adaptive backoff
+
+`HostScheduler` decides when a request to a host may start, `PoliteAdapter`
+applies it to every request of a `requests.Session`. waiting is done with
+short `time.sleep` calls so it works with real threads as well as with gevent
+greenlets (multi thread mode)
+"""
+import time
+import random
+import logging
+import threading
+import email.utils
+import urllib.request
+import urllib.robotparser
+from urllib.parse import urlsplit
+from requests.adapters import HTTPAdapter
+from net_modules.retry import classify_exception, classify_status
+
+# statuses telling us to slow down
+_THROTTLE_STATUSES = {429, 503}
+
+
+def parse_retry_after(value):
+    """seconds to wait according to a `Retry-After` header
+
+    Parameters
+    ----------
+    value : str or None
+        delay in seconds or HTTP date
+
+    Returns
+    -------
+    float or None
+    """
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        date = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, date.timestamp() - time.time())
+
+
+class _HostState:
+    """limits of one host, guarded by `HostScheduler._lock`
+    """
+
+    def __init__(self, concurrency: int, interval: float):
+        self.concurrency = concurrency
+        self.interval = interval
+        self.min_interval = interval
+        self.in_flight = 0
+        self.waiting = 0
+        self.next_start = 0.0
+        self.blocked_until = 0.0
+        self.successes = 0
+        self.robots_checked = False
+        self.robots_done = False
+
+
+class HostScheduler:
+    """per-host politeness with AIMD backoff
+
+    each host starts at `max_concurrency` parallel requests spaced at least
+    `1 / rate` seconds apart (or robots.txt `Crawl-delay` if larger). a
+    throttling status (429, 503), a connection error or a response slower
+    than `latency_limit` halves the concurrency and doubles the spacing,
+    every `increase_every` good responses add one request of concurrency back
+    and shorten the spacing again. `Retry-After` pauses the host entirely.
+
+    with `max_total` requests of all hosts share one budget, a freed slot goes
+    to the waiting host with the fewest requests in flight so a slow origin
+    can not starve the others
+
+    Attributes
+    ----------
+    max_concurrency : int
+        upper bound of parallel requests per host
+    rate : float or None
+        upper bound of requests per second per host, None means unlimited
+    latency_limit : float
+        seconds after which a response counts as a slowdown signal
+    respect_robots : bool
+        read `Crawl-delay` from robots.txt of each host
+    user_agent : str
+        agent name used to match robots.txt rules
+    max_total : int or None
+        upper bound of parallel requests over all hosts, None means unlimited
+    """
+
+    def __init__(self, max_concurrency: int = 8, rate=10.0,
+                 latency_limit: float = 10.0, increase_every: int = 20,
+                 respect_robots: bool = True, user_agent='*',
+                 max_total=None):
+        """Summary
+
+        Parameters
+        ----------
+        max_concurrency : int, optional
+            refer to class attributes
+        rate : float or None, optional
+            refer to class attributes
+        latency_limit : float, optional
+            refer to class attributes
+        increase_every : int, optional
+            good responses needed to raise concurrency by one
+        respect_robots : bool, optional
+            refer to class attributes
+        user_agent : str, optional
+            refer to class attributes
+        max_total : int or None, optional
+            refer to class attributes
+        """
+        self.max_concurrency = max_concurrency
+        self.rate = rate
+        self.latency_limit = latency_limit
+        self.increase_every = increase_every
+        self.respect_robots = respect_robots
+        self.user_agent = user_agent
+        self.max_total = max_total
+        self._lock = threading.Lock()
+        self._hosts = {}
+        self._in_flight = 0
+
+    def _state(self, host):
+        """Summary
+
+        Parameters
+        ----------
+        host : str
+
+        Returns
+        -------
+        _HostState
+        """
+        state = self._hosts.get(host)
+        if state is None:
+            interval = 1.0 / self.rate if self.rate else 0.0
+            state = _HostState(self.max_concurrency, interval)
+            self._hosts[host] = state
+        return state
+
+    def _check_robots(self, url, state: _HostState):
+        """apply `Crawl-delay` of the host of `url` once
+
+        Parameters
+        ----------
+        url : str
+        state : _HostState
+        """
+        parts = urlsplit(url)
+        robots_url = '{}://{}/robots.txt'.format(parts.scheme, parts.netloc)
+        parser = urllib.robotparser.RobotFileParser(robots_url)
+        try:
+            with urllib.request.urlopen(robots_url, timeout=10) as f:
+                parser.parse(f.read().decode('utf-8', 'replace').splitlines())
+        except Exception as ex:
+            logging.debug('no robots.txt for {}: {}'.format(parts.netloc, ex))
+            return
+        delay = parser.crawl_delay(self.user_agent)
+        if delay:
+            with self._lock:
+                state.min_interval = max(state.min_interval, float(delay))
+                state.interval = max(state.interval, state.min_interval)
+            logging.info('crawl delay of {} is {}s'.format(parts.netloc, delay))
+
+    def acquire(self, url):
+        """block until a request to the host of `url` may start
+
+        Parameters
+        ----------
+        url : str
+
+        Returns
+        -------
+        str
+            host, pass it to `release`
+        """
+        host = urlsplit(url).netloc
+        check_robots = False
+        with self._lock:
+            state = self._state(host)
+            if self.respect_robots and not state.robots_checked:
+                state.robots_checked = True
+                check_robots = True
+        if check_robots:
+            try:
+                self._check_robots(url, state)
+            finally:
+                state.robots_done = True
+        with self._lock:
+            state.waiting = state.waiting + 1
+        try:
+            while True:
+                with self._lock:
+                    now = time.time()
+                    start = max(state.next_start, state.blocked_until)
+                    ready = state.robots_done or not self.respect_robots
+                    if ready and state.in_flight < state.concurrency and \
+                            start <= now and self._has_budget(state):
+                        state.in_flight = state.in_flight + 1
+                        self._in_flight = self._in_flight + 1
+                        state.next_start = now + state.interval
+                        return host
+                    wait = start - now if start > now else 0.01
+                # sleep in short slices so released slots are noticed soon
+                time.sleep(min(max(wait, 0.001), 0.05) *
+                           (1 + random.random() / 10))
+        finally:
+            with self._lock:
+                state.waiting = state.waiting - 1
+
+    def _has_budget(self, state: _HostState):
+        """whether `state` may take a slot of `max_total`, lock must be held
+
+        Parameters
+        ----------
+        state : _HostState
+
+        Returns
+        -------
+        bool
+        """
+        if self.max_total is None:
+            return True
+        if self._in_flight >= self.max_total:
+            return False
+        if self._in_flight < self.max_total - 1:
+            return True
+        # last free slot, fair share among hosts with waiting requests
+        return state.in_flight <= min(other.in_flight
+                                      for other in self._hosts.values()
+                                      if other.waiting)
+
+    def release(self, host, status=None, latency=None, retry_after=None,
+                error=False):
+        """report the outcome of a request started with `acquire`
+
+        Parameters
+        ----------
+        host : str
+            value returned by `acquire`
+        status : int, optional
+            HTTP status
+        latency : float, optional
+            seconds until response headers arrived
+        retry_after : str, optional
+            `Retry-After` header value
+        error : bool, optional
+            the request failed without a response
+        """
+        with self._lock:
+            state = self._state(host)
+            if state.in_flight > 0:
+                state.in_flight = state.in_flight - 1
+                self._in_flight = self._in_flight - 1
+            delay = parse_retry_after(retry_after)
+            if delay is not None:
+                state.blocked_until = max(state.blocked_until,
+                                          time.time() + delay)
+            slow = latency is not None and latency > self.latency_limit
+            if error or slow or status in _THROTTLE_STATUSES:
+                # multiplicative decrease
+                state.concurrency = max(1, state.concurrency // 2)
+                state.interval = min(60.0, max(state.interval * 2, 0.1))
+                state.successes = 0
+                logging.info('backing off {}: concurrency {}, interval {:.2f}s'
+                             .format(host, state.concurrency, state.interval))
+            else:
+                # additive increase
+                state.successes = state.successes + 1
+                if state.successes >= self.increase_every:
+                    state.successes = 0
+                    state.concurrency = min(self.max_concurrency,
+                                            state.concurrency + 1)
+                    state.interval = max(state.min_interval,
+                                         state.interval * 0.9)
+
+
+class PoliteAdapter(HTTPAdapter):
+    """`HTTPAdapter` sending requests through a `HostScheduler`, retrying
+    transient failures and applying a default timeout
+    """
+
+    def __init__(self, scheduler=None, retry_policy=None, timeout=None,
+                 metrics=None, **kwargs):
+        """Summary
+
+        Parameters
+        ----------
+        scheduler : HostScheduler, optional
+            requests are sent without limits if None
+        retry_policy : RetryPolicy, optional
+            failed attempts are not retried if None
+        timeout : float or tuple, optional
+            `(connect, read)` timeout used when the caller sets none
+        metrics : Metrics, optional
+            receives time to first byte, requests in flight and retries
+        **kwargs
+            passed to `HTTPAdapter`
+        """
+        super().__init__(**kwargs)
+        self.scheduler = scheduler
+        self.retry_policy = retry_policy
+        self.timeout = timeout
+        self.metrics = metrics
+
+    def send(self, request, **kwargs):
+        if kwargs.get('timeout') is None:
+            kwargs['timeout'] = self.timeout
+        attempt = 0
+        while True:
+            attempt = attempt + 1
+            try:
+                response = self._send_once(request, **kwargs)
+            except Exception as ex:
+                kind = classify_exception(ex)
+                if not self._should_retry(attempt, kind):
+                    raise
+                delay = self.retry_policy.delay(attempt)
+            else:
+                kind = classify_status(response.status_code)
+                if not self._should_retry(attempt, kind):
+                    return response
+                delay = self.retry_policy.delay(
+                    attempt,
+                    parse_retry_after(response.headers.get('Retry-After')))
+                response.close()
+            logging.debug('retrying {} in {:.2f}s'.format(request.url, delay))
+            if self.metrics is not None:
+                self.metrics.inc('retries_total', kind=kind)
+            time.sleep(delay)
+
+    def _should_retry(self, attempt, kind):
+        """Summary
+
+        Parameters
+        ----------
+        attempt : int
+            number of the failed attempt
+        kind : str or None
+            failure kind, see `retry`
+
+        Returns
+        -------
+        bool
+        """
+        return self.retry_policy is not None and \
+            self.retry_policy.should_retry(attempt, kind)
+
+    def _send_once(self, request, **kwargs):
+        """one attempt, paced by the scheduler
+
+        the body is downloaded here, so a body cut short is retried like a
+        failed request. the host slot is held until then, a streamed
+        response keeps it until it is closed
+
+        Parameters
+        ----------
+        request : requests.PreparedRequest
+        **kwargs
+            passed to `HTTPAdapter.send`
+
+        Returns
+        -------
+        requests.Response
+        """
+        if self.scheduler is None:
+            response = self._send_timed(request, **kwargs)
+            if not kwargs.get('stream'):
+                response.content
+            return response
+        host = self.scheduler.acquire(request.url)
+        started = time.time()
+        try:
+            response = self._send_timed(request, **kwargs)
+        except Exception:
+            self.scheduler.release(host, error=True)
+            raise
+        # latency until headers, slow bodies are not the server throttling
+        outcome = dict(status=response.status_code,
+                       latency=time.time() - started,
+                       retry_after=response.headers.get('Retry-After'))
+        if kwargs.get('stream'):
+            self._release_on_close(response, host, outcome)
+            return response
+        try:
+            response.content
+        except Exception:
+            self.scheduler.release(host, error=True)
+            raise
+        self.scheduler.release(host, **outcome)
+        return response
+
+    def _release_on_close(self, response, host, outcome):
+        """release the host slot of a streamed response once it is closed
+
+        Parameters
+        ----------
+        response : requests.Response
+            streamed response, body not read
+        host : str
+            value returned by `HostScheduler.acquire`
+        outcome : dict
+            `HostScheduler.release` keyword arguments
+        """
+        close = response.close
+        released = []
+
+        def release_and_close():
+            try:
+                close()
+            finally:
+                if not released:
+                    released.append(True)
+                    self.scheduler.release(host, **outcome)
+
+        response.close = release_and_close
+
+    def _send_timed(self, request, **kwargs):
+        """`HTTPAdapter.send` counted as in flight until headers arrive
+
+        Parameters
+        ----------
+        request : requests.PreparedRequest
+        **kwargs
+            passed to `HTTPAdapter.send`
+
+        Returns
+        -------
+        requests.Response
+        """
+        if self.metrics is None:
+            return super().send(request, **kwargs)
+        self.metrics.add_gauge('requests_in_flight', 1)
+        started = time.perf_counter()
+        try:
+            return super().send(request, **kwargs)
+        finally:
+            self.metrics.observe('ttfb', time.perf_counter() - started)
+            self.metrics.add_gauge('requests_in_flight', -1)
@@ -0,0 +1,331 @@
+"""failure classification, retry policy and dead-letter list for fetches
+"""
+import os
+import json
+import time
+import random
+import socket
+import threading
+
+# failure kinds
+DNS = 'dns'
+CONNECT = 'connect'
+TIMEOUT = 'timeout'
+THROTTLED = 'throttled'
+SERVER = '5xx'
+CLIENT = '4xx'
+OTHER = 'other'
+
+RETRYABLE = {CONNECT, TIMEOUT, THROTTLED, SERVER}
+
+
+class FetchError(Exception):
+    """a request failed for good
+
+    Attributes
+    ----------
+    url : str
+    kind : str
+        one of the failure kinds of this module
+    status : int or None
+        HTTP status if a response was received
+    """
+
+    def __init__(self, url, kind, status=None, cause=None):
+        """Summary
+
+        Parameters
+        ----------
+        url : str
+        kind : str
+            failure kind
+        status : int, optional
+            HTTP status
+        cause : Exception, optional
+            underlying exception
+        """
+        message = '{} fetching {}'.format(kind, url)
+        if status is not None:
+            message = '{} (HTTP {})'.format(message, status)
+        if cause is not None:
+            message = '{}: {}'.format(message, cause)
+        super().__init__(message)
+        self.url = url
+        self.kind = kind
+        self.status = status
+
+    @property
+    def retryable(self):
+        """Summary
+
+        Returns
+        -------
+        bool
+            whether a later attempt may succeed
+        """
+        return self.kind in RETRYABLE
+
+
+def classify_status(status: int):
+    """failure kind of an HTTP status
+
+    Parameters
+    ----------
+    status : int
+
+    Returns
+    -------
+    str or None
+        None for successful statuses
+    """
+    if status < 400:
+        return None
+    if status in (408, 429):
+        return THROTTLED if status == 429 else TIMEOUT
+    if status >= 500:
+        return SERVER
+    return CLIENT
+
+
+def classify_exception(exception: Exception):
+    """failure kind of an exception raised by `requests`
+
+    Parameters
+    ----------
+    exception : Exception
+
+    Returns
+    -------
+    str
+    """
+    if isinstance(exception, FetchError):
+        return exception.kind
+    import requests
+    import urllib3.exceptions
+    if isinstance(exception, (requests.exceptions.Timeout,
+                              urllib3.exceptions.TimeoutError)):
+        return TIMEOUT
+    if isinstance(exception, requests.exceptions.ConnectionError):
+        for cause in _causes(exception):
+            if isinstance(cause, socket.gaierror) or \
+                    type(cause).__name__ == 'NameResolutionError':
+                return DNS
+            # a body read timing out is raised as a connection error
+            if isinstance(cause, urllib3.exceptions.ReadTimeoutError):
+                return TIMEOUT
+        return CONNECT
+    # body cut short, e.g. `IncompleteRead` or a broken chunked encoding
+    if isinstance(exception, (requests.exceptions.ChunkedEncodingError,
+                              urllib3.exceptions.ProtocolError)):
+        return CONNECT
+    if isinstance(exception, requests.exceptions.HTTPError) and \
+            exception.response is not None:
+        return classify_status(exception.response.status_code) or OTHER
+    return OTHER
+
+
+def _causes(exception):
+    """`exception` and everything it wraps
+
+    Parameters
+    ----------
+    exception : BaseException
+
+    Yields
+    ------
+    BaseException
+    """
+    seen = set()
+    stack = [exception]
+    while stack:
+        ex = stack.pop()
+        if ex is None or id(ex) in seen:
+            continue
+        seen.add(id(ex))
+        yield ex
+        # `reason` of urllib3 errors is an exception, of ssl errors a str
+        stack.extend(cause for cause in (ex.__cause__, ex.__context__,
+                                         getattr(ex, 'reason', None), *ex.args)
+                     if isinstance(cause, BaseException))
+
+
+def check_response(response):
+    """raise `FetchError` for an unsuccessful response
+
+    Parameters
+    ----------
+    response : requests.Response
+
+    Returns
+    -------
+    requests.Response
+        `response` itself
+
+    Raises
+    ------
+    FetchError
+    """
+    kind = classify_status(response.status_code)
+    if kind is not None:
+        raise FetchError(response.url, kind, status=response.status_code)
+    return response
+
+
+class RetryPolicy:
+    """exponential backoff with full jitter
+
+    Attributes
+    ----------
+    max_attempts : int
+        attempts per url, including the first one
+    base_delay : float
+        delay before the second attempt is drawn from [0, base_delay]
+    max_delay : float
+        upper bound of a single delay
+    """
+
+    def __init__(self, max_attempts: int = 4, base_delay: float = 0.5,
+                 max_delay: float = 30.0):
+        """Summary
+
+        Parameters
+        ----------
+        max_attempts : int, optional
+            refer to class attributes
+        base_delay : float, optional
+            refer to class attributes
+        max_delay : float, optional
+            refer to class attributes
+        """
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def delay(self, attempt: int, retry_after=None):
+        """seconds to wait after failed `attempt`
+
+        Parameters
+        ----------
+        attempt : int
+            number of the failed attempt, starting at 1
+        retry_after : float, optional
+            delay requested by the server, used if longer
+
+        Returns
+        -------
+        float
+        """
+        ceiling = min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+        ret = random.uniform(0, ceiling)
+        if retry_after is not None:
+            ret = max(ret, min(retry_after, self.max_delay))
+        return ret
+
+    def should_retry(self, attempt: int, kind):
+        """Summary
+
+        Parameters
+        ----------
+        attempt : int
+            number of the failed attempt, starting at 1
+        kind : str or None
+            failure kind
+
+        Returns
+        -------
+        bool
+        """
+        return kind in RETRYABLE and attempt < self.max_attempts
+
+
+class DeadLetters:
+    """urls that failed for good, optionally appended to a json lines file
+
+    Attributes
+    ----------
+    path : str or None
+        file keeping entries across runs
+    """
+
+    def __init__(self, path=None):
+        """Summary
+
+        Parameters
+        ----------
+        path : str, optional
+            refer to class attributes, existing entries are loaded
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries = {}
+        if path is not None and os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self._entries[entry['url']] = entry
+
+    def add(self, url, error):
+        """record failure of `url`
+
+        Parameters
+        ----------
+        url : str
+        error : Exception or str
+        """
+        kind = classify_exception(error) if isinstance(error, Exception) \
+            else OTHER
+        entry = {'url': url, 'kind': kind, 'error': str(error),
+                 'time': time.time()}
+        with self._lock:
+            self._entries[url] = entry
+            if self.path is not None:
+                with open(self.path, mode='a', encoding='utf-8') as f:
+                    f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+
+    def remove(self, url):
+        """forget `url` after it was crawled successfully
+
+        Parameters
+        ----------
+        url : str
+        """
+        with self._lock:
+            if self._entries.pop(url, None) is not None and \
+                    self.path is not None:
+                self._rewrite()
+
+    def urls(self):
+        """Summary
+
+        Returns
+        -------
+        list
+            failed urls, oldest first
+        """
+        with self._lock:
+            return [entry['url'] for entry in
+                    sorted(self._entries.values(), key=lambda e: e['time'])]
+
+    def entries(self):
+        """Summary
+
+        Returns
+        -------
+        list of dict
+            `url`, `kind`, `error` and `time` of each failure
+        """
+        with self._lock:
+            return list(self._entries.values())
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _rewrite(self):
+        """write current entries over `path`, lock must be held
+        """
+        temp_path = self.path + '.tmp'
+        with open(temp_path, mode='w', encoding='utf-8') as f:
+            for entry in self._entries.values():
+                f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+        os.replace(temp_path, self.path)
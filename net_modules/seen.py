@@ -0,0 +1,135 @@
+"""compact set of seen urls for continuous crawls
+
+a Bloom filter answers "never seen" without touching the frontier, which
+stays the exact store confirming urls the filter may have seen
+"""
+import os
+import json
+import math
+import hashlib
+import threading
+
+
+class BloomFilter:
+    """probabilistic set without false negatives
+
+    Attributes
+    ----------
+    capacity : int
+        number of items the filter is sized for
+    error_rate : float
+        false positive rate once `capacity` items are added
+    size : int
+        number of bits
+    hashes : int
+        number of bits set per item
+    """
+
+    def __init__(self, capacity: int = 1000000, error_rate: float = 0.001):
+        """Summary
+
+        Parameters
+        ----------
+        capacity : int, optional
+            refer to class attributes
+        error_rate : float, optional
+            refer to class attributes
+        """
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.size = max(8, int(math.ceil(
+            -capacity * math.log(error_rate) / math.log(2) ** 2)))
+        self.hashes = max(1, int(round(self.size / capacity * math.log(2))))
+        self._bits = bytearray((self.size + 7) // 8)
+        self._lock = threading.Lock()
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def _positions(self, item):
+        """bit positions of `item`, by double hashing
+
+        Parameters
+        ----------
+        item : str
+
+        Returns
+        -------
+        list of int
+        """
+        digest = hashlib.blake2b(item.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'big')
+        h2 = int.from_bytes(digest[8:], 'big') | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def __contains__(self, item):
+        return all(self._bits[p >> 3] & (1 << (p & 7))
+                   for p in self._positions(item))
+
+    def add(self, item):
+        """Summary
+
+        Parameters
+        ----------
+        item : str
+
+        Returns
+        -------
+        bool
+            False if `item` was, or collides with, an added item
+        """
+        positions = self._positions(item)
+        with self._lock:
+            new = False
+            for p in positions:
+                if not self._bits[p >> 3] & (1 << (p & 7)):
+                    self._bits[p >> 3] = self._bits[p >> 3] | (1 << (p & 7))
+                    new = True
+            if new:
+                self.count = self.count + 1
+        return new
+
+    def save(self, path):
+        """write the filter to `path`, atomically
+
+        Parameters
+        ----------
+        path : str
+        """
+        header = json.dumps({'capacity': self.capacity,
+                             'error_rate': self.error_rate,
+                             'count': self.count}).encode('utf-8')
+        temp_path = path + '.tmp'
+        with self._lock, open(temp_path, mode='wb') as f:
+            f.write(header + b'\n')
+            f.write(self._bits)
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """Summary
+
+        Parameters
+        ----------
+        path : str
+            file written by `save`
+
+        Returns
+        -------
+        BloomFilter
+
+        Raises
+        ------
+        ValueError
+            if the file is truncated or not a saved filter
+        """
+        with open(path, mode='rb') as f:
+            header = json.loads(f.readline())
+            ret = cls(header['capacity'], header['error_rate'])
+            bits = f.read()
+        if len(bits) != len(ret._bits):
+            raise ValueError('{} is not a complete bloom filter'.format(path))
+        ret._bits[:] = bits
+        ret.count = header['count']
+        return ret
@@ -0,0 +1,481 @@
+"""storage formats for crawled articles and a batching writer thread
+"""
+import os
+import json
+import gzip
+import queue
+import logging
+import threading
+from collections import namedtuple
+
+from net_modules import store
+
+OUTPUT_FORMATS = ('files', 'jsonl', 'shards', 'store')
+COMPRESSIONS = ('gzip', 'zstd')
+
+Record = namedtuple('Record', ['counter', 'url', 'text', 'fetched_at',
+                               'duplicate_of'], defaults=(None,))
+Record.__doc__ = """one crawled article
+
+Attributes
+----------
+counter : int
+    crawl order of the article, used for file names
+url : str or None
+    article link
+text : str
+    extracted article text
+fetched_at : float
+    unix time the article was downloaded
+duplicate_of : str or None
+    url of a near-duplicate stored before, json lines only
+"""
+
+
+def _base_name(create_dir, file_names_prefix):
+    """join output directory and files prefix
+
+    Parameters
+    ----------
+    create_dir : str or bool
+        output directory, anything but a non-empty str means current directory
+    file_names_prefix : str
+        prefix of files name
+
+    Returns
+    -------
+    str
+    """
+    if isinstance(create_dir, str) and create_dir != '':
+        return os.path.join(create_dir, file_names_prefix)
+    return file_names_prefix
+
+
+def _json_line(record: Record):
+    """Summary
+
+    Parameters
+    ----------
+    record : Record
+
+    Returns
+    -------
+    bytes
+        utf-8 json object terminated by a new line
+    """
+    obj = {'counter': record.counter, 'url': record.url,
+           'fetched_at': record.fetched_at, 'text': record.text}
+    if record.duplicate_of is not None:
+        obj['duplicate_of'] = record.duplicate_of
+    return (json.dumps(obj, ensure_ascii=False) + '\n').encode('utf-8')
+
+
+class FileSink:
+    """one text file per article, `{prefix}_{counter}.txt`
+    """
+
+    def __init__(self, create_dir, file_names_prefix, number_of_articles,
+                 encode='utf-8'):
+        """Summary
+
+        Parameters
+        ----------
+        create_dir : str or bool
+            output directory
+        file_names_prefix : str
+            prefix of files name
+        number_of_articles : int
+            used to zero pad counters
+        encode : str, optional
+            files encoding
+        """
+        self._base_name = _base_name(create_dir, file_names_prefix)
+        self._pad_len = len(str(number_of_articles))
+        self._encode = encode
+
+    def write_batch(self, records):
+        """Summary
+
+        Parameters
+        ----------
+        records : list of Record
+        """
+        for record in records:
+            file_name = f'{self._base_name}_{record.counter:0{self._pad_len}}.txt'
+            with open(file_name, mode='w+', encoding=self._encode) as f:
+                f.write(record.text)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class JsonLinesSink:
+    """all articles appended to a single `{prefix}.jsonl` file
+    """
+
+    def __init__(self, create_dir, file_names_prefix):
+        """Summary
+
+        Parameters
+        ----------
+        create_dir : str or bool
+            output directory
+        file_names_prefix : str
+            prefix of file name
+        """
+        self.path = _base_name(create_dir, file_names_prefix or 'articles') \
+            + '.jsonl'
+        self._file = open(self.path, mode='ab')
+
+    def write_batch(self, records):
+        """Summary
+
+        Parameters
+        ----------
+        records : list of Record
+        """
+        self._file.write(b''.join(_json_line(record) for record in records))
+
+    def flush(self):
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class ShardedJsonLinesSink:
+    """json lines split into compressed shards of about `shard_size` bytes
+
+    shards are named `{prefix}_{index:05}.jsonl.gz` (or `.jsonl.zst`), a new
+    run continues after the last existing shard
+    """
+
+    def __init__(self, create_dir, file_names_prefix,
+                 shard_size: int = 64 * 2 ** 20, compression='gzip'):
+        """Summary
+
+        Parameters
+        ----------
+        create_dir : str or bool
+            output directory
+        file_names_prefix : str
+            prefix of shards name
+        shard_size : int, optional
+            uncompressed bytes per shard
+        compression : str, optional
+            one of `COMPRESSIONS`, zstd needs the `zstandard` package
+        """
+        self._base_name = _base_name(create_dir,
+                                     file_names_prefix or 'articles')
+        self.shard_size = shard_size
+        self.compression = compression
+        self._extension = '.jsonl.gz' if compression == 'gzip' \
+            else '.jsonl.zst'
+        self._index = self._last_index() + 1
+        self._file = None
+        self._written = 0
+
+    def _last_index(self):
+        """Summary
+
+        Returns
+        -------
+        int
+            index of the last existing shard, -1 if there is none
+        """
+        directory, prefix = os.path.split(self._base_name)
+        ret = -1
+        for name in os.listdir(directory or '.'):
+            if name.startswith(prefix + '_') and name.endswith(self._extension):
+                index = name[len(prefix) + 1:-len(self._extension)]
+                if index.isdigit():
+                    ret = max(ret, int(index))
+        return ret
+
+    def _open_shard(self):
+        """Summary
+        """
+        path = f'{self._base_name}_{self._index:05}{self._extension}'
+        self._index = self._index + 1
+        self._written = 0
+        if self.compression == 'gzip':
+            self._file = gzip.open(path, mode='wb')
+        else:
+            import zstandard
+            self._file = zstandard.ZstdCompressor().stream_writer(
+                open(path, mode='wb'))
+
+    def write_batch(self, records):
+        """Summary
+
+        Parameters
+        ----------
+        records : list of Record
+        """
+        for record in records:
+            if self._file is None:
+                self._open_shard()
+            line = _json_line(record)
+            self._file.write(line)
+            self._written = self._written + len(line)
+            if self._written >= self.shard_size:
+                self._file.close()
+                self._file = None
+
+    def flush(self):
+        if self._file is not None:
+            self._file.flush()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class StoreSink:
+    """articles in a content-addressed `{prefix}.store` directory
+
+    keyed by url and text hash instead of the crawl counter, see
+    `store.ArticleStore` to read them back
+    """
+
+    def __init__(self, create_dir, file_names_prefix,
+                 segment_size: int = 64 * 2 ** 20, compression='zstd'):
+        """Summary
+
+        Parameters
+        ----------
+        create_dir : str or bool
+            output directory
+        file_names_prefix : str
+            prefix of the store name
+        segment_size : int, optional
+            compressed bytes per segment file
+        compression : str, optional
+            one of `COMPRESSIONS` for a new store, zstd needs the
+            `zstandard` package
+        """
+        self.path = _base_name(create_dir, file_names_prefix or 'articles') \
+            + '.store'
+        self._writer = store.StoreWriter(self.path, compression, segment_size)
+
+    def write_batch(self, records):
+        """Summary
+
+        Parameters
+        ----------
+        records : list of Record
+        """
+        for record in records:
+            self._writer.put(record.url, record.text, record.fetched_at)
+
+    def flush(self):
+        self._writer.flush()
+
+    def close(self):
+        self._writer.close()
+
+
+def create_sink(output_format, create_dir, file_names_prefix,
+                number_of_articles, encode='utf-8',
+                shard_size: int = 64 * 2 ** 20, compression='gzip'):
+    """build the sink of `output_format`
+
+    Parameters
+    ----------
+    output_format : str
+        one of `OUTPUT_FORMATS`
+    create_dir : str or bool
+        output directory
+    file_names_prefix : str
+        prefix of files name
+    number_of_articles : int
+        used to zero pad file names
+    encode : str, optional
+        encoding of text files, json lines are always utf-8
+    shard_size : int, optional
+        uncompressed bytes per shard, or compressed bytes per store segment
+    compression : str, optional
+        compression of shards and store texts
+
+    Returns
+    -------
+    FileSink, JsonLinesSink, ShardedJsonLinesSink or StoreSink
+
+    Raises
+    ------
+    ValueError
+        for unknown `output_format`
+    """
+    if output_format == 'files':
+        return FileSink(create_dir, file_names_prefix, number_of_articles,
+                        encode)
+    elif output_format == 'jsonl':
+        return JsonLinesSink(create_dir, file_names_prefix)
+    elif output_format == 'shards':
+        return ShardedJsonLinesSink(create_dir, file_names_prefix,
+                                    shard_size, compression)
+    elif output_format == 'store':
+        return StoreSink(create_dir, file_names_prefix, shard_size,
+                         compression)
+    raise ValueError('output_format must be one of {}'.format(OUTPUT_FORMATS))
+
+
+class BufferedWriter:
+    """write records to a sink in batches from a background thread
+
+    `put` blocks once `max_queue` records are waiting, so a slow disk slows the
+    crawl down instead of growing memory
+
+    Attributes
+    ----------
+    sink : sink of `create_sink`
+        destination of records
+    """
+
+    def __init__(self, sink, batch_size: int = 100, max_queue: int = 1000,
+                 on_written=None):
+        """Summary
+
+        Parameters
+        ----------
+        sink : sink of `create_sink`
+            refer to class attributes
+        batch_size : int, optional
+            maximum number of records per `write_batch`
+        max_queue : int, optional
+            maximum number of records waiting to be written
+        on_written : callable, optional
+            called from the writer thread with each batch after it is flushed
+        """
+        self.sink = sink
+        self.batch_size = batch_size
+        self._on_written = on_written
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._error = None
+        self._thread = threading.Thread(target=self._run, daemon=True,
+                                        name='article-writer')
+        self._thread.start()
+
+    def put(self, record: Record):
+        """queue `record` for writing
+
+        Parameters
+        ----------
+        record : Record
+
+        Raises
+        ------
+        RuntimeError
+            if the writer thread failed
+        """
+        if self._error is not None:
+            raise RuntimeError('article writer failed') from self._error
+        self._queue.put(record)
+
+    def qsize(self):
+        """Summary
+
+        Returns
+        -------
+        int
+            number of records waiting to be written
+        """
+        return self._queue.qsize()
+
+    def close(self):
+        """write remaining records and close the sink
+
+        Raises
+        ------
+        RuntimeError
+            if the writer thread failed
+        """
+        self._queue.put(None)
+        self._thread.join()
+        self.sink.close()
+        if self._error is not None:
+            raise RuntimeError('article writer failed') from self._error
+
+    def _run(self):
+        """Summary
+        """
+        stop = False
+        while not stop:
+            batch = [self._queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if batch[-1] is None:
+                stop = True
+                batch.pop()
+            if not batch or self._error is not None:
+                continue
+            try:
+                self.sink.write_batch(batch)
+                self.sink.flush()
+                if self._on_written is not None:
+                    self._on_written(batch)
+            except Exception as ex:
+                logging.exception(ex, exc_info=True)
+                self._error = ex
+
+
+class DirectWriter:
+    """`BufferedWriter` counterpart writing batches from the calling thread
+
+    used where a background thread can not run, e.g. once gevent has
+    monkey-patched the process
+    """
+
+    def __init__(self, sink, batch_size: int = 100, on_written=None):
+        """Summary
+
+        Parameters
+        ----------
+        sink : sink of `create_sink`
+            destination of records
+        batch_size : int, optional
+            number of records buffered before writing
+        on_written : callable, optional
+            called with each batch after it is flushed
+        """
+        self.sink = sink
+        self.batch_size = batch_size
+        self._on_written = on_written
+        self._batch = []
+
+    def put(self, record: Record):
+        """Summary
+
+        Parameters
+        ----------
+        record : Record
+        """
+        self._batch.append(record)
+        if len(self._batch) >= self.batch_size:
+            self._write()
+
+    def close(self):
+        """write remaining records and close the sink
+        """
+        try:
+            self._write()
+        finally:
+            self.sink.close()
+
+    def _write(self):
+        """Summary
+        """
+        batch, self._batch = self._batch, []
+        if not batch:
+            return
+        self.sink.write_batch(batch)
+        self.sink.flush()
+        if self._on_written is not None:
+            self._on_written(batch)
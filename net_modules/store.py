@@ -0,0 +1,485 @@
+"""content-addressed article store with a memory-mapped index
+
+a store is a directory of append-only segment files holding compressed
+article texts, each text once whatever the number of urls it was found at,
+and an index of fixed size entries read through `mmap`:
+
+    store.json          compression of the texts
+    segment_00000.bin   compressed texts, one frame per text
+    urls.bin            utf-8 urls, back to back
+    index.bin           one `ENTRY` per stored article
+
+entries are appended after the data they point to, so a store left by a
+killed crawl is cut back to its last complete entry when opened. articles
+are found by url or content hash in O(1) once the index was scanned on open
+"""
+import os
+import json
+import gzip
+import mmap
+import struct
+import hashlib
+from collections import namedtuple
+
+# content hash, url hash, segment, offset, length, fetched at, url offset,
+# url length
+ENTRY = struct.Struct('<16s8sIQIdQI')
+HASH_SIZE = 16
+_META_FILE = 'store.json'
+_INDEX_FILE = 'index.bin'
+_URLS_FILE = 'urls.bin'
+_VERSION = 1
+
+StoredArticle = namedtuple('StoredArticle', ['url', 'content_hash',
+                                             'fetched_at', 'text'])
+StoredArticle.__doc__ = """one article read from a store
+
+Attributes
+----------
+url : str or None
+    article link
+content_hash : str
+    hex blake2b digest of the utf-8 text
+fetched_at : float
+    unix time the article was downloaded
+text : str
+    article text
+"""
+
+
+def content_hash(text):
+    """Summary
+
+    Parameters
+    ----------
+    text : str
+
+    Returns
+    -------
+    str
+        hex digest keying `text` in a store
+    """
+    return _digest(text.encode('utf-8'), HASH_SIZE).hex()
+
+
+def _digest(data, size):
+    """Summary
+
+    Parameters
+    ----------
+    data : bytes
+    size : int
+        digest bytes
+
+    Returns
+    -------
+    bytes
+    """
+    return hashlib.blake2b(data, digest_size=size).digest()
+
+
+def _url_hash(url):
+    """Summary
+
+    Parameters
+    ----------
+    url : str
+
+    Returns
+    -------
+    bytes
+    """
+    return _digest(url.encode('utf-8'), 8)
+
+
+def _codec(compression):
+    """compress and decompress functions of `compression`
+
+    Parameters
+    ----------
+    compression : str
+        `zstd` or `gzip`, zstd needs the `zstandard` package
+
+    Returns
+    -------
+    tuple
+        `(compress, decompress)`
+
+    Raises
+    ------
+    ValueError
+        for unknown `compression`
+    """
+    if compression == 'zstd':
+        import zstandard
+        # frames carry their content size, needed by one-shot decompress
+        return (zstandard.ZstdCompressor(level=3).compress,
+                zstandard.ZstdDecompressor().decompress)
+    elif compression == 'gzip':
+        return (lambda data: gzip.compress(data, mtime=0)), gzip.decompress
+    raise ValueError("compression must be 'zstd' or 'gzip'")
+
+
+def _segment_path(path, segment):
+    """Summary
+
+    Parameters
+    ----------
+    path : str
+        store directory
+    segment : int
+
+    Returns
+    -------
+    str
+    """
+    return os.path.join(path, f'segment_{segment:05}.bin')
+
+
+def _file_size(path):
+    """Summary
+
+    Parameters
+    ----------
+    path : str
+
+    Returns
+    -------
+    int
+        size of `path`, 0 if it doesn't exist
+    """
+    try:
+        return os.path.getsize(path)
+    except FileNotFoundError:
+        return 0
+
+
+class _Index:
+    """lookup tables of a store, built by scanning its index once
+
+    Attributes
+    ----------
+    entries : int
+        number of complete entries whose data is on disk
+    urls : dict
+        url hash to number of its latest entry
+    contents : dict
+        content hash to `(segment, offset, length)` of the text
+    """
+
+    def __init__(self, path):
+        """Summary
+
+        Parameters
+        ----------
+        path : str
+            store directory
+        """
+        self.entries = 0
+        self.urls = {}
+        self.contents = {}
+        index_path = os.path.join(path, _INDEX_FILE)
+        size = _file_size(index_path)
+        if size < ENTRY.size:
+            return
+        urls_size = _file_size(os.path.join(path, _URLS_FILE))
+        segment_sizes = {}
+        with open(index_path, mode='rb') as f, \
+                mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as index:
+            for number in range(size // ENTRY.size):
+                (key, url_key, segment, offset, length, _, url_offset,
+                 url_length) = ENTRY.unpack_from(index, number * ENTRY.size)
+                if segment not in segment_sizes:
+                    segment_sizes[segment] = _file_size(
+                        _segment_path(path, segment))
+                # data is written before its entry, the first entry
+                # pointing past the end of a file was left by a crash
+                if offset + length > segment_sizes[segment] or \
+                        url_offset + url_length > urls_size:
+                    break
+                self.contents[key] = (segment, offset, length)
+                if url_length:
+                    self.urls[url_key] = number
+                self.entries = number + 1
+
+
+class ArticleStore:
+    """read-only access to a store
+
+    Attributes
+    ----------
+    path : str
+        store directory
+    compression : str
+        compression of the texts
+    """
+
+    def __init__(self, path):
+        """Summary
+
+        Parameters
+        ----------
+        path : str
+            store directory
+
+        Raises
+        ------
+        ValueError
+            if `path` is not a store
+        """
+        self.path = path
+        try:
+            with open(os.path.join(path, _META_FILE), encoding='utf-8') as f:
+                self.compression = json.load(f)['compression']
+        except (FileNotFoundError, ValueError, KeyError):
+            raise ValueError('{} is not an article store'.format(path))
+        self._decompress = _codec(self.compression)[1]
+        self._lookup = _Index(path)
+        self._index = self._map(os.path.join(path, _INDEX_FILE))
+        self._urls = self._map(os.path.join(path, _URLS_FILE))
+        self._segments = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return self._lookup.entries
+
+    def __contains__(self, url):
+        return _url_hash(url) in self._lookup.urls
+
+    def __iter__(self):
+        for number in range(self._lookup.entries):
+            yield self._article(number)
+
+    @staticmethod
+    def _map(path):
+        """Summary
+
+        Parameters
+        ----------
+        path : str
+
+        Returns
+        -------
+        mmap.mmap or None
+            None for a missing or empty file, which can't be mapped
+        """
+        if not _file_size(path):
+            return None
+        with open(path, mode='rb') as f:
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def get(self, url):
+        """latest article stored for `url`
+
+        Parameters
+        ----------
+        url : str
+            canonical article url
+
+        Returns
+        -------
+        StoredArticle or None
+        """
+        number = self._lookup.urls.get(_url_hash(url))
+        return self._article(number) if number is not None else None
+
+    def text(self, key):
+        """Summary
+
+        Parameters
+        ----------
+        key : str
+            content hash, see `content_hash`
+
+        Returns
+        -------
+        str or None
+            text stored under `key`
+        """
+        location = self._lookup.contents.get(bytes.fromhex(key))
+        return self._read(*location) if location is not None else None
+
+    def close(self):
+        """unmap the store files
+        """
+        for mapped in [self._index, self._urls, *self._segments.values()]:
+            if mapped is not None:
+                mapped.close()
+        self._segments = {}
+
+    def _article(self, number):
+        """Summary
+
+        Parameters
+        ----------
+        number : int
+            entry number
+
+        Returns
+        -------
+        StoredArticle
+        """
+        (key, _, segment, offset, length, fetched_at, url_offset,
+         url_length) = ENTRY.unpack_from(self._index, number * ENTRY.size)
+        url = self._urls[url_offset:url_offset + url_length].decode('utf-8') \
+            if url_length else None
+        return StoredArticle(url, key.hex(), fetched_at,
+                             self._read(segment, offset, length))
+
+    def _read(self, segment, offset, length):
+        """Summary
+
+        Parameters
+        ----------
+        segment : int
+        offset : int
+        length : int
+
+        Returns
+        -------
+        str
+        """
+        mapped = self._segments.get(segment)
+        if mapped is None:
+            mapped = self._segments[segment] = self._map(
+                _segment_path(self.path, segment))
+        return self._decompress(mapped[offset:offset + length]).decode(
+            'utf-8')
+
+
+class StoreWriter:
+    """appends articles to a store, created if it doesn't exist
+
+    a store has a single writer at a time
+
+    Attributes
+    ----------
+    path : str
+        store directory
+    compression : str
+        compression of the texts
+    segment_size : int
+        compressed bytes per segment file
+    """
+
+    def __init__(self, path, compression='zstd',
+                 segment_size: int = 64 * 2 ** 20):
+        """Summary
+
+        Parameters
+        ----------
+        path : str
+            refer to class attributes
+        compression : str, optional
+            used for a new store, an existing one keeps its own
+        segment_size : int, optional
+            refer to class attributes
+        """
+        self.path = path
+        self.segment_size = segment_size
+        os.makedirs(path, exist_ok=True)
+        meta_path = os.path.join(path, _META_FILE)
+        if os.path.exists(meta_path):
+            with open(meta_path, encoding='utf-8') as f:
+                compression = json.load(f)['compression']
+        else:
+            with open(meta_path, mode='w', encoding='utf-8') as f:
+                json.dump({'version': _VERSION, 'compression': compression},
+                          f)
+        self.compression = compression
+        self._compress = _codec(compression)[0]
+        lookup = _Index(path)
+        self._urls = lookup.urls
+        self._contents = lookup.contents
+        index_path = os.path.join(path, _INDEX_FILE)
+        if _file_size(index_path) != lookup.entries * ENTRY.size:
+            # drop entries of an interrupted write
+            os.truncate(index_path, lookup.entries * ENTRY.size)
+        self._entries = lookup.entries
+        self._index_file = open(index_path, mode='ab')
+        self._urls_file = open(os.path.join(path, _URLS_FILE), mode='ab')
+        self._urls_offset = self._urls_file.seek(0, os.SEEK_END)
+        self._segment = max([location[0] for location in
+                             self._contents.values()], default=0)
+        self._segment_file = None
+        self._open_segment()
+
+    def __len__(self):
+        return self._entries
+
+    def __contains__(self, url):
+        return _url_hash(url) in self._urls
+
+    def _open_segment(self):
+        """open the current segment for appending, or the next one if full
+        """
+        if self._segment_file is not None:
+            self._segment_file.close()
+        path = _segment_path(self.path, self._segment)
+        if _file_size(path) >= self.segment_size:
+            self._segment = self._segment + 1
+            path = _segment_path(self.path, self._segment)
+        self._segment_file = open(path, mode='ab')
+        self._segment_offset = self._segment_file.seek(0, os.SEEK_END)
+
+    def put(self, url, text, fetched_at):
+        """store an article
+
+        Parameters
+        ----------
+        url : str or None
+            canonical article url
+        text : str
+            article text
+        fetched_at : float
+            unix time the article was downloaded
+
+        Returns
+        -------
+        tuple
+            `(content_hash, new)`, new is False if the same text was stored
+            before, for any url
+        """
+        data = text.encode('utf-8')
+        key = _digest(data, HASH_SIZE)
+        location = self._contents.get(key)
+        new = location is None
+        if new:
+            if self._segment_offset >= self.segment_size:
+                self._open_segment()
+            frame = self._compress(data)
+            self._segment_file.write(frame)
+            location = (self._segment, self._segment_offset, len(frame))
+            self._segment_offset = self._segment_offset + len(frame)
+            self._contents[key] = location
+        url_bytes = url.encode('utf-8') if url else b''
+        self._urls_file.write(url_bytes)
+        url_key = _url_hash(url) if url else bytes(8)
+        self._index_file.write(ENTRY.pack(
+            key, url_key, *location, fetched_at, self._urls_offset,
+            len(url_bytes)))
+        self._urls_offset = self._urls_offset + len(url_bytes)
+        if url:
+            self._urls[url_key] = self._entries
+        self._entries = self._entries + 1
+        return key.hex(), new
+
+    def flush(self):
+        """write buffered data, entries last
+        """
+        self._segment_file.flush()
+        self._urls_file.flush()
+        self._index_file.flush()
+
+    def close(self):
+        """Summary
+        """
+        self.flush()
+        self._segment_file.close()
+        self._urls_file.close()
+        self._index_file.close()
@@ -0,0 +1,217 @@
+"""incremental article body extraction from a streamed response
+
+only simple selectors (`tag`, `.class`, `#id` and compounds such as
+`div.body#main`) can be matched while streaming, `is_streamable` tells whether
+a selector set qualifies
+"""
+import re
+import codecs
+from html.parser import HTMLParser
+
+_SIMPLE_SELECTOR_RE = re.compile(r'^([a-zA-Z][\w-]*)?((?:[.#][\w-]+)*)$')
+# elements without end tag
+_VOID_ELEMENTS = {'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input',
+                  'link', 'meta', 'param', 'source', 'track', 'wbr'}
+# text under these is not part of `get_text()`
+_SKIPPED_ELEMENTS = {'script', 'style', 'template'}
+
+
+class SimpleSelector:
+    """compound selector made of an optional tag, classes and an id
+
+    Attributes
+    ----------
+    tag : str or None
+        tag name
+    classes : set
+        required classes
+    id : str or None
+        required id
+    """
+
+    def __init__(self, css_selector: str):
+        """Summary
+
+        Parameters
+        ----------
+        css_selector : str
+            simple selector
+
+        Raises
+        ------
+        ValueError
+            if `css_selector` is not a simple selector
+        """
+        match_obj = _SIMPLE_SELECTOR_RE.match(css_selector.strip())
+        if match_obj is None or not css_selector.strip():
+            raise ValueError(
+                '{!r} is not a simple selector'.format(css_selector))
+        self.tag = match_obj.group(1).lower() if match_obj.group(1) else None
+        self.classes = set()
+        self.id = None
+        for part in re.findall(r'[.#][\w-]+', match_obj.group(2)):
+            if part[0] == '.':
+                self.classes.add(part[1:])
+            else:
+                self.id = part[1:]
+
+    def matches(self, tag: str, attrs: dict):
+        """Summary
+
+        Parameters
+        ----------
+        tag : str
+            tag name
+        attrs : dict
+            element attributes
+
+        Returns
+        -------
+        bool
+        """
+        if self.tag is not None and tag != self.tag:
+            return False
+        if self.id is not None and attrs.get('id') != self.id:
+            return False
+        if self.classes:
+            classes = set((attrs.get('class') or '').split())
+            if not self.classes <= classes:
+                return False
+        return True
+
+
+def is_streamable(css_selectors):
+    """whether all selectors are simple enough to match while streaming
+
+    Parameters
+    ----------
+    css_selectors : list or str
+        CSS selector(s)
+
+    Returns
+    -------
+    bool
+    """
+    if isinstance(css_selectors, str):
+        css_selectors = [css_selectors]
+    try:
+        for css_selector in css_selectors:
+            SimpleSelector(css_selector)
+    except ValueError:
+        return False
+    return True
+
+
+class BodyStreamParser(HTMLParser):
+    """collect text of every element matching each selector
+
+    like `parsing.extract_article`, matches of each selector are joined in
+    document order, one selector after another. feed the document in chunks
+    and stop as soon as `done` is True
+
+    Attributes
+    ----------
+    done : bool
+        no more text can be found, only possible when every selector has an
+        id, taken to match a single element, and that element ended
+    """
+
+    def __init__(self, css_selectors):
+        """Summary
+
+        Parameters
+        ----------
+        css_selectors : list or str
+            simple CSS selector(s)
+        """
+        super().__init__(convert_charrefs=True)
+        if isinstance(css_selectors, str):
+            css_selectors = [css_selectors]
+        self._selectors = [SimpleSelector(css_selector)
+                           for css_selector in css_selectors]
+        # texts of each match, in document order, per selector
+        self._texts = [[] for _ in self._selectors]
+        self._finished = [False] * len(self._selectors)
+        # `(selector index, open tags since its start, texts)` of matches
+        # not ended yet
+        self._active = []
+        self._skip_depth = 0
+        self.done = False
+
+    def handle_starttag(self, tag, attrs):
+        if tag in _VOID_ELEMENTS:
+            return
+        attrs = dict(attrs)
+        for _, stack, _ in self._active:
+            stack.append(tag)
+        for i, selector in enumerate(self._selectors):
+            if not self._finished[i] and selector.matches(tag, attrs):
+                texts = []
+                self._texts[i].append(texts)
+                self._active.append((i, [tag], texts))
+        if tag in _SKIPPED_ELEMENTS:
+            self._skip_depth = self._skip_depth + 1
+
+    def handle_startendtag(self, tag, attrs):
+        pass
+
+    def handle_endtag(self, tag):
+        if tag in _SKIPPED_ELEMENTS and self._skip_depth:
+            self._skip_depth = self._skip_depth - 1
+        for _, stack, _ in self._active:
+            if tag in stack:
+                # implicitly close unclosed children
+                while stack.pop() != tag:
+                    pass
+        self._active = [match for match in self._active if match[1]]
+        active = {match[0] for match in self._active}
+        for i, selector in enumerate(self._selectors):
+            if selector.id is not None and self._texts[i] and \
+                    i not in active:
+                self._finished[i] = True
+        self.done = all(self._finished)
+
+    def handle_data(self, data):
+        if self._skip_depth:
+            return
+        for _, _, texts in self._active:
+            texts.append(data)
+
+    def text(self):
+        """text collected so far, in selector order
+
+        Returns
+        -------
+        str
+        """
+        return ''.join(''.join(texts) for matches in self._texts
+                       for texts in matches)
+
+
+def stream_extract_text(chunks, encoding, css_selectors):
+    """feed `chunks` to a `BodyStreamParser` until the body is complete
+
+    Parameters
+    ----------
+    chunks : iterable of bytes
+        response body, e.g. `requests.Response.iter_content()`
+    encoding : str or None
+        encoding of the body, utf-8 if None
+    css_selectors : list or str
+        simple CSS selector(s)
+
+    Returns
+    -------
+    Tuple[str, bool]
+        extracted text and whether the rest of the body was skipped
+    """
+    decoder = codecs.getincrementaldecoder(encoding or 'utf-8')(
+        errors='replace')
+    parser = BodyStreamParser(css_selectors)
+    for chunk in chunks:
+        parser.feed(decoder.decode(chunk))
+        if parser.done:
+            return parser.text(), True
+    parser.feed(decoder.decode(b'', final=True))
+    parser.close()
+    return parser.text(), False
@@ -0,0 +1,170 @@
+"""link resolution and canonical urls
+
+every link found on a page is resolved against the page url and brought to
+one canonical spelling, which then keys the frontier, the HTTP cache, dead
+letters and near-duplicate detection, so an article linked as
+`/fa/news/1?utm_source=x#top` and `http://WWW.yjc.ir:80/fa/news/1` is
+fetched once
+"""
+import re
+import hashlib
+import threading
+from functools import lru_cache
+from urllib.parse import urljoin, urlsplit, urlunsplit, parse_qsl, \
+    urlencode, quote
+
+SCHEMES = ('http', 'https')
+# query parameters only used to track visitors
+TRACKING_PARAMETERS = {'fbclid', 'gclid', 'dclid', 'msclkid', 'yclid',
+                       'igshid', 'mc_cid', 'mc_eid', '_ga', '_gl'}
+TRACKING_PREFIXES = ('utm_',)
+_DEFAULT_PORTS = {'http': 80, 'https': 443}
+# characters left as they are in paths, `%` keeps existing escapes
+_PATH_SAFE = "/:@!$&'()*+,;=-._~%"
+_ESCAPE = re.compile(r'%[0-9a-fA-F]{2}')
+
+
+def _is_tracking(name):
+    """Summary
+
+    Parameters
+    ----------
+    name : str
+        query parameter name
+
+    Returns
+    -------
+    bool
+    """
+    name = name.lower()
+    return name in TRACKING_PARAMETERS or name.startswith(TRACKING_PREFIXES)
+
+
+def canonicalize(url):
+    """canonical spelling of an absolute url
+
+    scheme and host are lower cased, the host in its ascii form, default
+    ports, fragments and tracking parameters dropped, the path
+    percent-encoded with upper case escapes and the query sorted
+
+    Parameters
+    ----------
+    url : str
+        absolute url
+
+    Returns
+    -------
+    str or None
+        None unless `url` is an http(s) url with a host
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    if scheme not in SCHEMES or not parts.hostname:
+        return None
+    host = parts.hostname.rstrip('.')
+    try:
+        # internationalized domain names in their ascii form
+        host = host.encode('idna').decode('ascii')
+    except UnicodeError:
+        pass
+    if ':' in host:
+        host = '[{}]'.format(host)
+    try:
+        port = parts.port
+    except ValueError:
+        return None
+    if port is not None and port != _DEFAULT_PORTS[scheme]:
+        host = '{}:{}'.format(host, port)
+    path = _ESCAPE.sub(lambda m: m.group().upper(),
+                       quote(parts.path or '/', safe=_PATH_SAFE))
+    query = urlencode(sorted((name, value) for name, value in parse_qsl(
+        parts.query, keep_blank_values=True) if not _is_tracking(name)))
+    return urlunsplit((scheme, host, path, query, ''))
+
+
+@lru_cache(maxsize=65536)
+def resolve(base, link):
+    """resolve a link found on page `base` to its canonical url
+
+    results are cached, links repeat a lot across listing pages
+
+    Parameters
+    ----------
+    base : str
+        url of the page holding the link
+    link : str
+        `href` value, relative or absolute
+
+    Returns
+    -------
+    str or None
+        None for links that are not http(s), e.g. `javascript:` or `mailto:`
+    """
+    if not link:
+        return None
+    return canonicalize(urljoin(base, link.strip()))
+
+
+class UrlIndex:
+    """compact set of canonical urls, keeping a 64 bit hash per url
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._hashes = set()
+
+    def __len__(self):
+        return len(self._hashes)
+
+    @staticmethod
+    def _hash(url):
+        return int.from_bytes(hashlib.blake2b(url.encode('utf-8'),
+                                              digest_size=8).digest(), 'big')
+
+    def __contains__(self, url):
+        return self._hash(url) in self._hashes
+
+    def add(self, url):
+        """Summary
+
+        Parameters
+        ----------
+        url : str
+            canonical url
+
+        Returns
+        -------
+        bool
+            whether `url` was not in the index
+        """
+        key = self._hash(url)
+        with self._lock:
+            if key in self._hashes:
+                return False
+            self._hashes.add(key)
+            return True
+
+
+# fields of `article_url_template`
+VARIANT_FIELDS = ('url', 'scheme', 'host', 'path', 'query')
+
+
+def variant(url, template):
+    """url of a lighter version of a page, e.g. its AMP or print version
+
+    Parameters
+    ----------
+    url : str
+        canonical url of the page
+    template : str
+        url with `VARIANT_FIELDS` in braces, e.g.
+        `{scheme}://{host}/amp{path}` or `{url}?print=1`. `query` is the
+        query string without `?`
+
+    Returns
+    -------
+    str
+    """
+    parts = urlsplit(url)
+    return template.format(url=url, scheme=parts.scheme, host=parts.netloc,
+                           path=parts.path, query=parts.query)
@@ -0,0 +1,29 @@
+import pytest
+
+from benchmarks.fake_site import FakeSite, SELECTORS
+
+
+@pytest.fixture
+def fake_site():
+    """small `FakeSite` answering without delay
+    """
+    with FakeSite(pages=3, links=5, article_size=2000, latency=0) as site:
+        yield site
+
+
+@pytest.fixture
+def make_crawler(tmp_path):
+    """build `ArticleCrawler`s for `fake_site` writing under `tmp_path`
+    """
+    from net_modules.core import ArticleCrawler
+
+    def make(site, **kwargs):
+        kwargs.setdefault('create_dir', str(tmp_path / 'articles'))
+        kwargs.setdefault('file_names_prefix', 'news')
+        crawler = ArticleCrawler(base_url=site.base_url, politeness=False,
+                                 metrics_interval=None, parse_workers=1,
+                                 **dict(SELECTORS, **kwargs))
+        crawler.dump_path = str(tmp_path / 'ArticleCrawler.json')
+        return crawler
+
+    return make
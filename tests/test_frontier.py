@@ -0,0 +1,69 @@
+import os
+
+from net_modules import frontier
+
+
+def test_state_survives_reopen(tmp_path):
+    path = str(tmp_path / 'frontier.sqlite3')
+    urls = frontier.Frontier(path)
+    assert urls.add(['http://example.com/1', 'http://example.com/2']) == \
+        ['http://example.com/1', 'http://example.com/2']
+    assert urls.add(['http://example.com/2', 'http://example.com/3']) == \
+        ['http://example.com/3']
+    urls.mark_done('http://example.com/1', internal_counter=2)
+    urls.mark_failed('http://example.com/3', error='timeout')
+    urls.set_state(current_page_url='http://example.com/news?page=2')
+    urls.close()
+
+    urls = frontier.Frontier(path)
+    assert urls.pending() == ['http://example.com/2']
+    assert urls.failed() == ['http://example.com/3']
+    assert urls.state_of('http://example.com/1') == frontier.DONE
+    assert urls.state_of('http://example.com/4') is None
+    assert urls.get_state('internal_counter') == 2
+    assert urls.get_state('current_page_url') == \
+        'http://example.com/news?page=2'
+    assert urls.get_state('missing', 'default') == 'default'
+    assert urls.counts() == {frontier.PENDING: 1, frontier.DONE: 1,
+                             frontier.FAILED: 1}
+    assert urls.known(['http://example.com/1', 'http://example.com/4']) == \
+        {'http://example.com/1'}
+    assert urls.requeue_failed() == 1
+    assert urls.pending() == ['http://example.com/2', 'http://example.com/3']
+    urls.close()
+
+
+def test_known_in_batches(tmp_path):
+    urls = frontier.Frontier(str(tmp_path / 'frontier.sqlite3'))
+    added = ['http://example.com/{}'.format(i) for i in range(1200)]
+    urls.add(added)
+    assert urls.known(added[::-1] + ['http://example.com/new']) == set(added)
+    urls.close()
+
+
+def test_crawl_resumes(fake_site, make_crawler, tmp_path):
+    path = str(tmp_path / 'frontier.sqlite3')
+    crawler = make_crawler(fake_site, number_of_articles=7,
+                           frontier_path=path)
+    crawler.run()
+    requests = fake_site.requests
+
+    # a new crawler on the same frontier continues where the first stopped
+    crawler = make_crawler(fake_site, number_of_articles=12,
+                           frontier_path=path)
+    crawler.run()
+
+    # numbers are padded to the width of `number_of_articles` of each run
+    names = {int(name[len('news_'):-len('.txt')]): name
+             for name in os.listdir(tmp_path / 'articles')}
+    assert sorted(names) == list(range(1, 13))
+    texts = [(tmp_path / 'articles' / name).read_text(encoding='utf-8')
+             for name in names.values()]
+    assert len(set(texts)) == 12
+    # the seven articles of the first run are not fetched again
+    assert fake_site.requests - requests < 12 + 3
+
+    urls = frontier.Frontier(path)
+    assert urls.get_state('internal_counter') == 13
+    assert urls.counts()[frontier.DONE] == 12
+    urls.close()
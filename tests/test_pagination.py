@@ -0,0 +1,88 @@
+from net_modules import pagination
+
+
+def test_walk_stops_on_cycle():
+    walk = pagination.PageWalk()
+    assert walk.visit('http://example.com/news?page=1')
+    assert walk.visit('http://example.com/news?page=2')
+    assert not walk.visit('http://example.com/news?page=1')
+    assert walk.stop_reason == pagination.STOP_CYCLE
+    assert walk.pages == 2
+
+
+def test_walk_stops_on_low_yield():
+    walk = pagination.PageWalk(min_yield=2, window=3)
+    for new_articles in (5, 1, 0):
+        walk.record(new_articles)
+        assert not walk.exhausted()
+    walk.record(0)
+    assert walk.exhausted()
+    assert walk.stop_reason == pagination.STOP_LOW_YIELD
+
+
+def test_walk_without_yield_check():
+    walk = pagination.PageWalk(min_yield=0, window=2)
+    for _ in range(5):
+        walk.record(0)
+    assert not walk.exhausted()
+    assert walk.stop_reason is None
+
+
+def test_walk_keeps_first_reason():
+    walk = pagination.PageWalk()
+    walk.stop(pagination.STOP_FAILED)
+    walk.stop(pagination.STOP_QUOTA)
+    assert walk.stop_reason == pagination.STOP_FAILED
+
+
+def test_detect_template():
+    template = pagination.detect_template('http://example.com/news?page=2',
+                                          'http://example.com/news?page=3')
+    assert template.template == 'http://example.com/news?page={page}'
+    assert template.url(7) == 'http://example.com/news?page=7'
+    assert template.page_of('http://example.com/news?page=12') == 12
+    assert template.page_of('http://example.com/other?page=12') is None
+    assert pagination.detect_template(
+        'http://example.com/2020/news?page=2',
+        'http://example.com/2021/news?page=3') is None
+    assert pagination.detect_template('http://example.com/news?page=3',
+                                      'http://example.com/news?page=2') is None
+
+
+def test_crawl_stops_at_quota(fake_site, make_crawler):
+    crawler = make_crawler(fake_site, number_of_articles=7)
+    crawler.run()
+    assert crawler.stop_reason == pagination.STOP_QUOTA
+    assert crawler.internal_counter - 1 == 7
+
+
+def test_crawl_stops_after_last_page(fake_site, make_crawler):
+    # the page after the last one has no article links
+    crawler = make_crawler(fake_site, number_of_articles=100)
+    crawler.run()
+    assert crawler.stop_reason == pagination.STOP_EMPTY
+    assert crawler.internal_counter - 1 == fake_site.article_count
+
+
+def test_predicted_pages_stop_after_last_page(fake_site, make_crawler):
+    crawler = make_crawler(fake_site, number_of_articles=100,
+                           predict_pages=True)
+    crawler.run()
+    assert crawler.stop_reason == pagination.STOP_LAST_PAGE
+    assert crawler.internal_counter - 1 == fake_site.article_count
+
+
+def test_predicted_page_failure(fake_site, make_crawler):
+    crawler = make_crawler(fake_site, number_of_articles=100,
+                           predict_pages=True, max_attempts=1)
+    handle = fake_site._handle
+
+    def failing_handle(handler):
+        if handler.path.endswith('?page=3'):
+            return fake_site._respond(handler, 500)
+        return handle(handler)
+
+    fake_site._handle = failing_handle
+    crawler.run()
+    assert crawler.stop_reason == pagination.STOP_FAILED
+    assert crawler.internal_counter - 1 == 2 * fake_site.links
@@ -0,0 +1,72 @@
+import socket
+
+import pytest
+import requests
+import urllib3.exceptions
+
+from net_modules import retry
+
+
+@pytest.mark.parametrize('status, kind', [
+    (200, None), (301, None), (404, retry.CLIENT), (410, retry.CLIENT),
+    (408, retry.TIMEOUT), (429, retry.THROTTLED), (500, retry.SERVER),
+    (503, retry.SERVER)])
+def test_classify_status(status, kind):
+    assert retry.classify_status(status) == kind
+
+
+def _wrapped(exception_type, cause, *args):
+    """`exception_type` raised from `cause`, as requests raises them
+    """
+    try:
+        try:
+            raise cause
+        except Exception as ex:
+            raise exception_type(ex, *args) from ex
+    except Exception as ex:
+        return ex
+
+
+@pytest.mark.parametrize('exception, kind', [
+    (requests.exceptions.ConnectTimeout(), retry.TIMEOUT),
+    (requests.exceptions.ReadTimeout(), retry.TIMEOUT),
+    (_wrapped(requests.exceptions.ConnectionError,
+              socket.gaierror(-2, 'Name or service not known')), retry.DNS),
+    (requests.exceptions.ConnectionError('refused'), retry.CONNECT),
+    # a body read timing out after the headers arrived
+    (_wrapped(requests.exceptions.ConnectionError,
+              urllib3.exceptions.ReadTimeoutError(None, '/a', 'timed out')),
+     retry.TIMEOUT),
+    # a body cut short
+    (_wrapped(requests.exceptions.ChunkedEncodingError,
+              urllib3.exceptions.ProtocolError('IncompleteRead')),
+     retry.CONNECT),
+    (urllib3.exceptions.ProtocolError('Connection broken'), retry.CONNECT),
+    (retry.FetchError('http://example.com/', retry.SERVER, 503),
+     retry.SERVER),
+    (ValueError('not a fetch'), retry.OTHER),
+])
+def test_classify_exception(exception, kind):
+    assert retry.classify_exception(exception) == kind
+
+
+def test_classify_http_error():
+    response = requests.Response()
+    response.status_code = 502
+    exception = requests.exceptions.HTTPError(response=response)
+    assert retry.classify_exception(exception) == retry.SERVER
+
+
+def test_classify_ssl_error():
+    cause = urllib3.exceptions.SSLError('certificate verify failed')
+    cause.reason = 'CERTIFICATE_VERIFY_FAILED'
+    exception = _wrapped(requests.exceptions.SSLError, cause)
+    assert retry.classify_exception(exception) == retry.CONNECT
+
+
+def test_retryable_kinds():
+    for kind in (retry.CONNECT, retry.TIMEOUT, retry.THROTTLED,
+                 retry.SERVER):
+        assert retry.FetchError('http://example.com/', kind).retryable
+    for kind in (retry.DNS, retry.CLIENT, retry.OTHER):
+        assert not retry.FetchError('http://example.com/', kind).retryable
@@ -0,0 +1,118 @@
+import gzip
+import json
+import os
+
+import pytest
+
+from net_modules import sinks, store
+
+RECORDS = [
+    sinks.Record(1, 'http://example.com/1', 'first article', 1000.0),
+    sinks.Record(2, 'http://example.com/2', 'متن خبر دوم', 1001.0),
+    sinks.Record(3, 'http://example.com/3', 'first article', 1002.0,
+                 'http://example.com/1'),
+]
+
+
+def _write(sink, records=RECORDS):
+    sink.write_batch(records)
+    sink.close()
+
+
+def test_files(tmp_path):
+    _write(sinks.create_sink('files', str(tmp_path), 'news', 100))
+    assert sorted(os.listdir(tmp_path)) == ['news_001.txt', 'news_002.txt',
+                                            'news_003.txt']
+    assert (tmp_path / 'news_002.txt').read_text(encoding='utf-8') == \
+        RECORDS[1].text
+
+
+def test_jsonl(tmp_path):
+    _write(sinks.create_sink('jsonl', str(tmp_path), 'news', 100))
+    # a new run appends
+    _write(sinks.create_sink('jsonl', str(tmp_path), 'news', 100),
+           RECORDS[:1])
+    with open(tmp_path / 'news.jsonl', encoding='utf-8') as f:
+        lines = [json.loads(line) for line in f]
+    assert [line['text'] for line in lines] == \
+        [record.text for record in RECORDS + RECORDS[:1]]
+    assert lines[2]['duplicate_of'] == 'http://example.com/1'
+    assert 'duplicate_of' not in lines[0]
+
+
+def test_shards(tmp_path):
+    sink = sinks.create_sink('shards', str(tmp_path), 'news', 100,
+                             shard_size=1)
+    _write(sink)
+    # a new run continues after the last shard
+    _write(sinks.create_sink('shards', str(tmp_path), 'news', 100,
+                             shard_size=1), RECORDS[:1])
+    names = sorted(os.listdir(tmp_path))
+    assert names == ['news_{:05}.jsonl.gz'.format(i) for i in range(4)]
+    texts = []
+    for name in names:
+        with gzip.open(tmp_path / name, mode='rt', encoding='utf-8') as f:
+            texts.extend(json.loads(line)['text'] for line in f)
+    assert texts == [record.text for record in RECORDS + RECORDS[:1]]
+
+
+def test_store_round_trip(tmp_path):
+    _write(sinks.create_sink('store', str(tmp_path), 'news', 100,
+                             compression='gzip'))
+    with store.ArticleStore(str(tmp_path / 'news.store')) as articles:
+        assert len(articles) == 3
+        assert 'http://example.com/2' in articles
+        assert 'http://example.com/4' not in articles
+        article = articles.get('http://example.com/2')
+        assert article.text == RECORDS[1].text
+        assert article.fetched_at == RECORDS[1].fetched_at
+        assert [a.url for a in articles] == [r.url for r in RECORDS]
+        assert articles.text(store.content_hash('first article')) == \
+            'first article'
+
+
+def test_store_keeps_each_text_once(tmp_path):
+    path = str(tmp_path / 'news.store')
+    writer = store.StoreWriter(path, compression='gzip')
+    assert writer.put('http://example.com/1', 'same text', 1.0)[1]
+    assert not writer.put('http://example.com/2', 'same text', 2.0)[1]
+    writer.close()
+    segments = [name for name in os.listdir(path)
+                if name.startswith('segment_')]
+    assert len(segments) == 1
+    with store.ArticleStore(path) as articles:
+        assert articles.get('http://example.com/2').text == 'same text'
+
+
+def test_store_drops_interrupted_entry(tmp_path):
+    path = str(tmp_path / 'news.store')
+    writer = store.StoreWriter(path, compression='gzip')
+    writer.put('http://example.com/1', 'kept', 1.0)
+    writer.close()
+    # an entry written without its text, as a killed crawl may leave it
+    with open(os.path.join(path, 'index.bin'), mode='ab') as f:
+        f.write(store.ENTRY.pack(bytes(16), bytes(8), 0, 10 ** 6, 10, 2.0,
+                                 0, 0))
+    with store.ArticleStore(path) as articles:
+        assert len(articles) == 1
+    writer = store.StoreWriter(path)
+    writer.put('http://example.com/2', 'appended', 3.0)
+    writer.close()
+    with store.ArticleStore(path) as articles:
+        assert [a.text for a in articles] == ['kept', 'appended']
+
+
+def test_buffered_writer_reports_written_records(tmp_path):
+    written = []
+    writer = sinks.BufferedWriter(
+        sinks.create_sink('jsonl', str(tmp_path), 'news', 100),
+        batch_size=2, on_written=written.extend)
+    for record in RECORDS:
+        writer.put(record)
+    writer.close()
+    assert [record.counter for record in written] == [1, 2, 3]
+
+
+def test_unknown_format(tmp_path):
+    with pytest.raises(ValueError):
+        sinks.create_sink('xml', str(tmp_path), 'news', 100)
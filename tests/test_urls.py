@@ -0,0 +1,49 @@
+import pytest
+
+from net_modules import urls
+
+
+@pytest.mark.parametrize('url, expected', [
+    ('HTTP://WWW.Example.COM:80/a/b', 'http://www.example.com/a/b'),
+    ('https://example.com:443', 'https://example.com/'),
+    ('https://example.com:8443/x', 'https://example.com:8443/x'),
+    ('http://example.com/a#top', 'http://example.com/a'),
+    ('http://example.com/a?utm_source=x&b=2&a=1&fbclid=y',
+     'http://example.com/a?a=1&b=2'),
+    ('http://example.com/a?b=&a=1', 'http://example.com/a?a=1&b='),
+    ('http://example.com/%e2%82%ac x', 'http://example.com/%E2%82%AC%20x'),
+    ('http://bücher.example/', 'http://xn--bcher-kva.example/'),
+    ('http://example.com./a', 'http://example.com/a'),
+])
+def test_canonicalize(url, expected):
+    assert urls.canonicalize(url) == expected
+
+
+@pytest.mark.parametrize('url', [
+    'ftp://example.com/a', 'mailto:news@example.com', 'http:///a',
+    'http://example.com:99999/'])
+def test_canonicalize_rejects(url):
+    assert urls.canonicalize(url) is None
+
+
+@pytest.mark.parametrize('link, expected', [
+    ('/fa/news/1?utm_source=x#top', 'http://www.yjc.ir/fa/news/1'),
+    ('2', 'http://www.yjc.ir/fa/news/2'),
+    ('../social?page=2', 'http://www.yjc.ir/fa/social?page=2'),
+    ('//cdn.yjc.ir/a', 'http://cdn.yjc.ir/a'),
+    ('https://www.yjc.ir/fa/news/1', 'https://www.yjc.ir/fa/news/1'),
+    (' /fa/news/3 ', 'http://www.yjc.ir/fa/news/3'),
+    ('javascript:void(0)', None),
+    ('', None),
+])
+def test_resolve(link, expected):
+    assert urls.resolve('http://www.yjc.ir/fa/news/1', link) == expected
+
+
+def test_url_index():
+    index = urls.UrlIndex()
+    assert index.add('http://example.com/a')
+    assert not index.add('http://example.com/a')
+    assert 'http://example.com/a' in index
+    assert 'http://example.com/b' not in index
+    assert len(index) == 1